@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tracemalloc
+
+import Minesweeper
+
+DEFAULT_SIZES = [10, 64, 512, 4096]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+MINE_DENSITY = 0.15
+NUM_VALIDATIONS_PER_OP = 1000
+IMPORTED_MODULES = ["MinesweeperCore", "Minesweeper"]
+
+
+# Each benchmark takes a board size and returns (setup, operation): setup runs untimed before every
+# timed call of operation, so each call starts from the same state.
+
+def bench_board_init(size):
+    num_mines = int(size * size * MINE_DENSITY)
+    return (lambda: None), (lambda: Minesweeper.Board(size, num_mines, rng=1))
+
+
+def bench_game_init(size):
+    # a game in test mode, as headless callers create them
+    num_mines = int(size * size * MINE_DENSITY)
+    game_io = Minesweeper.MemoryIO()
+    return (lambda: None), (lambda: Minesweeper.Game((size, num_mines), io=game_io))
+
+
+def bench_flood_fill(size):
+    # worst case: a board without mines, where one click reveals every cell
+    board = Minesweeper.Board(size, 0, rng=1)
+    covered_cells = bytes(board.cells)
+
+    def setup():
+        board.cells[:] = covered_cells
+        board.num_safe_cells_uncovered = 0
+
+    return setup, lambda: board.uncover_cell(board.get_cell(size // 2, size // 2))
+
+
+def bench_render(size):
+    board = Minesweeper.Board(size, int(size * size * MINE_DENSITY), rng=1)
+    board.uncover_all_cells()
+
+    def setup():
+        board.renderer = None
+
+    return setup, lambda: str(board)
+
+
+def bench_uncover_all_cells(size):
+    board = Minesweeper.Board(size, int(size * size * MINE_DENSITY), rng=1)
+    covered_cells = bytes(board.cells)
+
+    def setup():
+        board.cells[:] = covered_cells
+
+    return setup, board.uncover_all_cells
+
+
+def bench_branch(size):
+    # one what-if click from a started game, undone when the branch closes
+    board = Minesweeper.Board(size, int(size * size * MINE_DENSITY), rng=1, first_click_safe=True)
+    board.uncover_index(board.get_index(size // 2, size // 2))
+    index = board.get_covered_indices()[len(board.get_covered_indices()) // 2]
+
+    def operation():
+        with board.branch():
+            board.uncover_index(index)
+
+    return (lambda: None), operation
+
+
+def bench_validate_row_col(size):
+    validator = Minesweeper.TurnInputValidator(2 * len(str(size - 1)) + 1, Minesweeper.Board(size, 0).is_cell_on_board)
+    user_input = "{} {}".format(size - 1, size // 2)
+
+    def operation():
+        for _ in range(NUM_VALIDATIONS_PER_OP):
+            validator._validate_row_col(user_input)
+
+    return (lambda: None), operation
+
+
+BENCHMARKS = {
+    "board_init": bench_board_init,
+    "branch": bench_branch,
+    "flood_fill": bench_flood_fill,
+    "game_init": bench_game_init,
+    "render": bench_render,
+    "uncover_all_cells": bench_uncover_all_cells,
+    "validate_row_col": bench_validate_row_col,
+}
+
+# operations that stand for a batch of calls rather than one
+OPS_PER_OPERATION = {
+    "validate_row_col": NUM_VALIDATIONS_PER_OP,
+}
+
+
+def time_operation(setup, operation, min_seconds, max_repeats):
+    num_repeats = 0
+    total_seconds = 0.0
+    while num_repeats < max_repeats and (total_seconds < min_seconds or num_repeats == 0):
+        setup()
+        start_time = time.perf_counter()
+        operation()
+        total_seconds += time.perf_counter() - start_time
+        num_repeats += 1
+    return num_repeats / total_seconds
+
+
+def measure_peak_memory(setup, operation):
+    # traced separately from the timing runs, since tracing slows allocation down
+    setup()
+    tracemalloc.start()
+    try:
+        operation()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure_import_seconds(module_name, num_repeats):
+    # each import runs in a fresh interpreter, so nothing is already loaded; the fastest run is kept
+    code = "import time; start_time = time.perf_counter(); import {}; print(time.perf_counter() - start_time)"
+    return min(float(subprocess.run([sys.executable, "-c", code.format(module_name)], check=True, capture_output=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout)
+               for _ in range(num_repeats))
+
+
+def run_benchmarks(names=None, sizes=None, min_seconds=0.5, max_repeats=1000, import_repeats=5):
+    results = {}
+    for name in names or BENCHMARKS:
+        results[name] = {}
+        for size in sizes or DEFAULT_SIZES:
+            setup, operation = BENCHMARKS[name](size)
+            ops_per_sec = time_operation(setup, operation, min_seconds, max_repeats) * OPS_PER_OPERATION.get(name, 1)
+            results[name][str(size)] = {
+                "ops_per_sec": ops_per_sec,
+                "peak_memory_bytes": measure_peak_memory(setup, operation),
+            }
+    return {
+        "python": platform.python_version(),
+        "numpy": Minesweeper.get_numpy() is not None,
+        "import_seconds": {module_name: measure_import_seconds(module_name, import_repeats)
+                           for module_name in IMPORTED_MODULES},
+        "results": results,
+    }
+
+
+def compare_to_baseline(report, baseline, tolerance):
+    # returns (name, size, ops/sec ratio) for every measurement more than tolerance slower than the baseline
+    regressions = []
+    for name, sizes in report["results"].items():
+        for size, measurement in sizes.items():
+            baseline_measurement = baseline.get("results", {}).get(name, {}).get(size)
+            if not baseline_measurement:
+                continue
+            ratio = measurement["ops_per_sec"] / baseline_measurement["ops_per_sec"]
+            if ratio < 1 - tolerance:
+                regressions.append((name, size, ratio))
+    return regressions
+
+
+def format_report(report):
+    lines = ["{:<20} {:>6} {:>16} {:>14}".format("benchmark", "size", "ops/sec", "peak MiB")]
+    for name, sizes in report["results"].items():
+        for size, measurement in sizes.items():
+            lines.append("{:<20} {:>6} {:>16.1f} {:>14.2f}".format(
+                name, size, measurement["ops_per_sec"], measurement["peak_memory_bytes"] / 2 ** 20))
+    for module_name, seconds in report.get("import_seconds", {}).items():
+        lines.append("import {:<20} {:>10.1f} ms".format(module_name, 1000 * seconds))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the board's hot paths")
+    parser.add_argument("--benchmarks", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run (default: all)")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="side lengths of the boards")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="minimum timed seconds per measurement")
+    parser.add_argument("--output", default="bench_output.json", help="where to write the JSON report")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="JSON report to compare against (default: the stored baseline, if present)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before reporting a regression")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.benchmarks, args.sizes, args.min_seconds)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(format_report(report))
+
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.tolerance)
+        for name, size, ratio in regressions:
+            print("REGRESSION: {} at size {} runs at {:.0%} of the baseline".format(name, size, ratio))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,198 @@
+import sys
+import time
+import argparse
+from array import array
+
+import MinesweeperCore
+
+numpy = MinesweeperCore.get_numpy()
+
+# a move's reward is the share of its board's safe cells it revealed, so a won game adds up to 1
+REWARD_LOSS = -1.0
+
+
+class BoardBatch(object):
+    """
+    num_boards boards of one shape held in stacked arrays and stepped together.  cells has shape
+    (num_boards, num_rows, num_cols) and uses the one-byte encoding of Board.cells.  step takes one linear cell
+    index per board and returns observations, rewards and done flags for all of them; a board whose game ended
+    is reset in place with a new layout, so its observation is already that of the next game.  Needs NumPy.
+    """
+
+    def __init__(self, num_boards, num_rows, num_mines, num_cols=None, seed=None, first_click_safe=False):
+        if numpy is None:
+            raise ImportError("BoardBatch needs NumPy")
+        self.num_boards = num_boards
+        self.num_rows = num_rows
+        self.num_cols = num_rows if num_cols is None else num_cols
+        self.num_cells = self.num_rows * self.num_cols
+        self.num_mines = num_mines
+        self.num_safe_cells = self.num_cells - num_mines
+        if not 0 <= num_mines <= self.num_cells - (1 if first_click_safe else 0):
+            raise ValueError("Cannot place {} mines on {} cells".format(num_mines, self.num_cells))
+        self.first_click_safe = first_click_safe
+        self.rng = numpy.random.default_rng(seed)    # Dependency
+
+        self.cells = numpy.empty((num_boards, self.num_rows, self.num_cols), dtype=numpy.uint8)
+        self.num_safe_cells_uncovered = numpy.zeros(num_boards, dtype=numpy.int64)
+        self.mine_uncovered = numpy.zeros(num_boards, dtype=bool)
+        # with first_click_safe, a reset board gets its mines on its next move
+        self.mines_placed = numpy.zeros(num_boards, dtype=bool)
+        self.num_games_won = 0
+        self.num_games_lost = 0
+
+        # observations are Zobrist visible states: 0-8 for an uncovered count, 9 for an uncovered mine and
+        # 255 for a covered cell
+        self.observation_table = numpy.frombuffer(MinesweeperCore.VISIBLE_STATE_TABLE, dtype=numpy.uint8)
+        self.reset_boards(numpy.arange(num_boards))
+
+    def reset(self, boards=None):
+        self.reset_boards(numpy.arange(self.num_boards) if boards is None else numpy.asarray(boards))
+        return self.get_observations()
+
+    def reset_boards(self, boards):
+        self.cells[boards] = MinesweeperCore.COVERED
+        self.num_safe_cells_uncovered[boards] = 0
+        self.mine_uncovered[boards] = False
+        self.mines_placed[boards] = False
+        if not self.first_click_safe:
+            self.place_mines(boards)
+
+    def place_mines(self, boards, excluded_indices=None):
+        # the num_mines cells with the smallest random keys get the mines; an excluded cell's key is out of reach
+        keys = self.rng.random((len(boards), self.num_cells))
+        if excluded_indices is not None:
+            keys[numpy.arange(len(boards)), excluded_indices] = 2.0
+        mines = numpy.zeros((len(boards), self.num_cells), dtype=bool)
+        if self.num_mines:
+            mine_indices = numpy.argpartition(keys, self.num_mines - 1, axis=1)[:, :self.num_mines]
+            numpy.put_along_axis(mines, mine_indices, True, axis=1)
+        mines = mines.reshape(len(boards), self.num_rows, self.num_cols)
+        self.cells[boards] = MinesweeperCore.COVERED \
+            | numpy.where(mines, MinesweeperCore.MINE, self.count_neighbors(mines))
+        self.mines_placed[boards] = True
+
+    @staticmethod
+    def count_neighbors(mines):
+        padded = numpy.pad(mines, ((0, 0), (1, 1), (1, 1))).astype(numpy.uint8)
+        num_rows, num_cols = mines.shape[1:]
+        counts = numpy.zeros(mines.shape, dtype=numpy.uint8)
+        for row_shift, col_shift in MinesweeperCore.NEIGHBOR_SHIFTS:
+            counts += padded[:, 1 + row_shift:1 + row_shift + num_rows, 1 + col_shift:1 + col_shift + num_cols]
+        return counts
+
+    @staticmethod
+    def dilate(bits):
+        # bits plus all eight neighbors of each bit, on every board at once
+        grown = bits.copy()
+        grown[:, :, 1:] |= bits[:, :, :-1]
+        grown[:, :, :-1] |= bits[:, :, 1:]
+        rows = grown.copy()
+        grown[:, 1:, :] |= rows[:, :-1, :]
+        grown[:, :-1, :] |= rows[:, 1:, :]
+        return grown
+
+    def step(self, moves):
+        # the batched Game.update_board and is_game_over; returns (observations, rewards, dones)
+        moves = numpy.asarray(moves, dtype=numpy.int64)
+        boards = numpy.arange(self.num_boards)
+        needs_mines = ~self.mines_placed
+        if needs_mines.any():
+            self.place_mines(boards[needs_mines], moves[needs_mines])
+
+        flat_cells = self.cells.reshape(self.num_boards, self.num_cells)
+        values = flat_cells[boards, moves]
+        is_covered = (values & MinesweeperCore.COVERED) != 0
+        hit_mine = is_covered & ((values & MinesweeperCore.MINE) != 0)
+        # a mine or a number is revealed on its own, a zero floods
+        revealed_alone = is_covered & (values != MinesweeperCore.COVERED)
+        flat_cells[boards[revealed_alone], moves[revealed_alone]] ^= MinesweeperCore.COVERED
+        num_revealed = (revealed_alone & ~hit_mine).astype(numpy.int64)
+        floods = is_covered & (values == MinesweeperCore.COVERED)
+        if floods.any():
+            num_revealed[floods] = self.flood_fill(boards[floods], moves[floods])
+
+        self.num_safe_cells_uncovered += num_revealed
+        self.mine_uncovered |= hit_mine
+        # as in Game.is_game_over, a board with every safe cell uncovered is won even if the move hit a mine,
+        # which only happens on a board without safe cells
+        won = self.num_safe_cells_uncovered == self.num_safe_cells
+        lost = hit_mine & ~won
+        dones = lost | won
+        rewards = num_revealed / max(self.num_safe_cells, 1)
+        rewards[lost] = REWARD_LOSS
+
+        if dones.any():
+            self.num_games_won += int(won.sum())
+            self.num_games_lost += int(lost.sum())
+            self.reset_boards(boards[dones])
+        return self.get_observations(), rewards, dones
+
+    def flood_fill(self, boards, moves):
+        # grows every clicked region through covered zero cells by repeated dilation until none grows, then
+        # uncovers the regions and the numbers bordering them; returns the number of cells revealed per board
+        cells = self.cells[boards]
+        passable = cells == MinesweeperCore.COVERED
+        region = numpy.zeros(cells.shape, dtype=bool)
+        region.reshape(len(boards), self.num_cells)[numpy.arange(len(boards)), moves] = True
+        # boards drop out of the loop as their regions stop growing, so a few large floods don't keep the rest
+        growing = numpy.arange(len(boards))
+        while len(growing):
+            growing_region = region[growing]
+            grown = self.dilate(growing_region) & passable[growing]
+            grown |= growing_region
+            region[growing] = grown
+            growing = growing[(grown != growing_region).any(axis=(1, 2))]
+        is_covered_safe = (cells & (MinesweeperCore.COVERED | MinesweeperCore.MINE)) == MinesweeperCore.COVERED
+        revealed = self.dilate(region) & is_covered_safe
+        cells ^= revealed.astype(numpy.uint8) * MinesweeperCore.COVERED
+        self.cells[boards] = cells
+        return revealed.sum(axis=(1, 2))
+
+    def get_observations(self):
+        return self.observation_table[self.cells]
+
+    def sample_covered_moves(self):
+        # a uniformly random covered cell of every board, drawn from the batch's generator
+        keys = self.rng.random((self.num_boards, self.num_cells))
+        keys[(self.cells.reshape(self.num_boards, self.num_cells) & MinesweeperCore.COVERED) == 0] = -1.0
+        return keys.argmax(axis=1)
+
+    def get_board(self, i):
+        # board i as a Board, e.g. for printing; later steps do not change it
+        board = MinesweeperCore.Board(self.num_rows, self.num_mines, first_click_safe=True,
+                                      num_cols=self.num_cols)    # Dependency
+        if self.mines_placed[i]:
+            board.mine_indices = array('q', numpy.flatnonzero(self.cells[i] & MinesweeperCore.MINE).tolist())
+            board.mines_placed = True
+        board.cells[:] = self.cells[i].tobytes()
+        board.mark_all_cells_changed()
+        board.num_safe_cells_uncovered = int(self.num_safe_cells_uncovered[i])
+        board.mine_uncovered = bool(self.mine_uncovered[i])
+        return board
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="Minesweeper.py batch",
+                                     description="Step many boards in lockstep with random moves")
+    parser.add_argument("--boards", type=int, default=10000, help="number of boards stepped together")
+    parser.add_argument("--size", type=int, default=9, help="number of rows, and of columns unless --cols is given")
+    parser.add_argument("--cols", type=int, default=None, help="number of columns")
+    parser.add_argument("--mines", type=int, default=10, help="number of mines per board")
+    parser.add_argument("--steps", type=int, default=100, help="number of batched steps")
+    parser.add_argument("--seed", type=int, default=0, help="seed for layouts and moves")
+    args = parser.parse_args(argv)
+
+    batch = BoardBatch(args.boards, args.size, args.mines, args.cols, args.seed, first_click_safe=True)
+    start_time = time.perf_counter()
+    for _ in range(args.steps):
+        batch.step(batch.sample_covered_moves())
+    elapsed_seconds = time.perf_counter() - start_time
+    num_games = batch.num_games_won + batch.num_games_lost
+    print("{} moves in {:.2f}s ({:.0f} moves/s), {} games finished, win rate {:.4f}".format(
+        args.boards * args.steps, elapsed_seconds, args.boards * args.steps / elapsed_seconds, num_games,
+        batch.num_games_won / num_games if num_games else 0.0))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
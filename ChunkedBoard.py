@@ -0,0 +1,182 @@
+import random
+import tempfile
+from array import array
+from collections import OrderedDict
+
+import Minesweeper
+
+
+class ChunkedBoard(object):
+    """
+    Board split into square chunks that are generated from the seed the first time they are touched.
+    Rows and columns are unbounded unless num_rows/num_cols are given, and at most max_chunks_in_memory
+    chunks are held at once: the least recently used chunk is dropped, or written to a spill file if it
+    has uncovered cells, and read back when it is touched again.
+    On an unbounded board a very low mine_density lets a single uncover flood an unbounded region.
+    """
+
+    def __init__(self, mine_density, seed=0, chunk_size=64, max_chunks_in_memory=1024, num_rows=None,
+                 num_cols=None):
+        if not 0 <= mine_density <= 1:
+            raise ValueError("mine_density must be between 0 and 1")
+        self.mine_density = mine_density
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.max_chunks_in_memory = max(max_chunks_in_memory, 1)
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+
+        self.num_safe_cells_uncovered = 0
+        self.mine_uncovered = False
+
+        # chunk cells use the same one-byte encoding as Board.cells
+        self.chunks = OrderedDict()
+        self.changed_chunks = set()
+        self.spill_slots = {}
+        self.spill_file = None
+        self.mine_offset_cache = OrderedDict()
+
+    def is_cell_on_board(self, row, col):
+        return (self.num_rows is None or 0 <= row < self.num_rows) \
+            and (self.num_cols is None or 0 <= col < self.num_cols)
+
+    def get_chunk_mine_offsets(self, chunk_row, chunk_col):
+        # depends only on the seed and the chunk's position, so a chunk can be regenerated at any time;
+        # recent results are kept because every chunk generation also needs its eight neighbors' mines
+        key = (chunk_row, chunk_col)
+        mine_offsets = self.mine_offset_cache.get(key)
+        if mine_offsets is not None:
+            self.mine_offset_cache.move_to_end(key)
+            return mine_offsets
+
+        size = self.chunk_size
+        top, left = chunk_row * size, chunk_col * size
+        if self.is_cell_on_board(top, left) and self.is_cell_on_board(top + size - 1, left + size - 1):
+            candidates = range(size * size)
+        else:
+            candidates = [row * size + col for row in range(size) for col in range(size)
+                          if self.is_cell_on_board(top + row, left + col)]
+        rng = random.Random("{}:{}:{}".format(self.seed, chunk_row, chunk_col))
+        mine_offsets = rng.sample(candidates, round(self.mine_density * len(candidates)))
+
+        self.mine_offset_cache[key] = mine_offsets
+        if len(self.mine_offset_cache) > MINE_OFFSET_CACHE_SIZE:
+            self.mine_offset_cache.popitem(last=False)
+        return mine_offsets
+
+    def generate_chunk(self, chunk_row, chunk_col):
+        # The chunk plus a one-cell border holding the mines of the eight surrounding chunks is counted as an
+        # ordinary Board, and the chunk's rows are then cut out of it
+        size = self.chunk_size
+        padded_size = size + 2
+        mine_indices = array('q')
+        for chunk_row_shift in (-1, 0, 1):
+            for chunk_col_shift in (-1, 0, 1):
+                for offset in self.get_chunk_mine_offsets(chunk_row + chunk_row_shift, chunk_col + chunk_col_shift):
+                    row, col = divmod(offset, size)
+                    row += chunk_row_shift * size + 1
+                    col += chunk_col_shift * size + 1
+                    if 0 <= row < padded_size and 0 <= col < padded_size:
+                        mine_indices.append(row * padded_size + col)
+
+        padded = Minesweeper.Board(padded_size, len(mine_indices), rng=0, first_click_safe=True)    # Dependency
+        padded.mine_indices = mine_indices
+        padded.mines_placed = True
+        padded.populate_board_with_all_cells()
+        return bytearray().join(padded.cells[row * padded_size + 1:row * padded_size + 1 + size]
+                                for row in range(1, size + 1))
+
+    def get_chunk(self, key):
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+
+        if key in self.spill_slots:
+            self.spill_file.seek(self.spill_slots[key] * self.chunk_size ** 2)
+            chunk = bytearray(self.spill_file.read(self.chunk_size ** 2))
+        else:
+            chunk = self.generate_chunk(*key)
+        self.chunks[key] = chunk
+        if len(self.chunks) > self.max_chunks_in_memory:
+            self.evict_chunk()
+        return chunk
+
+    def evict_chunk(self):
+        key, chunk = self.chunks.popitem(last=False)
+        if key not in self.changed_chunks:
+            return
+        # unchanged chunks are simply regenerated; changed ones keep a fixed slot in the spill file
+        if self.spill_file is None:
+            self.spill_file = tempfile.TemporaryFile()
+        slot = self.spill_slots.setdefault(key, len(self.spill_slots))
+        self.spill_file.seek(slot * len(chunk))
+        self.spill_file.write(chunk)
+        self.changed_chunks.discard(key)
+
+    def locate(self, row, col):
+        chunk_row, row_in_chunk = divmod(row, self.chunk_size)
+        chunk_col, col_in_chunk = divmod(col, self.chunk_size)
+        return (chunk_row, chunk_col), row_in_chunk * self.chunk_size + col_in_chunk
+
+    def get_value(self, row, col):
+        key, offset = self.locate(row, col)
+        return self.get_chunk(key)[offset]
+
+    def is_mine(self, row, col):
+        return bool(self.get_value(row, col) & Minesweeper.MINE)
+
+    def is_covered(self, row, col):
+        return bool(self.get_value(row, col) & Minesweeper.COVERED)
+
+    def get_num_mines_in_surrounding_cells(self, row, col):
+        return self.get_value(row, col) & Minesweeper.COUNT_MASK
+
+    def uncover(self, row, col):
+        # iterative flood fill over global coordinates; returns the newly revealed (row, col) locations
+        revealed = []
+        if not self.is_cell_on_board(row, col):
+            return revealed
+        pending = [(row, col)]
+        while pending:
+            row, col = pending.pop()
+            key, offset = self.locate(row, col)
+            chunk = self.get_chunk(key)
+            value = chunk[offset]
+            if not value & Minesweeper.COVERED:
+                continue
+
+            chunk[offset] = value ^ Minesweeper.COVERED
+            self.changed_chunks.add(key)
+            revealed.append((row, col))
+            if value & Minesweeper.MINE:
+                self.mine_uncovered = True
+                continue
+            self.num_safe_cells_uncovered += 1
+
+            if value == Minesweeper.COVERED:
+                for row_shift, col_shift in NEIGHBOR_SHIFTS:
+                    if self.is_cell_on_board(row + row_shift, col + col_shift):
+                        pending.append((row + row_shift, col + col_shift))
+        return revealed
+
+    def render_window(self, top, left, num_rows, num_cols):
+        if not (self.is_cell_on_board(top, left) and self.is_cell_on_board(top + num_rows - 1, left + num_cols - 1)):
+            raise ValueError("Window is not on the board")
+        lines = []
+        for row in range(top, top + num_rows):
+            chars = bytes(self.get_value(row, col) for col in range(left, left + num_cols))
+            lines.append('  '.join(chars.translate(Minesweeper.CELL_CHAR_TABLE).decode()) + "\n")
+        return ''.join(lines)
+
+    def close(self):
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
+
+
+MINE_OFFSET_CACHE_SIZE = 64
+
+NEIGHBOR_SHIFTS = [(-1, -1), (-1, 0), (-1, 1),
+                   (0, -1),            (0, 1),
+                   (1, -1),  (1, 0), (1, 1)]
@@ -0,0 +1,271 @@
+import os
+import sys
+import mmap
+import time
+import random
+import argparse
+import multiprocessing
+from array import array
+
+import Minesweeper
+import Solver
+import Storage
+
+
+class GenerationStats(object):
+    def __init__(self, num_boards=0, num_layouts=0, num_repairs=0, elapsed_seconds=0.0):
+        self.num_boards = num_boards
+        self.num_layouts = num_layouts
+        self.num_repairs = num_repairs
+        self.elapsed_seconds = elapsed_seconds
+
+    def add(self, other):
+        self.num_boards += other.num_boards
+        self.num_layouts += other.num_layouts
+        self.num_repairs += other.num_repairs
+
+    @property
+    def boards_per_second(self):
+        return self.num_boards / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def __str__(self):
+        return "{} boards from {} layouts and {} repairs in {:.2f}s ({:.1f} boards/s)".format(
+            self.num_boards, self.num_layouts, self.num_repairs, self.elapsed_seconds, self.boards_per_second)
+
+
+def solve_without_guessing(board, first_index, probability_engine=None):
+    # uncovers first_index, then only cells proven safe; returns the Solver once the board is cleared or stuck
+    solver = Solver.Solver(board)    # Dependency
+    solver.uncover(*divmod(first_index, board.num_cols))
+    while not (board.are_all_safe_cells_flipped() or board.mine_uncovered):
+        safe = list(solver.safe)
+        if not safe and probability_engine is not None:
+            safe = find_safe_cells_by_counting(solver, probability_engine)
+        if not safe:
+            break
+        # uncover every proven cell before propagating, so the solver runs once per wave rather than per cell
+        revealed_indices = []
+        for index in safe:
+            revealed_indices.extend(board.uncover_index(index).indices())
+        solver.update(revealed_indices)
+    return solver
+
+
+def find_safe_cells_by_counting(solver, probability_engine):
+    # cells no consistent placement of the remaining mines can cover, including the global mine count;
+    # only zero probabilities are used, since they are exact while a probability of one may be rounded
+    board = solver.board
+    probabilities, other_cell_probability = probability_engine.get_probabilities(solver)
+    safe = [board.get_index(row, col) for (row, col), probability in probabilities.items() if probability == 0]
+    if not safe and other_cell_probability == 0:
+        frontier = {index for constraint in solver.constraints.values() for index in constraint.unknown}
+        safe = [index for index, value in enumerate(board.cells)
+                if value & Minesweeper.COVERED and index not in frontier and index not in solver.mines]
+    return safe
+
+
+class NoGuessGenerator(object):
+    """
+    Boards that can be cleared from first_click by deduction alone.  Each candidate layout keeps the first click
+    and its neighbors free of mines, so the first click opens an area.  When the solver gets stuck, one mine
+    among the undecided frontier cells is moved to a cell away from the frontier and the layout is checked
+    again.  After max_repairs moves the layout is thrown away for a fresh one, and after max_attempts layouts
+    generate gives up with a ValueError.  A seed always gives the same board.
+    """
+
+    def __init__(self, num_rows, num_mines, num_cols=None, first_click=None, max_repairs=50, topology="plane",
+                 use_probability_engine=True, max_attempts=1000):
+        self.num_rows = num_rows
+        self.num_cols = num_rows if num_cols is None else num_cols
+        self.num_mines = num_mines
+        self.first_click = first_click if first_click is not None else (self.num_rows // 2, self.num_cols // 2)
+        self.max_repairs = max_repairs
+        self.max_attempts = max_attempts
+        self.topology = topology
+        self.probability_engine = Solver.ProbabilityEngine() if use_probability_engine else None    # Dependency
+        self.stats = GenerationStats()    # Dependency
+
+    def generate(self, seed):
+        start_time = time.perf_counter()
+        rng = random.Random(seed)    # Dependency
+        board = Minesweeper.Board(self.num_rows, self.num_mines, rng=rng, first_click_safe=True,
+                                  num_cols=self.num_cols, topology=self.topology)    # Dependency
+        if not board.is_cell_on_board(*self.first_click):
+            raise ValueError("First click {} is not on the board".format(self.first_click))
+        first_index = board.get_index(*self.first_click)
+        opening = {first_index, *board.get_surrounding_indices(first_index)}
+        candidates = [index for index in range(len(board.cells)) if index not in opening]
+        if self.num_mines > len(candidates):
+            raise ValueError("Cannot place {} mines outside the first click's {} cells".format(
+                self.num_mines, len(opening)))
+
+        for _ in range(self.max_attempts):
+            self.stats.num_layouts += 1
+            mine_indices = [candidates[i] for i in board.sample_indices(self.num_mines, len(candidates))]
+            for _ in range(self.max_repairs + 1):
+                self.place_mines(board, mine_indices)
+                solver = solve_without_guessing(board, first_index, self.probability_engine)
+                if board.are_all_safe_cells_flipped():
+                    # hand the board back covered; its layout no longer follows from a Board seed
+                    self.place_mines(board, mine_indices)
+                    board.seed = None
+                    self.stats.num_boards += 1
+                    self.stats.elapsed_seconds += time.perf_counter() - start_time
+                    return board
+                mine_indices = self.repair(board, solver, mine_indices, opening, rng)
+                if mine_indices is None:
+                    break
+                self.stats.num_repairs += 1
+        self.stats.elapsed_seconds += time.perf_counter() - start_time
+        raise ValueError("No board without guessing found in {} layouts of {} mines".format(
+            self.max_attempts, self.num_mines))
+
+    @staticmethod
+    def place_mines(board, mine_indices):
+        board.mine_indices = array('q', sorted(mine_indices))
+        board.mines_placed = True
+        board.board = board.empty_board()
+        board.populate_board_with_all_cells()
+        board.num_safe_cells_uncovered = 0
+        board.mine_uncovered = False
+
+    @staticmethod
+    def repair(board, solver, mine_indices, opening, rng):
+        cells = board.cells
+        frontier = {index for constraint in solver.constraints.values() for index in constraint.unknown}
+        # with no undecided mine on the frontier, the unreached cells are walled off by mines already found
+        stuck_mines = sorted(index for index in frontier if cells[index] & Minesweeper.MINE) or sorted(solver.mines)
+        destinations = [index for index, value in enumerate(cells) if not value & Minesweeper.MINE
+                        and index not in frontier and index not in opening]
+        # prefer cells the solver never reached; an endgame guess has none left, so the mine goes into the
+        # revealed area, which the next check verifies again like the rest of the board
+        destinations = [index for index in destinations if cells[index] & Minesweeper.COVERED] or destinations
+        if not stuck_mines or not destinations:
+            return None
+        mine_indices = set(mine_indices)
+        mine_indices.remove(rng.choice(stuck_mines))
+        mine_indices.add(rng.choice(destinations))
+        return mine_indices
+
+
+# Pool layout: Storage records of covered boards, one per seed in order, all the same size since they share a shape.
+# The name holds every generator setting that changes which board a seed gives, so no other generator reuses it
+def get_pool_path(directory, generator, seed_start, seed_stop):
+    first_row, first_col = generator.first_click
+    return os.path.join(directory, "{}x{}-{}-{}-{}_{}-repairs{}-attempts{}-{}-seeds{}-{}.mswpool".format(
+        generator.num_rows, generator.num_cols, generator.num_mines, generator.topology, first_row, first_col,
+        generator.max_repairs, generator.max_attempts,
+        "counting" if generator.probability_engine is not None else "deduction", seed_start, seed_stop))
+
+
+def generate_pool_chunk(args):
+    # the stats returned cover this chunk only, even when one generator makes every chunk in this process
+    generator, seeds = args
+    stats = generator.stats
+    num_boards, num_layouts, num_repairs = stats.num_boards, stats.num_layouts, stats.num_repairs
+    data = b''.join(Storage.dumps_board(generator.generate(seed)) for seed in seeds)
+    return data, GenerationStats(stats.num_boards - num_boards, stats.num_layouts - num_layouts,
+                                 stats.num_repairs - num_repairs)
+
+
+def build_board_pool(generator, seed_start, seed_stop, path, num_workers=1, seeds_per_chunk=64):
+    start_time = time.perf_counter()
+    chunks = [(generator, range(chunk_start, min(chunk_start + seeds_per_chunk, seed_stop)))
+              for chunk_start in range(seed_start, seed_stop, seeds_per_chunk)]
+    stats = GenerationStats()    # Dependency
+    # written under a temporary name so that an interrupted build never leaves a partial pool behind
+    temporary_path = path + ".tmp"
+    with open(temporary_path, 'wb') as f:
+        if num_workers > 1:
+            with multiprocessing.Pool(num_workers) as pool:
+                for data, chunk_stats in pool.imap(generate_pool_chunk, chunks):
+                    f.write(data)
+                    stats.add(chunk_stats)
+        else:
+            for data, chunk_stats in map(generate_pool_chunk, chunks):
+                f.write(data)
+                stats.add(chunk_stats)
+    os.replace(temporary_path, path)
+    stats.elapsed_seconds = time.perf_counter() - start_time
+    return stats
+
+
+def load_board_pool(directory, generator, seed_start, seed_stop, num_workers=1):
+    # generates and saves the pool the first time it is asked for
+    path = get_pool_path(directory, generator, seed_start, seed_stop)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        build_board_pool(generator, seed_start, seed_stop, path, num_workers)
+    return BoardPool(path)    # Dependency
+
+
+class BoardPool(object):
+    """A saved pool of verified boards, memory-mapped; get_board(i) loads the board of the i-th seed"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+        self.record_size = 0
+        self.num_boards = 0
+        if self.data:
+            board_file = Storage.BoardFile(self.data)    # Dependency
+            self.record_size = board_file.record_size
+            self.num_boards, remainder = divmod(len(self.data), self.record_size)
+            if remainder:
+                raise ValueError("Board pool is truncated")
+
+    def __len__(self):
+        return self.num_boards
+
+    def get_board(self, i):
+        if not 0 <= i < self.num_boards:
+            raise IndexError("board index out of range")
+        return Storage.loads_board(self.data[i * self.record_size:(i + 1) * self.record_size])
+
+    def __iter__(self):
+        for i in range(self.num_boards):
+            yield self.get_board(i)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="Minesweeper.py generate",
+                                     description="Generate boards that can be cleared without guessing")
+    parser.add_argument("--size", type=int, default=16, help="number of rows, and of columns unless --cols is given")
+    parser.add_argument("--cols", type=int, default=None, help="number of columns")
+    parser.add_argument("--mines", type=int, default=40, help="number of mines per board")
+    parser.add_argument("--boards", type=int, default=100, help="number of boards to generate")
+    parser.add_argument("--seed", type=int, default=0, help="first seed; boards use consecutive seeds")
+    parser.add_argument("--first-click", type=int, nargs=2, default=None, metavar=("ROW", "COL"),
+                        help="where every game starts (default: the middle of the board)")
+    parser.add_argument("--max-repairs", type=int, default=50, help="mine moves tried before starting over")
+    parser.add_argument("--max-attempts", type=int, default=1000, help="layouts tried per board before giving up")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--pool-dir", default=None, help="save the boards as a pool in this directory")
+    args = parser.parse_args(argv)
+
+    generator = NoGuessGenerator(args.size, args.mines, args.cols, args.first_click and tuple(args.first_click),
+                                 args.max_repairs, max_attempts=args.max_attempts)    # Dependency
+    if args.pool_dir is None:
+        for seed in range(args.seed, args.seed + args.boards):
+            generator.generate(seed)
+        print(generator.stats)
+        return
+
+    os.makedirs(args.pool_dir, exist_ok=True)
+    path = get_pool_path(args.pool_dir, generator, args.seed, args.seed + args.boards)
+    print(build_board_pool(generator, args.seed, args.seed + args.boards, path, args.workers))
+    print("Saved to {}".format(path))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,16 +1,24 @@
+import codecs
 import sys
-import random
-import itertools
+from collections import deque
+
+# the board and cell logic lives in MinesweeperCore, which headless code can import without the game's UI
+from MinesweeperCore import *
 
 
 class Game(object):
-    def __init__(self, test_mode_parameters=None):
+    def __init__(self, test_mode_parameters=None, use_ansi_rendering=False, io=None, board_backend="auto"):
         self.test_mode_parameters = test_mode_parameters
-        self.ascii_art = AsciiArt()
+        self.use_ansi_rendering = use_ansi_rendering
+        self.board_backend = board_backend
+        self.io = io if io is not None else TerminalIO()    # Dependency
+        # the art and the validators are built on first use, so games in test mode never build them
+        self.cached_ascii_art = None
+        self.cached_param_input_validator = None
+        self.cached_turn_input_validator = None
         if not self.test_mode_parameters:
             self.print_title_screen()
         self.max_side_length_of_grid = 30
-        self.param_input_validator = ParameterInputValidator(self.max_side_length_of_grid)    # Dependency
 
         # variables initialized in separate method to enable reset for additional round
         self.size_of_square_grid = None
@@ -18,10 +26,30 @@ class Game(object):
         self.board = None
         self.is_game_won = None
         self.max_len_of_turn_input_str = None
-        self.turn_input_validator = None
 
         self.initialize_variables()
 
+    @property
+    def ascii_art(self):
+        if self.cached_ascii_art is None:
+            self.cached_ascii_art = AsciiArt()    # Dependency
+        return self.cached_ascii_art
+
+    @property
+    def param_input_validator(self):
+        if self.cached_param_input_validator is None:
+            self.cached_param_input_validator \
+                = ParameterInputValidator(self.max_side_length_of_grid, self.io)    # Dependency
+        return self.cached_param_input_validator
+
+    @property
+    def turn_input_validator(self):
+        # one validator serves every round: it checks moves against whichever board is current
+        if self.cached_turn_input_validator is None:
+            self.cached_turn_input_validator \
+                = TurnInputValidator(self.max_len_of_turn_input_str, self.is_cell_on_board, self.io)    # Dependency
+        return self.cached_turn_input_validator
+
     def initialize_variables(self):
         if not self.test_mode_parameters:
             self.size_of_square_grid = self.get_size_of_grid_from_user()
@@ -29,46 +57,59 @@ class Game(object):
         else:
             self.size_of_square_grid, self.num_mines = self.test_mode_parameters
 
-        self.board = Board(self.size_of_square_grid, self.num_mines)    # Dependency
+        self.board = create_board(self.size_of_square_grid, self.num_mines, self.board_backend)    # Dependency
         self.is_game_won = False
         self.max_len_of_turn_input_str = self.get_max_len_turn_input_str()
-        self.turn_input_validator \
-            = TurnInputValidator(self.max_len_of_turn_input_str, self.board.is_cell_on_board)    # Dependency
+        if self.cached_turn_input_validator is not None:
+            self.cached_turn_input_validator.max_input_length = self.max_len_of_turn_input_str
 
     def play_game(self):
         self.print_instructions()
         while True:
             self.play_round()
-            play_again = input("\n==>Would you like to play again? y/n: ").strip()
+            try:
+                play_again = self.io.read_line("\n==>Would you like to play again? y/n: ").strip()
+            except EOFError:
+                break
             if play_again != "y":
                 break
             self.reset_for_next_round()
-        print("Thanks for playing! See you next time!")
+        self.io.write_line("Thanks for playing! See you next time!")
+        self.io.flush()
 
     def play_round(self):
         while not self.is_game_over():
-            print(self.board)
-            move = self.get_row_col_from_user()
-            self.update_board(move)
+            self.print_board()
+            action, move = self.get_turn_from_user()
+            self.update_board(move, action)
+            self.io.flush()
 
         self.board.uncover_all_cells()
-        print(self.board)
+        self.print_board()
         self.print_outcome()
+        self.io.flush()
+
+    def print_board(self):
+        if self.use_ansi_rendering:
+            self.io.write(self.board.get_renderer().render_ansi())
+        else:
+            self.io.write_line(str(self.board))
 
     def reset_for_next_round(self):
         self.initialize_variables()
 
-    def get_row_col_from_user(self):
+    def get_turn_from_user(self):
         input_message = "==>Enter row number and column number to uncover: "
         error_message = "\nInvalid move.  {}" \
                         + "\nType row (space) col.  Ex: '4 5' (without quotes)" \
+                        + "\nPrefix f to flag or unflag a cell, c to chord.  Ex: 'f 4 5'" \
                         + "\nor press q to quit\n"
 
-        return self.turn_input_validator.get_validated_row_col(input_message, error_message)
+        return self.turn_input_validator.get_validated_turn(input_message, error_message)
 
     def get_size_of_grid_from_user(self):
-        print("First, let's set up the square NxN playing grid.\n")
-        print("What size would you like to choose for N?")
+        self.io.write_line("First, let's set up the square NxN playing grid.\n")
+        self.io.write_line("What size would you like to choose for N?")
 
         input_message = "==>Enter an integer between 0 and {}: ".format(self.max_side_length_of_grid)
         error_message = "\nInvalid response.  {}" \
@@ -87,6 +128,9 @@ class Game(object):
         return self.param_input_validator.get_validated_num_mines(
             input_message, error_message, self.size_of_square_grid)
 
+    def is_cell_on_board(self, row, col):
+        return self.board.is_cell_on_board(row, col)
+
     def is_game_over(self):
         if self.board.are_all_safe_cells_flipped():
             self.is_game_won = True
@@ -101,10 +145,10 @@ class Game(object):
             + max_string_len_of_zero_based_col_index \
             + size_of_single_space_between_indices
 
-    def update_board(self, move):
+    def update_board(self, move, action="uncover"):
         row, col = move
         cell = self.board.get_cell(row, col)
-        self.board.uncover_cell(cell)
+        self.board.apply_action(action, cell)
 
     def print_outcome(self):
         output = ""
@@ -112,7 +156,7 @@ class Game(object):
             output += self.ascii_art.winner
         else:
             output += "Unfortunately that was a mine :/ \nBetter luck next time!"
-        print(output + "\nThanks for playing :)")
+        self.io.write_line(output + "\nThanks for playing :)")
 
     def print_instructions(self):
         header = self.ascii_art.header
@@ -121,217 +165,183 @@ class Game(object):
                        + "\n--For example, to select row 3 and column 4, Enter: 3 4" \
                        + "\n--Row numbers are displayed vertically along the left side." \
                        + "\n--Column numbers are displayed horizontally along the top." \
+                       + "\nTo flag or unflag a cell, put f in front of it.  Ex: f 3 4" \
+                       + "\nTo chord, put c in front of a number whose mines are all flagged;" \
+                       + "\n--its other neighbors are uncovered at once.  Ex: c 3 4" \
                        + "\n(Enter q at any time to quit)\n"
-        print(header + instructions)
+        self.io.write_line(header + instructions)
 
     def print_title_screen(self):
-        print(self.ascii_art.minesweeper_title)
-        print("Welcome to Minesweeper!\n")
-
-
-class Board(object):
-    def __init__(self, side_length_of_square_grid, num_mines):
-        self.side_length_of_square_grid = side_length_of_square_grid
-        self.num_mines = num_mines
-        self.num_safe_cells = self.side_length_of_square_grid**2 - self.num_mines
-        self.num_safe_cells_uncovered = 0
-        self.mine_uncovered = False
-
-        self.transformations_to_get_neighboring_cells = \
-            [(-1, -1), (-1, 0), (-1, 1),
-             (0, -1),            (0, 1),
-             (1, -1),  (1, 0), (1, 1)]
-
-        self.mine_locations = self.create_random_mine_locations()
-        self.board = self.empty_board()
-        self.populate_board_with_all_cells()
-
-    def empty_board(self):
-        num_rows = self.side_length_of_square_grid
-        num_cols = self.side_length_of_square_grid
-        return [[None] * num_cols for _ in range(num_rows)]
-
-    def populate_board_with_all_cells(self):
-        num_rows = self.side_length_of_square_grid
-        num_cols = self.side_length_of_square_grid
-        for row in range(num_rows):
-            for col in range(num_cols):
-                if (row, col) in self.mine_locations:
-                    cell = Mine(row, col)    # Dependency
-                else:
-                    cell = SafeCell(row, col)    # Dependency
-                    self.assign_surrounding_cells_to_cell(cell)
-                self.board[row][col] = cell
-        self.assign_num_surrounding_mines_to_all_safe_cells()
-
-    def create_random_mine_locations(self):
-        possible_mine_locations = itertools.product(
-            range(self.side_length_of_square_grid),
-            range(self.side_length_of_square_grid))
-        return set(random.sample(list(possible_mine_locations), self.num_mines))
+        self.io.write_line(self.ascii_art.minesweeper_title)
+        self.io.write_line("Welcome to Minesweeper!\n")
+
+
+class AsciiArt(object):
+    # class attributes, so the art is built once and every instance shares it
+    winner = "   _____                            _       _" \
+             + "\n  / ____|                          | |     | |" \
+             + "\n | |     ___  _ __   __ _ _ __ __ _| |_ ___| |" \
+             + "\n | |    / _ \| '_ \ / _` | '__/ _` | __/ __| |" \
+             + "\n | |___| (_) | | | | (_| | | | (_| | |_\__ \_|" \
+             + "\n  \_____\___/|_| |_|\__, |_|  \__,_|\__|___(_)" \
+             + "\n  __     __          __/ |                _" \
+             + "\n  \ \   / /         |___/                | |" \
+             + "\n   \ \_/ /__  _   _  __      _____  _ __ | |" \
+             + "\n    \   / _ \| | | | \ \ /\ / / _ \| '_ \| |" \
+             + "\n     | | (_) | |_| |  \ V  V / (_) | | | |_|" \
+             + "\n     |_|\___/ \__,_|   \_/\_/ \___/|_| |_(_) \n"
+
+    header = "                       _                _                 " \
+             + "\n  /\  /\_____      __ | |_ ___    _ __ | | __ _ _   _   _ " \
+             + "\n / /_/ / _ \ \ /\ / / | __/ _ \  | '_ \| |/ _` | | | | (_)" \
+             + "\n/ __  / (_) \ V  V /  | || (_) | | |_) | | (_| | |_| |  _ " \
+             + "\n\/ /_/ \___/ \_/\_/    \__\___/  | .__/|_|\__,_|\__, | (_)" \
+             + "\n                                 |_|            |___/     "
+
+    minesweeper_title = "\n    __  ____" \
+                        + "\n   /  |/  (_)___  ___" \
+                        + "\n  / /|_/ / / __ \/ _ \\" \
+                        + "\n / /  / / / / / /  __/ " \
+                        + "\n/_/  /_/_/_/ /_/\___/" \
+                        + "\n   ______      _____  ___  ____  ___  _____" \
+                        + "\n  / ___/ | /| / / _ \/ _ \/ __ \/ _ \/ ___/" \
+                        + "\n (__  )| |/ |/ /  __/  __/ /_/ /  __/ /    " \
+                        + "\n/____/ |__/|__/\___/\___/ .___/\___/_/" \
+                        + "\n                       /_/             "
+
+
+class WrongNumberOfArguments(TypeError):
+    """Custom Exception for UserInputValidator"""
+    pass
 
-    def is_cell_on_board(self, row, col):
-        return (0 <= row < self.side_length_of_square_grid) \
-            and (0 <= col < self.side_length_of_square_grid)
-
-    def are_all_safe_cells_flipped(self):
-        return self.num_safe_cells_uncovered == self.num_safe_cells
-
-    def assign_surrounding_cells_to_cell(self, cell):
-        surrounding_cell_locations = []
-        for transformation in self.transformations_to_get_neighboring_cells:
-            possible_surr_cell_location = (cell.row + transformation[0], cell.col + transformation[1])
-            if self.is_cell_on_board(*possible_surr_cell_location):
-                surrounding_cell_locations.append(possible_surr_cell_location)
-        cell.surrounding_cell_locations = surrounding_cell_locations
-
-    def assign_num_surrounding_mines_to_all_safe_cells(self):
-        for row in self.board:
-            for cell in row:
-                if type(cell) is SafeCell:
-                    self.assign_num_surrounding_mines(cell)
-
-    def assign_num_surrounding_mines(self, cell):
-        count = 0
-        for surrounding_cell in cell.surrounding_cell_locations:
-            if type(self.get_cell(*surrounding_cell)) is Mine:
-                count += 1
-        cell.num_mines_in_surrounding_cells = count
-
-    def get_cell(self, row, col):
-        return self.board[row][col]
-
-    def uncover_all_cells(self):
-        for row in range(self.side_length_of_square_grid):
-            for col in range(self.side_length_of_square_grid):
-                cell = self.get_cell(row, col)
-                cell.uncover()
-
-    def uncover_cell(self, cell):
-        # if cell is already uncovered, don't do anything
-        if not cell.is_covered:
-            return
-
-        cell.uncover()
-
-        # Base case 1: cell is a Mine
-        if type(cell) is Mine:
-            self.mine_uncovered = True
-            return
-
-        self.num_safe_cells_uncovered += 1
-
-        # Base case 2: cell has a mine surrounding it
-        if not cell.has_zero_surrounding_mines():
-            return
-
-        # Recursive step
-        for surrounding_cell_location in cell.surrounding_cell_locations:
-            row, col = surrounding_cell_location
-            surrounding_cell = self.get_cell(row, col)
-            self.uncover_cell(surrounding_cell)
-
-    def __str__(self):
-        output = "\n    " + ' '.join([str(col).rjust(2) for col in range(self.side_length_of_square_grid)]) + "\n"
-        output += "    " + "-- " * self.side_length_of_square_grid + "\n"
-        for i, row in enumerate(self.board):
-            output += str(i).rjust(2) + " | " + '  '.join([str(x) for x in row]) + "\n"
-        return output
-
-
-class Cell(object):
-    def __init__(self, row, col):
-        self.row = row
-        self.col = col
-        self.is_covered = True
-        self.num_mines_in_surrounding_cells = 0
-        self.surrounding_cell_locations = []
-
-    def get_name_representation(self):
-        raise NotImplementedError
 
-    def uncover(self):
-        self.is_covered = False
+class GameTerminated(KeyboardInterrupt):
+    """Custom Exception for UserInputValidator"""
+    pass
 
-    def __str__(self):
-        if self.is_covered:
-            return 'X'
-        return self.get_name_representation()
 
+class GameIO(object):
+    """Where a Game reads its input lines and writes its output"""
 
-class SafeCell(Cell):
-    def get_name_representation(self):
-        if self.has_zero_surrounding_mines():
-            return '.'
-        return str(self.num_mines_in_surrounding_cells)
+    def read_line(self, prompt):
+        raise NotImplementedError
 
-    def has_zero_surrounding_mines(self):
-        return self.num_mines_in_surrounding_cells == 0
+    def write(self, text):
+        raise NotImplementedError
 
+    def write_line(self, text=""):
+        self.write(text + "\n")
+
+    def flush(self):
+        pass
+
+
+class TerminalIO(GameIO):
+    """Prompts with input() and writes straight to stdout"""
+
+    def read_line(self, prompt):
+        return input(prompt)
+
+    def write(self, text):
+        sys.stdout.write(text)
+
+
+class StreamIO(GameIO):
+    """
+    Reads input lines from a stream as many at a time as have already arrived and holds output until flush(),
+    which the Game calls once per turn.  The output stream itself is only flushed once the queued input lines run
+    out, so that a scripted game piped through stdin costs a few large reads and writes rather than a syscall pair
+    per prompt, while a program answering one prompt at a time still gets each one as soon as it is asked.
+    """
+
+    def __init__(self, input_stream, output_stream, read_size=1 << 16):
+        self.input_stream = input_stream
+        self.output_stream = output_stream
+        self.read_size = read_size
+        self.pending_lines = deque()
+        self.pending_output = []
+        # read1 returns whatever a pipe already holds instead of waiting for read_size bytes or the end of input
+        self.read_available = getattr(getattr(input_stream, "buffer", None), "read1", None)
+        self.decoder = codecs.getincrementaldecoder(getattr(input_stream, "encoding", None) or "utf-8")()
+        self.partial_line = ""
+
+    def read_line(self, prompt):
+        self.write(prompt)
+        if not self.pending_lines:
+            self.flush()
+            self.pending_lines.extend(self.read_lines())
+            if not self.pending_lines:
+                raise EOFError("End of input")
+        return self.pending_lines.popleft().rstrip("\r\n")
+
+    def read_lines(self):
+        """Returns the complete lines that have arrived, waiting only until there is at least one"""
+        if self.read_available is None:
+            # a stream held in memory never waits, so it can simply be read in one go
+            return self.input_stream.readlines(self.read_size)
+        while True:
+            data = self.read_available(self.read_size)
+            lines = (self.partial_line + self.decoder.decode(data, final=not data)).split("\n")
+            self.partial_line = lines.pop()
+            if not data:
+                if self.partial_line:
+                    lines.append(self.partial_line)
+                    self.partial_line = ""
+                return lines
+            if lines:
+                return lines
 
-class Mine(Cell):
-    def get_name_representation(self):
-        return 'M'
+    def write(self, text):
+        self.pending_output.append(text)
 
+    def flush(self):
+        if self.pending_output:
+            self.output_stream.write("".join(self.pending_output))
+            self.pending_output = []
+        # while lines from the last read are still queued nobody is waiting on the output yet
+        if not self.pending_lines:
+            self.output_stream.flush()
 
-class AsciiArt(object):
-    def __init__(self):
-        self.winner = "   _____                            _       _" \
-                      + "\n  / ____|                          | |     | |" \
-                      + "\n | |     ___  _ __   __ _ _ __ __ _| |_ ___| |" \
-                      + "\n | |    / _ \| '_ \ / _` | '__/ _` | __/ __| |" \
-                      + "\n | |___| (_) | | | | (_| | | | (_| | |_\__ \_|" \
-                      + "\n  \_____\___/|_| |_|\__, |_|  \__,_|\__|___(_)" \
-                      + "\n  __     __          __/ |                _" \
-                      + "\n  \ \   / /         |___/                | |" \
-                      + "\n   \ \_/ /__  _   _  __      _____  _ __ | |" \
-                      + "\n    \   / _ \| | | | \ \ /\ / / _ \| '_ \| |" \
-                      + "\n     | | (_) | |_| |  \ V  V / (_) | | | |_|" \
-                      + "\n     |_|\___/ \__,_|   \_/\_/ \___/|_| |_(_) \n"
-
-        self.header = "                       _                _                 " \
-                      + "\n  /\  /\_____      __ | |_ ___    _ __ | | __ _ _   _   _ " \
-                      + "\n / /_/ / _ \ \ /\ / / | __/ _ \  | '_ \| |/ _` | | | | (_)" \
-                      + "\n/ __  / (_) \ V  V /  | || (_) | | |_) | | (_| | |_| |  _ " \
-                      + "\n\/ /_/ \___/ \_/\_/    \__\___/  | .__/|_|\__,_|\__, | (_)" \
-                      + "\n                                 |_|            |___/     "
-
-        self.minesweeper_title = "\n    __  ____" \
-                                 + "\n   /  |/  (_)___  ___" \
-                                 + "\n  / /|_/ / / __ \/ _ \\" \
-                                 + "\n / /  / / / / / /  __/ " \
-                                 + "\n/_/  /_/_/_/ /_/\___/" \
-                                 + "\n   ______      _____  ___  ____  ___  _____" \
-                                 + "\n  / ___/ | /| / / _ \/ _ \/ __ \/ _ \/ ___/" \
-                                 + "\n (__  )| |/ |/ /  __/  __/ /_/ /  __/ /    " \
-                                 + "\n/____/ |__/|__/\___/\___/ .___/\___/_/" \
-                                 + "\n                       /_/             "
 
+class MemoryIO(GameIO):
+    """Feeds a Game a list of input lines and collects its output, for scripts and tests"""
 
-class WrongNumberOfArguments(TypeError):
-    """Custom Exception for UserInputValidator"""
-    pass
+    def __init__(self, input_lines=()):
+        self.pending_lines = deque(input_lines)
+        self.output = []
 
+    def read_line(self, prompt):
+        self.write(prompt)
+        if not self.pending_lines:
+            raise EOFError("End of input")
+        return self.pending_lines.popleft()
 
-class GameTerminated(KeyboardInterrupt):
-    """Custom Exception for UserInputValidator"""
-    pass
+    def write(self, text):
+        self.output.append(text)
+
+    def getvalue(self):
+        return "".join(self.output)
 
 
 class UserInputValidator(object):
-    def __init__(self):
+    def __init__(self, io=None):
         self.termination_str = "q"
+        self.io = io if io is not None else TerminalIO()    # Dependency
 
-    @staticmethod
-    def get_data_from_user(input_message, error_message, validation_function, extra_vf_args=()):
+    def get_data_from_user(self, input_message, error_message, validation_function, extra_vf_args=()):
         while True:
             try:
-                user_input = input(input_message).strip()
-                return validation_function(user_input, *extra_vf_args)
-            except GameTerminated:
+                user_input = self.io.read_line(input_message).strip()
+                start_time = instrumentation.start()
+                validated_input = validation_function(user_input, *extra_vf_args)
+                if start_time is not None:
+                    instrumentation.record("input.validate", start_time)
+                return validated_input
+            except (GameTerminated, EOFError):
+                self.io.flush()
                 sys.exit()
             except (ValueError, TypeError) as e:
-                print(error_message.format(e))
+                self.io.write_line(error_message.format(e))
 
     @staticmethod
     def validate_num_arguments(args_list, expected_num_arguments):
@@ -351,7 +361,7 @@ class UserInputValidator(object):
 
     def is_game_terminated(self, user_input):
         if user_input == self.termination_str:
-            print("Thanks for playing! See you next time!")
+            self.io.write_line("Thanks for playing! See you next time!")
             raise GameTerminated("Game Terminated")
 
     @staticmethod
@@ -361,11 +371,12 @@ class UserInputValidator(object):
 
 
 class TurnInputValidator(UserInputValidator):
-    def __init__(self, max_input_length, is_row_col_on_board_function):
-        super(TurnInputValidator, self).__init__()
+    def __init__(self, max_input_length, is_row_col_on_board_function, io=None):
+        super(TurnInputValidator, self).__init__(io)
         self.max_input_length = max_input_length
         self.is_row_col_on_board_function = is_row_col_on_board_function
         self.expected_num_arguments = 2
+        self.actions_by_prefix = {"f": "flag", "c": "chord"}
 
     def _validate_row_col(self, user_input):
         self.is_game_terminated(user_input)
@@ -383,6 +394,18 @@ class TurnInputValidator(UserInputValidator):
     def get_validated_row_col(self, input_message, error_message):
         return self.get_data_from_user(input_message, error_message, self._validate_row_col)
 
+    def _validate_turn(self, user_input):
+        # 'row col' uncovers; a prefix from actions_by_prefix selects another action on that cell
+        self.is_game_terminated(user_input)
+        prefix, _, rest = user_input.partition(' ')
+        action = self.actions_by_prefix.get(prefix)
+        if action is None:
+            return "uncover", self._validate_row_col(user_input)
+        return action, self._validate_row_col(rest.strip())
+
+    def get_validated_turn(self, input_message, error_message):
+        return self.get_data_from_user(input_message, error_message, self._validate_turn)
+
     def _validate_input_length(self, user_input):
         if len(user_input) > self.max_input_length:
             raise ValueError("Input is too many characters")
@@ -393,8 +416,8 @@ class TurnInputValidator(UserInputValidator):
 
 
 class ParameterInputValidator(UserInputValidator):
-    def __init__(self, max_side_length):
-        super(ParameterInputValidator, self).__init__()
+    def __init__(self, max_side_length, io=None):
+        super(ParameterInputValidator, self).__init__(io)
         self.min_side_length = 0
         self.max_side_length = max_side_length
         self.min_num_mines = 0
@@ -419,5 +442,31 @@ class ParameterInputValidator(UserInputValidator):
 
 
 if __name__ == "__main__":
-    g = Game()
-    g.play_game()
+    if sys.argv[1:2] == ["simulate"]:
+        import Simulation
+        Simulation.main(sys.argv[2:])
+    elif sys.argv[1:2] == ["generate"]:
+        import Generator
+        Generator.main(sys.argv[2:])
+    elif sys.argv[1:2] == ["serve"]:
+        import Server
+        Server.main(sys.argv[2:])
+    elif sys.argv[1:2] == ["tournament"]:
+        import Tournament
+        Tournament.main(sys.argv[2:])
+    elif sys.argv[1:2] == ["patterns"]:
+        import Patterns
+        Patterns.main(sys.argv[2:])
+    elif sys.argv[1:2] == ["batch"]:
+        import BoardBatch
+        BoardBatch.main(sys.argv[2:])
+    else:
+        if "--instrument" in sys.argv[1:]:
+            import json
+            import atexit
+            instrumentation.enable()
+            atexit.register(lambda: print(json.dumps(instrumentation.report(), indent=1)))
+        # piped input is read in batches with output flushed once per turn
+        io = TerminalIO() if sys.stdin.isatty() else StreamIO(sys.stdin, sys.stdout)    # Dependency
+        g = Game(use_ansi_rendering="--ansi" in sys.argv[1:], io=io)
+        g.play_game()
@@ -0,0 +1,1355 @@
+import re
+import time
+import random
+import itertools
+from array import array
+from collections import OrderedDict
+from collections.abc import Set
+from contextlib import contextmanager
+
+# the names Minesweeper re-exports; numpy is left out, as it is only loaded on first use
+__all__ = ["get_numpy", "COUNT_MASK", "MINE", "COVERED", "FLAGGED", "COVERED_ZERO_BYTE", "COVERED_ZERO_RUN",
+           "COVERED_ZERO_RUN_OR_COVERED_NUMBER", "UNCOVERED_SAFE_BYTES", "TOPOLOGIES", "NEIGHBOR_SHIFTS",
+           "NEIGHBOR_TABLE_CACHE_SIZE", "NEIGHBOR_TABLE_MAX_CELLS", "NUMPY_MIN_CELLS", "compute_neighbor_indices",
+           "NeighborTable", "neighbor_tables", "get_neighbor_table", "NUM_VISIBLE_STATES", "UNCOVERED_MINE_STATE",
+           "FLAG_STATE", "HIDDEN_STATE", "get_visible_state", "VISIBLE_STATE_TABLE", "zobrist_keys", "zobrist_rng",
+           "get_zobrist_keys", "Board", "count_set_bits", "count_bits", "BitBoard", "ONE_BIT_RUN", "BIT_TO_BYTE_TABLES",
+           "BITBOARD_MAX_CELLS", "BOARD_BACKENDS", "create_board", "UNCOVER_ALL_TABLE", "COVER_TABLE", "get_cell_char",
+           "CELL_CHAR_TABLE", "ANSI_CLEAR_SCREEN", "ANSI_CLEAR_TO_END_OF_SCREEN", "ANSI_MOVE_CURSOR", "BoardRenderer",
+           "RevealedCells", "BoardView", "RowView", "Cell", "SafeCell", "Mine", "TimingHistogram", "Instrumentation",
+           "instrumentation"]
+
+
+def get_numpy():
+    # NumPy is optional and takes longer to import than the rest of the game, so the first large board loads
+    # it; adjacency counts fall back to pure Python without it.  Once loaded it is the module global numpy
+    module_globals = globals()
+    if "numpy" not in module_globals:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        module_globals["numpy"] = numpy
+    return module_globals["numpy"]
+
+
+def __getattr__(name):
+    # MinesweeperCore.numpy before any board has loaded it
+    if name == "numpy":
+        return get_numpy()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+# Every square of a Board is packed into one byte of Board.cells:
+# the low bits hold the number of surrounding mines, the high bits its state
+COUNT_MASK = 0x0F
+MINE = 0x10
+COVERED = 0x20
+FLAGGED = 0x40
+
+# Byte patterns the flood fill hands to the regex engine so that whole runs of a row are scanned in C
+COVERED_ZERO_BYTE = bytes([COVERED])
+COVERED_ZERO_RUN = re.compile(re.escape(COVERED_ZERO_BYTE) + b'+')
+COVERED_ZERO_RUN_OR_COVERED_NUMBER = re.compile(
+    b'(' + re.escape(COVERED_ZERO_BYTE) + b'+)|['
+    + re.escape(bytes([COVERED | 1])) + b'-' + re.escape(bytes([COVERED | 8])) + b']')
+UNCOVERED_SAFE_BYTES = bytes(range(9))
+
+# On a torus the top row neighbors the bottom row and the left column the right column
+TOPOLOGIES = ("plane", "torus")
+NEIGHBOR_SHIFTS = [(row_shift, col_shift) for row_shift in (-1, 0, 1) for col_shift in (-1, 0, 1)
+                   if row_shift or col_shift]
+NEIGHBOR_TABLE_CACHE_SIZE = 16
+NEIGHBOR_TABLE_MAX_CELLS = 1 << 18
+# below this many cells NumPy's per-call overhead outweighs its speed, so mines are counted in pure Python
+NUMPY_MIN_CELLS = 256
+
+
+def compute_neighbor_indices(num_rows, num_cols, topology, index):
+    row, col = divmod(index, num_cols)
+    if topology == "torus":
+        return [((row + row_shift) % num_rows) * num_cols + (col + col_shift) % num_cols
+                for row_shift, col_shift in NEIGHBOR_SHIFTS]
+    rows = range(max(row - 1, 0), min(row + 2, num_rows))
+    cols = range(max(col - 1, 0), min(col + 2, num_cols))
+    return [r * num_cols + c for r in rows for c in cols if r != row or c != col]
+
+
+class NeighborTable(object):
+    """
+    Neighbor indices of every cell of one board shape, stored flat: the neighbors of cell i are
+    indices[starts[i]:starts[i + 1]].  Tables are shared read-only by every Board of the same shape.
+    """
+
+    def __init__(self, num_rows, num_cols, topology="plane"):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.topology = topology
+        self.starts = array('i', [0])
+        self.indices = array('i')
+        if num_rows * num_cols >= NUMPY_MIN_CELLS and get_numpy() is not None:
+            self.build_with_numpy()
+            return
+
+        for index in range(num_rows * num_cols):
+            self.indices.extend(compute_neighbor_indices(num_rows, num_cols, topology, index))
+            self.starts.append(len(self.indices))
+
+    def build_with_numpy(self):
+        numpy = get_numpy()
+        rows, cols = numpy.divmod(numpy.arange(self.num_rows * self.num_cols), self.num_cols)
+        neighbors = numpy.empty((len(rows), len(NEIGHBOR_SHIFTS)), dtype=numpy.int32)
+        is_on_board = numpy.ones(neighbors.shape, dtype=bool)
+        for k, (row_shift, col_shift) in enumerate(NEIGHBOR_SHIFTS):
+            neighbor_rows = rows + row_shift
+            neighbor_cols = cols + col_shift
+            if self.topology == "torus":
+                neighbor_rows %= self.num_rows
+                neighbor_cols %= self.num_cols
+            else:
+                is_on_board[:, k] = (neighbor_rows >= 0) & (neighbor_rows < self.num_rows) \
+                    & (neighbor_cols >= 0) & (neighbor_cols < self.num_cols)
+            neighbors[:, k] = neighbor_rows * self.num_cols + neighbor_cols
+        # boolean indexing keeps row-major order, so each cell's neighbors stay together
+        self.indices.frombytes(neighbors[is_on_board].tobytes())
+        self.starts.frombytes(numpy.cumsum(is_on_board.sum(axis=1), dtype=numpy.int32).tobytes())
+
+    def get_neighbors(self, index):
+        return self.indices[self.starts[index]:self.starts[index + 1]]
+
+
+# process-wide LRU of NeighborTables keyed by (num_rows, num_cols, topology)
+neighbor_tables = OrderedDict()
+
+
+def get_neighbor_table(num_rows, num_cols, topology="plane"):
+    key = (num_rows, num_cols, topology)
+    neighbor_table = neighbor_tables.get(key)
+    if neighbor_table is None:
+        neighbor_table = neighbor_tables[key] = NeighborTable(num_rows, num_cols, topology)    # Dependency
+        if len(neighbor_tables) > NEIGHBOR_TABLE_CACHE_SIZE:
+            neighbor_tables.popitem(last=False)
+    else:
+        neighbor_tables.move_to_end(key)
+    return neighbor_table
+
+
+# Zobrist keys of the visible board: one random 64-bit key per cell index and visible state, where the states
+# are an uncovered count of 0-8, an uncovered mine and a flag.  A covered cell without a flag adds nothing
+NUM_VISIBLE_STATES = 11
+UNCOVERED_MINE_STATE = 9
+FLAG_STATE = 10
+HIDDEN_STATE = 0xFF
+
+
+def get_visible_state(value):
+    if value & COVERED:
+        return FLAG_STATE if value & FLAGGED else HIDDEN_STATE
+    return UNCOVERED_MINE_STATE if value & MINE else value & COUNT_MASK
+
+
+VISIBLE_STATE_TABLE = bytes(get_visible_state(value) for value in range(256))
+
+# keys depend only on the cell index, so one table grown on demand serves every board; the fixed seed makes
+# hashes comparable across processes and runs
+zobrist_keys = array('Q')
+zobrist_rng = random.Random(0x5EED)
+
+
+def get_zobrist_keys(num_cells):
+    num_missing = num_cells * NUM_VISIBLE_STATES - len(zobrist_keys)
+    if num_missing > 0:
+        zobrist_keys.extend(zobrist_rng.getrandbits(64) for _ in range(num_missing))
+    return zobrist_keys
+
+
+class Board(object):
+    def __init__(self, num_rows=None, num_mines=None, rng=None, first_click_safe=False, num_cols=None,
+                 topology="plane", side_length_of_square_grid=None):
+        start_time = instrumentation.start()
+        num_rows = self.get_num_rows_argument(num_rows, num_mines, side_length_of_square_grid)
+        if topology not in TOPOLOGIES:
+            raise ValueError("Unknown topology {!r}".format(topology))
+        if topology == "torus" and min(num_rows, num_cols if num_cols is not None else num_rows) < 3:
+            raise ValueError("A torus needs at least 3 rows and 3 columns")
+
+        # boards are square unless num_cols is given
+        self.num_rows = num_rows
+        self.num_cols = num_rows if num_cols is None else num_cols
+        self.num_mines = num_mines
+        self.num_safe_cells = self.num_rows * self.num_cols - self.num_mines
+        self.num_safe_cells_uncovered = 0
+        self.mine_uncovered = False
+        self.topology = topology
+
+        # number of flagged neighbors of every cell, allocated on the first flag
+        self.num_flags = 0
+        self.flag_counts = None
+        self.neighbor_table = None
+
+        self.transformations_to_get_neighboring_cells = \
+            [(-1, -1), (-1, 0), (-1, 1),
+             (0, -1),            (0, 1),
+             (1, -1),  (1, 0), (1, 1)]
+
+        # rng may be a seed or a random.Random instance; a seed is kept so that the game can be rebuilt later
+        if rng is None:
+            rng = random.SystemRandom().getrandbits(64)
+        self.seed = None if isinstance(rng, random.Random) else rng
+        self.rng = rng if isinstance(rng, random.Random) else random.Random(rng)
+        self.first_click_safe = first_click_safe
+
+        self.cells = None
+        self.renderer = None
+        self.move_log = None
+        # undo and redo stacks of (action, index, revealed, num_safe_cells_uncovered, mine_uncovered), kept once
+        # enable_undo is called
+        self.history = None
+        self.undone = None
+        # Zobrist hash of the visible cells, kept up to date once enable_visible_hash is called
+        self.visible_hash = None
+        self.zobrist_keys = None
+        self.mine_indices = array('q')
+        self.mines_placed = False
+        if not self.first_click_safe:
+            # otherwise placement is deferred until the first uncover, which must not hit a mine
+            self.mine_indices = self.create_random_mine_indices()
+            self.mines_placed = True
+        self.board = self.empty_board()
+        if self.mines_placed:
+            self.populate_board_with_all_cells()
+
+        if start_time is not None:
+            instrumentation.record("board.init", start_time, num_cells=len(self.cells))
+
+    @staticmethod
+    def get_num_rows_argument(num_rows, num_mines, side_length_of_square_grid):
+        # side_length_of_square_grid is the name num_rows had while every board was square
+        if side_length_of_square_grid is not None:
+            num_rows = side_length_of_square_grid
+        if num_rows is None or num_mines is None:
+            raise TypeError("A board needs num_rows and num_mines")
+        return num_rows
+
+    @property
+    def side_length_of_square_grid(self):
+        if self.num_rows != self.num_cols:
+            raise AttributeError("A board of {} rows and {} columns is not square".format(self.num_rows, self.num_cols))
+        return self.num_rows
+
+    @property
+    def mine_locations(self):
+        return {divmod(index, self.num_cols) for index in self.mine_indices}
+
+    @mine_locations.setter
+    def mine_locations(self, mine_locations):
+        self.mine_indices = array('q', [self.get_index(row, col) for row, col in mine_locations])
+        self.mines_placed = True
+
+    def empty_board(self):
+        self.cells = bytearray([COVERED]) * (self.num_rows * self.num_cols)
+        self.num_flags = 0
+        self.flag_counts = None
+        if self.visible_hash is not None:
+            self.visible_hash = 0
+        self.mark_all_cells_changed()
+        return BoardView(self)    # Dependency
+
+    def populate_board_with_all_cells(self):
+        start_time = instrumentation.start()
+        numpy = get_numpy() if len(self.cells) >= NUMPY_MIN_CELLS else None
+        if numpy is not None:
+            mine_indices = numpy.frombuffer(self.mine_indices, dtype=numpy.int64)
+            numpy.frombuffer(self.cells, dtype=numpy.uint8)[mine_indices] |= MINE
+        else:
+            cells = self.cells
+            for index in self.mine_indices:
+                cells[index] |= MINE
+        self.assign_num_surrounding_mines_to_all_safe_cells()
+
+        if start_time is not None:
+            instrumentation.record("board.populate", start_time, num_mines=len(self.mine_indices))
+
+    def place_mines(self, excluded_index=None):
+        # flags planted before the first click survive the new layout
+        flagged_indices = [index for index, value in enumerate(self.cells) if value & FLAGGED] if self.num_flags else []
+        self.mine_indices = self.create_random_mine_indices(excluded_index)
+        self.mines_placed = True
+        self.board = self.empty_board()
+        self.populate_board_with_all_cells()
+        history, self.history = self.history, None
+        for index in flagged_indices:
+            self.toggle_flag_index(index)
+        self.history = history
+
+    def create_random_mine_indices(self, excluded_index=None):
+        start_time = instrumentation.start()
+        # sample linear indices directly; the excluded index is skipped by sampling one fewer candidate
+        # and shifting every candidate at or past it up by one
+        num_candidates = self.num_rows * self.num_cols - (excluded_index is not None)
+        if not 0 <= self.num_mines <= num_candidates:
+            raise ValueError("Cannot place {} mines in {} cells".format(self.num_mines, num_candidates))
+
+        mine_indices = self.sample_indices(self.num_mines, num_candidates)
+        if excluded_index is not None:
+            mine_indices = [index + (index >= excluded_index) for index in mine_indices]
+
+        if start_time is not None:
+            instrumentation.record("board.place_mines", start_time, num_mines=self.num_mines)
+        return array('q', mine_indices)
+
+    def sample_indices(self, num_chosen, num_candidates):
+        if num_chosen * 4 <= num_candidates:
+            return self.sample_by_rejection(num_chosen, num_candidates)
+        if num_chosen * 2 <= num_candidates:
+            return self.sample_by_partial_shuffle(num_chosen, num_candidates)
+
+        # mostly mines: choose the safe cells instead and keep everything else
+        is_chosen = bytearray([1]) * num_candidates
+        for index in self.sample_indices(num_candidates - num_chosen, num_candidates):
+            is_chosen[index] = 0
+        return list(itertools.compress(range(num_candidates), is_chosen))
+
+    def sample_by_rejection(self, num_chosen, num_candidates):
+        # sparse boards: collisions are rare, so drawing until num_chosen distinct indices is close to O(num_chosen)
+        randrange = self.rng.randrange
+        chosen = set()
+        while len(chosen) < num_chosen:
+            chosen.add(randrange(num_candidates))
+        return sorted(chosen)
+
+    def sample_by_partial_shuffle(self, num_chosen, num_candidates):
+        # denser boards: the first num_chosen steps of a Fisher-Yates shuffle of range(num_candidates),
+        # with only the displaced entries stored
+        randrange = self.rng.randrange
+        displaced = {}
+        chosen = []
+        for i in range(num_chosen):
+            j = randrange(i, num_candidates)
+            chosen.append(displaced.get(j, j))
+            displaced[j] = displaced.get(i, i)
+        return chosen
+
+    def is_cell_on_board(self, row, col):
+        return (0 <= row < self.num_rows) and (0 <= col < self.num_cols)
+
+    def are_all_safe_cells_flipped(self):
+        return self.num_safe_cells_uncovered == self.num_safe_cells
+
+    def get_index(self, row, col):
+        return row * self.num_cols + col
+
+    def is_index_covered(self, index):
+        return bool(self.cells[index] & COVERED)
+
+    def get_covered_indices(self):
+        return [index for index, value in enumerate(self.cells) if value & COVERED]
+
+    def get_surrounding_cell_locations(self, row, col):
+        return [divmod(index, self.num_cols) for index in self.get_surrounding_indices(self.get_index(row, col))]
+
+    def get_neighbor_table(self):
+        # very large boards compute neighbors on the fly rather than hold a table 8 times their size
+        if self.neighbor_table is None and self.num_rows * self.num_cols <= NEIGHBOR_TABLE_MAX_CELLS:
+            self.neighbor_table = get_neighbor_table(self.num_rows, self.num_cols, self.topology)
+        return self.neighbor_table
+
+    def get_surrounding_indices(self, index):
+        neighbor_table = self.get_neighbor_table()
+        if neighbor_table is None:
+            return compute_neighbor_indices(self.num_rows, self.num_cols, self.topology, index)
+        return neighbor_table.get_neighbors(index)
+
+    def assign_num_surrounding_mines_to_all_safe_cells(self):
+        if len(self.cells) >= NUMPY_MIN_CELLS and get_numpy() is not None:
+            self.assign_num_surrounding_mines_with_numpy()
+            return
+
+        # each mine adds one to its neighbors, so the work scales with num_mines rather than the board area
+        cells = self.cells
+        for mine_index in self.mine_indices:
+            for index in self.get_surrounding_indices(mine_index):
+                if not cells[index] & MINE:
+                    cells[index] += 1
+
+    def assign_num_surrounding_mines_with_numpy(self):
+        # sum the mine mask shifted towards each neighbor, in place on a view of Board.cells
+        numpy = get_numpy()
+        grid = numpy.frombuffer(self.cells, dtype=numpy.uint8).reshape(self.num_rows, self.num_cols)
+        is_mine = (grid & MINE).astype(bool)
+        pad_mode = "wrap" if self.topology == "torus" else "constant"
+        padded_mines = numpy.pad(is_mine, 1, mode=pad_mode).view(numpy.uint8)
+        counts = numpy.zeros_like(grid)
+        for row_shift, col_shift in self.transformations_to_get_neighboring_cells:
+            counts += padded_mines[1 + row_shift:1 + row_shift + self.num_rows,
+                                   1 + col_shift:1 + col_shift + self.num_cols]
+        counts[is_mine] = 0
+        grid |= counts
+
+    def get_cell(self, row, col):
+        if self.cells[self.get_index(row, col)] & MINE:
+            return Mine(self, row, col)    # Dependency
+        return SafeCell(self, row, col)    # Dependency
+
+    def uncover_all_cells(self):
+        if not self.mines_placed:
+            self.place_mines()
+        self.cells[:] = self.cells.translate(UNCOVER_ALL_TABLE)
+        self.mark_all_cells_changed()
+        self.clear_history()
+        if self.visible_hash is not None:
+            self.visible_hash = self.get_visible_hash(range(self.num_rows * self.num_cols))
+
+    def get_renderer(self):
+        if self.renderer is None:
+            self.renderer = BoardRenderer(self)    # Dependency
+        return self.renderer
+
+    def mark_all_cells_changed(self):
+        if self.renderer is not None:
+            self.renderer.invalidate_all()
+
+    def mark_cells_changed(self, revealed):
+        if self.renderer is not None:
+            self.renderer.invalidate(revealed)
+
+    def apply_action(self, action, cell):
+        return self.apply_action_index(action, self.get_index(cell.row, cell.col))
+
+    def apply_action_index(self, action, index):
+        if action == "flag":
+            return self.toggle_flag_index(index)
+        if action == "chord":
+            return self.chord_index(index)
+        return self.uncover_index(index)
+
+    def enable_undo(self):
+        if self.history is None:
+            self.history = []
+            self.undone = []
+
+    def clear_history(self):
+        if self.history is not None:
+            self.history = []
+            self.undone = []
+
+    def record_change(self, action, index, revealed, num_safe_cells_uncovered, mine_uncovered):
+        self.history.append((action, index, revealed, num_safe_cells_uncovered, mine_uncovered))
+        self.undone = []
+
+    def undo(self):
+        # reverses the latest uncover, chord or flag in O(cells it changed); mines placed by a deferred first
+        # click stay where they are.  Returns False when there is nothing to undo
+        if not self.history:
+            return False
+        if self.move_log is not None:
+            raise ValueError("Moves written to a move log cannot be undone")
+        change = self.history.pop()
+        action, index, revealed, self.num_safe_cells_uncovered, self.mine_uncovered = change
+        history, self.history = self.history, None
+        try:
+            if action == "flag":
+                self.toggle_flag_index(index)
+            else:
+                if self.visible_hash is not None:
+                    self.visible_hash ^= self.get_visible_hash(revealed.indices())
+                self.cover(revealed)
+        finally:
+            self.history = history
+        self.undone.append(change)
+        return True
+
+    def redo(self):
+        if not self.undone:
+            return False
+        undone = self.undone
+        action, index = undone.pop()[:2]
+        self.apply_action_index(action, index)
+        self.undone = undone
+        return True
+
+    def cover(self, revealed):
+        cells = self.cells
+        for start, end in revealed.spans:
+            cells[start:end] = cells[start:end].translate(COVER_TABLE)
+        self.mark_cells_changed(revealed)
+
+    def enable_visible_hash(self):
+        if self.visible_hash is None:
+            self.zobrist_keys = get_zobrist_keys(self.num_rows * self.num_cols)
+            self.visible_hash = self.get_visible_hash(range(self.num_rows * self.num_cols))
+
+    def get_visible_hash(self, indices):
+        # XOR of the keys of the visible cells among indices; XORing it in again removes them
+        cells, keys = self.cells, self.zobrist_keys
+        visible_hash = 0
+        for index in indices:
+            state = VISIBLE_STATE_TABLE[cells[index]]
+            if state != HIDDEN_STATE:
+                visible_hash ^= keys[index * NUM_VISIBLE_STATES + state]
+        return visible_hash
+
+    @contextmanager
+    def branch(self):
+        # moves made inside the with block are undone when it exits
+        if self.move_log is not None:
+            raise ValueError("A board recording a move log cannot branch")
+        history, undone = self.history, self.undone
+        self.history, self.undone = [], []
+        try:
+            yield self
+        finally:
+            while self.history:
+                self.undo()
+            self.history, self.undone = history, undone
+
+    def fork(self):
+        # a board to try moves on, sharing the mine layout and neighbor table; it has no renderer or move log,
+        # and starts with empty undo stacks if this board keeps them
+        fork = object.__new__(type(self))
+        fork.__dict__.update(self.__dict__)
+        fork.renderer = None
+        fork.move_log = None
+        fork.board = BoardView(fork)    # Dependency
+        if not self.mines_placed:
+            # the fork's first click draws its own layout without advancing this board's generator
+            fork.rng = random.Random()    # Dependency
+            fork.rng.setstate(self.rng.getstate())
+        if self.history is not None:
+            fork.history = []
+            fork.undone = []
+        fork.unshare_cell_state()
+        return fork
+
+    def unshare_cell_state(self):
+        self.cells = bytearray(self.cells)
+        if self.flag_counts is not None:
+            self.flag_counts = bytearray(self.flag_counts)
+
+    def toggle_flag(self, cell):
+        return self.toggle_flag_index(self.get_index(cell.row, cell.col))
+
+    def toggle_flag_index(self, index):
+        # only covered cells take flags; each flag updates its neighbors' flag counts, so chords never scan
+        value = self.cells[index]
+        if not value & COVERED:
+            return False
+        if self.move_log is not None:
+            self.move_log.record("flag", index)
+        if self.flag_counts is None:
+            self.flag_counts = bytearray(len(self.cells))
+        change = -1 if value & FLAGGED else 1
+        self.cells[index] = value ^ FLAGGED
+        self.num_flags += change
+        flag_counts = self.flag_counts
+        for neighbor in self.get_surrounding_indices(index):
+            flag_counts[neighbor] += change
+
+        changed = RevealedCells(self.num_cols)    # Dependency
+        changed.add_span(index, index + 1)
+        self.mark_cells_changed(changed)
+        if self.visible_hash is not None:
+            self.visible_hash ^= self.zobrist_keys[index * NUM_VISIBLE_STATES + FLAG_STATE]
+        if self.history is not None:
+            self.record_change("flag", index, None, self.num_safe_cells_uncovered, self.mine_uncovered)
+        return change > 0
+
+    def get_num_flags_around(self, index):
+        return self.flag_counts[index] if self.flag_counts is not None else 0
+
+    def chord_cell(self, cell):
+        return self.chord_index(self.get_index(cell.row, cell.col))
+
+    def chord_index(self, index):
+        # the uncovers of a chord are undone together, and logged as the one chord
+        num_safe_cells_uncovered, mine_uncovered = self.num_safe_cells_uncovered, self.mine_uncovered
+        if self.move_log is not None:
+            self.move_log.record("chord", index)
+        history, self.history = self.history, None
+        move_log, self.move_log = self.move_log, None
+        try:
+            revealed = self.uncover_chorded_neighbors(index)
+        finally:
+            self.history = history
+            self.move_log = move_log
+        if history is not None and revealed:
+            self.record_change("chord", index, revealed, num_safe_cells_uncovered, mine_uncovered)
+        return revealed
+
+    def uncover_chorded_neighbors(self, index):
+        # a number with as many flagged neighbors as surrounding mines uncovers the rest of its neighbors
+        revealed = RevealedCells(self.num_cols)    # Dependency
+        value = self.cells[index]
+        num_mines = value & COUNT_MASK
+        if value & (COVERED | MINE) or not num_mines or self.flag_counts is None \
+                or self.flag_counts[index] != num_mines:
+            return revealed
+        cells = self.cells
+        for neighbor in self.get_surrounding_indices(index):
+            if cells[neighbor] & COVERED and not cells[neighbor] & FLAGGED:
+                revealed.extend(self.uncover_index(neighbor))
+        return revealed
+
+    def reveal_index(self, index):
+        # uncovers just this cell, without the flood fill and move accounting of uncover_index
+        self.cells[index] &= ~COVERED
+
+    def uncover_cell(self, cell):
+        return self.uncover_index(self.get_index(cell.row, cell.col))
+
+    def uncover_index(self, index):
+        start_time = instrumentation.start()
+        # flagged cells are protected from uncovering; checked before logging so replays never see the click
+        if self.cells[index] & FLAGGED:
+            return RevealedCells(self.num_cols)    # Dependency
+        if self.move_log is not None:
+            self.move_log.record("uncover", index)
+        if not self.mines_placed:
+            self.place_mines(excluded_index=index)
+        num_safe_cells_uncovered, mine_uncovered = self.num_safe_cells_uncovered, self.mine_uncovered
+
+        cells = self.cells
+        revealed = RevealedCells(self.num_cols)    # Dependency
+        value = cells[index]
+
+        # if cell is already uncovered, don't do anything
+        if not value & COVERED:
+            return revealed
+
+        # a Mine or a cell with a mine surrounding it is revealed on its own
+        max_queue_depth = 0
+        if value != COVERED:
+            cells[index] = value ^ COVERED
+            revealed.add_span(index, index + 1)
+            if value & MINE:
+                self.mine_uncovered = True
+            else:
+                self.num_safe_cells_uncovered += 1
+        elif self.topology == "torus":
+            max_queue_depth = self.flood_fill_through_neighbor_table(index, revealed)
+            self.num_safe_cells_uncovered += len(revealed)
+        else:
+            max_queue_depth = self.flood_fill(index, revealed)
+            self.num_safe_cells_uncovered += len(revealed)
+
+        self.mark_cells_changed(revealed)
+        if self.visible_hash is not None:
+            self.visible_hash ^= self.get_visible_hash(revealed.indices())
+        if self.history is not None:
+            self.record_change("uncover", index, revealed, num_safe_cells_uncovered, mine_uncovered)
+        if start_time is not None:
+            instrumentation.record("board.uncover", start_time, cells_revealed=len(revealed),
+                                   max_queue_depth=max_queue_depth)
+        return revealed
+
+    def flood_fill(self, index, revealed):
+        # Scanline fill: each step uncovers a whole run of covered zero cells within a row, then scans the
+        # rows above and below the run for neighboring runs to queue and numbered cells to reveal.
+        # Returns the largest number of runs that were waiting in the queue at once.
+        cells = self.cells
+        num_cols = self.num_cols
+        run_starts = [self.find_start_of_covered_zero_run(index)]
+        max_queue_depth = 1
+        while run_starts:
+            start = run_starts.pop()
+            if cells[start] != COVERED:
+                continue
+
+            row_start = start - start % num_cols
+            row_end = row_start + num_cols
+            end = COVERED_ZERO_RUN.match(cells, start, row_end).end()
+            cells[start:end] = bytes(end - start)
+            revealed.add_span(start, end)
+
+            lo = start - 1 if start > row_start else start
+            hi = end + 1 if end < row_end else end
+            for side in (lo, hi - 1):
+                if COVERED < cells[side] <= COVERED | 8:
+                    cells[side] ^= COVERED
+                    revealed.add_span(side, side + 1)
+
+            for offset in (-num_cols, num_cols):
+                if not 0 <= row_start + offset < len(cells):
+                    continue
+                # most neighboring rows were just uncovered themselves, skip those without touching the regex
+                if not cells[lo + offset:hi + offset].translate(None, UNCOVERED_SAFE_BYTES):
+                    continue
+                for match in list(COVERED_ZERO_RUN_OR_COVERED_NUMBER.finditer(cells, lo + offset, hi + offset)):
+                    neighbor = match.start()
+                    if match.lastindex:
+                        if neighbor == lo + offset:
+                            neighbor = self.find_start_of_covered_zero_run(neighbor)
+                        run_starts.append(neighbor)
+                    else:
+                        cells[neighbor] ^= COVERED
+                        revealed.add_span(neighbor, neighbor + 1)
+            if len(run_starts) > max_queue_depth:
+                max_queue_depth = len(run_starts)
+        return max_queue_depth
+
+    def flood_fill_through_neighbor_table(self, index, revealed):
+        # the scanline fill assumes rows end at the board's edge, so a torus falls back to a cell-by-cell fill
+        cells = self.cells
+        cells[index] ^= COVERED
+        revealed.add_span(index, index + 1)
+        pending = [index]
+        max_queue_depth = 1
+        while pending:
+            for neighbor in self.get_surrounding_indices(pending.pop()):
+                value = cells[neighbor]
+                if value & COVERED and not value & (MINE | FLAGGED):
+                    cells[neighbor] = value ^ COVERED
+                    revealed.add_span(neighbor, neighbor + 1)
+                    if value == COVERED:
+                        pending.append(neighbor)
+            if len(pending) > max_queue_depth:
+                max_queue_depth = len(pending)
+        return max_queue_depth
+
+    def find_start_of_covered_zero_run(self, index, chunk_size=64):
+        # re cannot search backwards, so walk left a chunk at a time and strip the run off its end
+        row_start = index - index % self.num_cols
+        start = index
+        while start > row_start:
+            chunk_start = max(row_start, start - chunk_size)
+            rest_of_chunk = self.cells[chunk_start:start].rstrip(COVERED_ZERO_BYTE)
+            if rest_of_chunk:
+                return chunk_start + len(rest_of_chunk)
+            start = chunk_start
+        return row_start
+
+    def __str__(self):
+        return self.get_renderer().render()
+
+
+def count_set_bits(bits):
+    return bin(bits).count("1")
+
+
+# int.bit_count only exists from Python 3.10
+count_bits = getattr(int, "bit_count", count_set_bits)
+
+
+class BitBoard(Board):
+    """
+    Board for the small sizes played most, holding mines, uncovered cells, flags and the four bits of every
+    mine count as Python ints, one bit per cell.  Rows are num_cols + 1 bits apart, so the spare bit ending
+    each row keeps horizontal shifts from wrapping into the next row.  Counts come from adding the eight
+    shifted mine masks bit plane by bit plane, and a flood fill is a repeated shift-and-mask dilation.
+    Board.cells is offered as a byte view rebuilt on demand, so Cell views, rendering and saving work unchanged.
+    """
+
+    def __init__(self, num_rows=None, num_mines=None, rng=None, first_click_safe=False, num_cols=None,
+                 topology="plane", side_length_of_square_grid=None):
+        start_time = instrumentation.start()
+        num_rows = self.get_num_rows_argument(num_rows, num_mines, side_length_of_square_grid)
+        if topology != "plane":
+            raise ValueError("BitBoard only supports the plane topology")
+
+        self.num_rows = num_rows
+        self.num_cols = num_rows if num_cols is None else num_cols
+        self.num_mines = num_mines
+        self.num_safe_cells = self.num_rows * self.num_cols - self.num_mines
+        self.num_safe_cells_uncovered = 0
+        self.mine_uncovered = False
+        self.topology = topology
+        self.neighbor_table = None
+        self.num_flags = 0
+
+        self.row_stride = self.num_cols + 1
+        row_mask = (1 << self.num_cols) - 1
+        self.board_mask = sum(row_mask << row * self.row_stride for row in range(self.num_rows))
+
+        if rng is None:
+            rng = random.SystemRandom().getrandbits(64)
+        self.seed = None if isinstance(rng, random.Random) else rng
+        self.rng = rng if isinstance(rng, random.Random) else random.Random(rng)
+        self.first_click_safe = first_click_safe
+
+        self.renderer = None
+        self.move_log = None
+        self.history = None
+        self.undone = None
+        self.visible_hash = None
+        self.zobrist_keys = None
+        self.mine_indices = array('q')
+        self.mines_placed = False
+        if not self.first_click_safe:
+            self.mine_indices = self.create_random_mine_indices()
+            self.mines_placed = True
+        self.board = self.empty_board()
+        if self.mines_placed:
+            self.populate_board_with_all_cells()
+
+        if start_time is not None:
+            instrumentation.record("board.init", start_time, num_cells=self.num_rows * self.num_cols)
+
+    @property
+    def cells(self):
+        # read-only: changes go through the bit planes, which the cache is rebuilt from
+        if self.cached_cells is None:
+            self.cached_cells = self.get_cells()
+        return self.cached_cells
+
+    @property
+    def flag_counts(self):
+        # number of flagged neighbors of every cell, counted from the flag plane; None without flags, as on Board
+        if not self.flags:
+            return None
+        return bytes(self.get_num_flags_around(index) for index in range(self.num_rows * self.num_cols))
+
+    def get_cells(self):
+        # expand every bit plane into one byte per bit, OR them together as big ints, then drop the spare bits
+        num_bits = self.num_rows * self.row_stride
+        if not num_bits:
+            return b''
+        safe = ~self.mines
+        planes = [(self.ones & safe, 1), (self.twos & safe, 2), (self.fours & safe, 4), (self.eights & safe, 8),
+                  (self.mines, MINE), (self.board_mask & ~self.uncovered, COVERED), (self.flags, FLAGGED)]
+        value = 0
+        for plane, weight in planes:
+            if plane:
+                ascii_bits = format(plane, '0{}b'.format(num_bits))[::-1].encode()
+                value |= int.from_bytes(ascii_bits.translate(BIT_TO_BYTE_TABLES[weight]), 'big')
+        padded = value.to_bytes(num_bits, 'big')
+        return b''.join(padded[row * self.row_stride:row * self.row_stride + self.num_cols]
+                        for row in range(self.num_rows))
+
+    def get_bit(self, index):
+        return index + index // self.num_cols
+
+    def empty_board(self):
+        self.mines = self.uncovered = self.flags = 0
+        self.ones = self.twos = self.fours = self.eights = 0
+        self.num_flags = 0
+        self.cached_cells = None
+        if self.visible_hash is not None:
+            self.visible_hash = 0
+        self.mark_all_cells_changed()
+        return BoardView(self)    # Dependency
+
+    def populate_board_with_all_cells(self):
+        start_time = instrumentation.start()
+        get_bit = self.get_bit
+        self.mines = sum(1 << get_bit(index) for index in self.mine_indices)
+        self.assign_num_surrounding_mines_to_all_safe_cells()
+        self.cached_cells = None
+
+        if start_time is not None:
+            instrumentation.record("board.populate", start_time, num_mines=len(self.mine_indices))
+
+    def assign_num_surrounding_mines_to_all_safe_cells(self):
+        # a ripple-carry adder over whole bit planes: each shifted mine mask adds one to the cells it covers
+        mines, stride, board_mask = self.mines, self.row_stride, self.board_mask
+        ones = twos = fours = eights = 0
+        for shift in (1, stride - 1, stride, stride + 1):
+            for shifted in ((mines << shift) & board_mask, mines >> shift):
+                carry = ones & shifted
+                ones ^= shifted
+                carry, twos = twos & carry, twos ^ carry
+                carry, fours = fours & carry, fours ^ carry
+                eights |= carry
+        # right shifts can land on the spare bits, and nothing else masks them off
+        self.ones, self.twos, self.fours, self.eights \
+            = ones & board_mask, twos & board_mask, fours & board_mask, eights & board_mask
+
+    def place_mines(self, excluded_index=None):
+        flags = self.flags
+        self.mine_indices = self.create_random_mine_indices(excluded_index)
+        self.mines_placed = True
+        self.board = self.empty_board()
+        self.populate_board_with_all_cells()
+        self.flags = flags
+        self.num_flags = count_bits(flags)
+        if self.visible_hash is not None:
+            self.visible_hash = self.get_visible_hash(range(self.num_rows * self.num_cols))
+
+    def dilate(self, bits):
+        # bits plus all eight neighbors of each bit
+        stride = self.row_stride
+        bits |= (bits << 1) | (bits >> 1)
+        bits |= (bits << stride) | (bits >> stride)
+        return bits & self.board_mask
+
+    def get_neighborhood(self, bit):
+        neighborhood = 0
+        for row_offset in (-self.row_stride, 0, self.row_stride):
+            lowest = bit + row_offset - 1
+            neighborhood |= 7 << lowest if lowest >= 0 else 7 >> -lowest
+        return neighborhood & self.board_mask & ~(1 << bit)
+
+    def get_cell(self, row, col):
+        if self.mines >> self.get_bit(self.get_index(row, col)) & 1:
+            return Mine(self, row, col)    # Dependency
+        return SafeCell(self, row, col)    # Dependency
+
+    def is_index_covered(self, index):
+        return not self.uncovered >> self.get_bit(index) & 1
+
+    def get_covered_indices(self):
+        return [index for start, end in self.get_index_spans(self.board_mask & ~self.uncovered)
+                for index in range(start, end)]
+
+    def get_index_spans(self, bits):
+        # runs of set bits never cross the spare bit ending each row, so every run maps to one row's span
+        stride = self.row_stride
+        for match in ONE_BIT_RUN.finditer(format(bits, 'b')[::-1]):
+            row = match.start() // stride
+            yield match.start() - row, match.end() - row
+
+    def uncover_all_cells(self):
+        if not self.mines_placed:
+            self.place_mines()
+        self.uncovered = self.board_mask
+        self.flags = 0
+        self.cached_cells = None
+        self.mark_all_cells_changed()
+        self.clear_history()
+        if self.visible_hash is not None:
+            self.visible_hash = self.get_visible_hash(range(self.num_rows * self.num_cols))
+
+    def cover(self, revealed):
+        get_bit = self.get_bit
+        self.uncovered &= ~sum(((1 << end - start) - 1) << get_bit(start) for start, end in revealed.spans)
+        self.cached_cells = None
+        self.mark_cells_changed(revealed)
+
+    def unshare_cell_state(self):
+        # every bit plane is an immutable int, and the byte view is replaced rather than changed, so the fork
+        # shares them all until either board makes a move
+        pass
+
+    def toggle_flag_index(self, index):
+        bit = 1 << self.get_bit(index)
+        if self.uncovered & bit:
+            return False
+        if self.move_log is not None:
+            self.move_log.record("flag", index)
+        self.flags ^= bit
+        self.num_flags += 1 if self.flags & bit else -1
+        self.cached_cells = None
+
+        changed = RevealedCells(self.num_cols)    # Dependency
+        changed.add_span(index, index + 1)
+        self.mark_cells_changed(changed)
+        if self.visible_hash is not None:
+            self.visible_hash ^= self.zobrist_keys[index * NUM_VISIBLE_STATES + FLAG_STATE]
+        if self.history is not None:
+            self.record_change("flag", index, None, self.num_safe_cells_uncovered, self.mine_uncovered)
+        return bool(self.flags & bit)
+
+    def get_num_flags_around(self, index):
+        return count_bits(self.flags & self.get_neighborhood(self.get_bit(index)))
+
+    def reveal_index(self, index):
+        self.uncovered |= 1 << self.get_bit(index)
+        self.cached_cells = None
+
+    def uncover_chorded_neighbors(self, index):
+        revealed = RevealedCells(self.num_cols)    # Dependency
+        bit_index = self.get_bit(index)
+        bit = 1 << bit_index
+        if not self.uncovered & bit or self.mines & bit:
+            return revealed
+        num_mines = sum(plane >> bit_index & 1 and weight for plane, weight in
+                        ((self.ones, 1), (self.twos, 2), (self.fours, 4), (self.eights, 8)))
+        neighborhood = self.get_neighborhood(bit_index)
+        if not num_mines or count_bits(self.flags & neighborhood) != num_mines:
+            return revealed
+        to_uncover = neighborhood & ~self.uncovered & ~self.flags
+        for neighbor_start, neighbor_end in list(self.get_index_spans(to_uncover)):
+            for neighbor in range(neighbor_start, neighbor_end):
+                revealed.extend(self.uncover_index(neighbor))
+        return revealed
+
+    def uncover_index(self, index):
+        start_time = instrumentation.start()
+        bit = 1 << self.get_bit(index)
+        revealed = RevealedCells(self.num_cols)    # Dependency
+        if self.flags & bit:
+            return revealed
+        if self.move_log is not None:
+            self.move_log.record("uncover", index)
+        if not self.mines_placed:
+            self.place_mines(excluded_index=index)
+        if self.uncovered & bit:
+            return revealed
+        num_safe_cells_uncovered, mine_uncovered = self.num_safe_cells_uncovered, self.mine_uncovered
+
+        num_dilations = 0
+        if self.mines & bit:
+            newly_uncovered = bit
+            self.mine_uncovered = True
+        elif (self.ones | self.twos | self.fours | self.eights) & bit:
+            newly_uncovered = bit
+        else:
+            # grow through covered, unflagged zero cells, then add the numbers bordering the grown region
+            passable = self.board_mask & ~(self.mines | self.ones | self.twos | self.fours | self.eights
+                                           | self.uncovered | self.flags)
+            region = bit
+            while True:
+                grown = self.dilate(region) & passable | region
+                num_dilations += 1
+                if grown == region:
+                    break
+                region = grown
+            newly_uncovered = self.dilate(region) & ~(self.mines | self.uncovered | self.flags)
+        self.uncovered |= newly_uncovered
+        self.cached_cells = None
+
+        if newly_uncovered == bit:
+            revealed.add_span(index, index + 1)
+        else:
+            for span in self.get_index_spans(newly_uncovered):
+                revealed.add_span(*span)
+        if not self.mines & bit:
+            self.num_safe_cells_uncovered += len(revealed)
+
+        self.mark_cells_changed(revealed)
+        if self.visible_hash is not None:
+            self.visible_hash ^= self.get_visible_hash(revealed.indices())
+        if self.history is not None:
+            self.record_change("uncover", index, revealed, num_safe_cells_uncovered, mine_uncovered)
+        if start_time is not None:
+            instrumentation.record("board.uncover", start_time, cells_revealed=len(revealed),
+                                   max_queue_depth=num_dilations)
+        return revealed
+
+
+ONE_BIT_RUN = re.compile('1+')
+BIT_TO_BYTE_TABLES = {weight: bytes.maketrans(b'01', bytes([0, weight])) for weight in (1, 2, 4, 8, MINE, COVERED,
+                                                                                          FLAGGED)}
+
+# boards up to this many cells default to the BitBoard backend
+BITBOARD_MAX_CELLS = 1024
+BOARD_BACKENDS = {"bytes": Board, "bitboard": BitBoard}
+
+
+def create_board(num_rows, num_mines, backend="auto", **kwargs):
+    # backend is "bytes", "bitboard" or "auto", which picks a BitBoard for small boards on the plane
+    if backend == "auto":
+        num_cols = kwargs.get("num_cols")
+        num_cells = num_rows * (num_rows if num_cols is None else num_cols)
+        small = num_cells <= BITBOARD_MAX_CELLS and kwargs.get("topology", "plane") == "plane"
+        backend = "bitboard" if small else "bytes"
+    if backend not in BOARD_BACKENDS:
+        raise ValueError("Unknown board backend {!r}".format(backend))
+    return BOARD_BACKENDS[backend](num_rows, num_mines, **kwargs)
+
+
+UNCOVER_ALL_TABLE = bytes(value & ~(COVERED | FLAGGED) for value in range(256))
+COVER_TABLE = bytes(value | COVERED for value in range(256))
+
+
+def get_cell_char(value):
+    if value & FLAGGED:
+        return 'F'
+    if value & COVERED:
+        return 'X'
+    if value & MINE:
+        return 'M'
+    if not value & COUNT_MASK:
+        return '.'
+    # single hex digit, so that the table below stays one char per byte value
+    return format(value & COUNT_MASK, 'x')
+
+
+CELL_CHAR_TABLE = ''.join(get_cell_char(value) for value in range(256)).encode()
+
+ANSI_CLEAR_SCREEN = "\x1b[H\x1b[2J"
+ANSI_CLEAR_TO_END_OF_SCREEN = "\x1b[J"
+ANSI_MOVE_CURSOR = "\x1b[{};{}H"
+
+
+class BoardRenderer(object):
+    """Renders a Board's grid, re-rendering only the rows that changed since the last render"""
+    num_lines_above_first_row = 3
+
+    def __init__(self, board):
+        self.board = board
+        # row numbers are right-aligned to the widest one, so every row's cells start in the same column
+        self.row_label_width = max(2, len(str(board.num_rows - 1)))
+        self.num_chars_left_of_first_col = self.row_label_width + len(" | ")
+        indent = " " * (self.row_label_width + 2)
+        self.header = "\n" + indent + ' '.join([str(col).rjust(2) for col in range(board.num_cols)]) + "\n" \
+                      + indent + "-- " * board.num_cols + "\n"
+        self.row_lines = [None] * board.num_rows
+
+        # spans of cells revealed since the last ANSI render
+        self.changed_spans = []
+        self.needs_full_redraw = True
+
+    def invalidate(self, revealed):
+        # every span of a RevealedCells lies within a single row
+        for start, _ in revealed.spans:
+            self.row_lines[start // self.board.num_cols] = None
+        self.changed_spans.extend(revealed.spans)
+
+    def invalidate_all(self):
+        self.row_lines = [None] * self.board.num_rows
+        self.changed_spans = []
+        self.needs_full_redraw = True
+
+    def render_row(self, row):
+        row_start = row * self.board.num_cols
+        cell_chars = self.board.cells[row_start:row_start + self.board.num_cols].translate(CELL_CHAR_TABLE)
+        return str(row).rjust(self.row_label_width) + " | " + '  '.join(cell_chars.decode()) + "\n"
+
+    def render(self):
+        start_time = instrumentation.start()
+        row_lines = self.row_lines
+        num_rows_rendered = 0
+        for row, line in enumerate(row_lines):
+            if line is None:
+                row_lines[row] = self.render_row(row)
+                num_rows_rendered += 1
+        output = self.header + ''.join(row_lines)
+
+        if start_time is not None:
+            instrumentation.record("board.render", start_time, rows_rendered=num_rows_rendered)
+        return output
+
+    def render_ansi(self):
+        # The first call clears the screen and draws the board at the top.  Later calls only overwrite the
+        # cells revealed since, then park the cursor below the board and clear everything beneath it.
+        if self.needs_full_redraw:
+            output = ANSI_CLEAR_SCREEN + self.render()
+        else:
+            updates = []
+            num_cols = self.board.num_cols
+            for start, end in self.changed_spans:
+                row, col = divmod(start, num_cols)
+                cell_chars = self.board.cells[start:end].translate(CELL_CHAR_TABLE).decode()
+                updates.append(ANSI_MOVE_CURSOR.format(row + self.num_lines_above_first_row + 1,
+                                                       3 * col + self.num_chars_left_of_first_col + 1))
+                updates.append('  '.join(cell_chars))
+            output = ''.join(updates)
+        self.changed_spans = []
+        self.needs_full_redraw = False
+        return output + ANSI_MOVE_CURSOR.format(self.num_lines_above_first_row + self.board.num_rows + 1, 1) \
+            + ANSI_CLEAR_TO_END_OF_SCREEN
+
+
+class RevealedCells(Set):
+    """(row, col) locations revealed by a single uncover, stored as runs of linear indices"""
+
+    def __init__(self, num_cols):
+        self.num_cols = num_cols
+        self.spans = []
+        self.num_cells = 0
+
+    def add_span(self, start, end):
+        self.spans.append((start, end))
+        self.num_cells += end - start
+
+    def extend(self, other):
+        self.spans.extend(other.spans)
+        self.num_cells += other.num_cells
+
+    def indices(self):
+        for start, end in self.spans:
+            yield from range(start, end)
+
+    def __len__(self):
+        return self.num_cells
+
+    def __iter__(self):
+        for index in self.indices():
+            yield divmod(index, self.num_cols)
+
+    def __contains__(self, location):
+        try:
+            row, col = location
+        except (TypeError, ValueError):
+            return False
+        if not 0 <= col < self.num_cols:
+            return False
+        index = row * self.num_cols + col
+        return any(start <= index < end for start, end in self.spans)
+
+
+class BoardView(object):
+    """Read-only grid of Cell views over Board.cells, indexed as board[row][col]"""
+    __slots__ = ('board',)
+
+    def __init__(self, board):
+        self.board = board
+
+    def __len__(self):
+        return self.board.num_rows
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("row index out of range")
+        return RowView(self.board, row)    # Dependency
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield RowView(self.board, row)
+
+
+class RowView(object):
+    __slots__ = ('board', 'row')
+
+    def __init__(self, board, row):
+        self.board = board
+        self.row = row
+
+    def __len__(self):
+        return self.board.num_cols
+
+    def __getitem__(self, col):
+        if col < 0:
+            col += len(self)
+        if not 0 <= col < len(self):
+            raise IndexError("col index out of range")
+        return self.board.get_cell(self.row, col)
+
+    def __iter__(self):
+        for col in range(len(self)):
+            yield self.board.get_cell(self.row, col)
+
+
+class Cell(object):
+    """Lightweight view of one square; all state lives in the Board's cells array"""
+    __slots__ = ('board', 'row', 'col', 'index')
+
+    def __init__(self, board, row, col):
+        self.board = board
+        self.row = row
+        self.col = col
+        self.index = board.get_index(row, col)
+
+    @property
+    def is_covered(self):
+        return bool(self.board.cells[self.index] & COVERED)
+
+    @property
+    def is_flagged(self):
+        return bool(self.board.cells[self.index] & FLAGGED)
+
+    @property
+    def num_mines_in_surrounding_cells(self):
+        return self.board.cells[self.index] & COUNT_MASK
+
+    @property
+    def surrounding_cell_locations(self):
+        return self.board.get_surrounding_cell_locations(self.row, self.col)
+
+    def get_name_representation(self):
+        raise NotImplementedError
+
+    def uncover(self):
+        self.board.reveal_index(self.index)
+        revealed = RevealedCells(self.board.num_cols)    # Dependency
+        revealed.add_span(self.index, self.index + 1)
+        self.board.mark_cells_changed(revealed)
+
+    def __str__(self):
+        if self.is_flagged:
+            return 'F'
+        if self.is_covered:
+            return 'X'
+        return self.get_name_representation()
+
+
+class SafeCell(Cell):
+    __slots__ = ()
+
+    def get_name_representation(self):
+        if self.has_zero_surrounding_mines():
+            return '.'
+        return str(self.num_mines_in_surrounding_cells)
+
+    def has_zero_surrounding_mines(self):
+        return self.num_mines_in_surrounding_cells == 0
+
+
+class Mine(Cell):
+    __slots__ = ()
+
+    def get_name_representation(self):
+        return 'M'
+
+
+class TimingHistogram(object):
+    """Call count, total, extremes and power-of-two microsecond buckets of one instrumented operation"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.min_seconds = None
+        self.max_seconds = 0.0
+        self.buckets = {}
+        self.detail_totals = {}
+        self.detail_maxima = {}
+
+    def add(self, seconds, details):
+        self.count += 1
+        self.total_seconds += seconds
+        self.min_seconds = seconds if self.min_seconds is None else min(self.min_seconds, seconds)
+        self.max_seconds = max(self.max_seconds, seconds)
+        # bucket b holds the calls that took under 2**b microseconds
+        bucket = int(seconds * 1e6).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        for name, value in details.items():
+            self.detail_totals[name] = self.detail_totals.get(name, 0) + value
+            self.detail_maxima[name] = max(self.detail_maxima.get(name, value), value)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_seconds": self.total_seconds,
+            "min_seconds": self.min_seconds,
+            "max_seconds": self.max_seconds,
+            "histogram_us": {2 ** bucket: count for bucket, count in sorted(self.buckets.items())},
+            "detail_totals": dict(self.detail_totals),
+            "detail_maxima": dict(self.detail_maxima),
+        }
+
+
+class Instrumentation(object):
+    """
+    Opt-in timing of the hot paths.  While disabled, each instrumented call only pays for start() returning
+    None.  Subscribers are called as subscriber(event_name, seconds, details) after every recorded event.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+        self.subscribers = []
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.histograms = {}
+
+    def subscribe(self, subscriber):
+        self.subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.remove(subscriber)
+
+    def start(self):
+        return time.perf_counter() if self.enabled else None
+
+    def record(self, event_name, start_time, **details):
+        seconds = time.perf_counter() - start_time
+        histogram = self.histograms.get(event_name)
+        if histogram is None:
+            histogram = self.histograms[event_name] = TimingHistogram()    # Dependency
+        histogram.add(seconds, details)
+        for subscriber in self.subscribers:
+            subscriber(event_name, seconds, details)
+
+    def report(self):
+        return {event_name: histogram.to_dict() for event_name, histogram in sorted(self.histograms.items())}
+
+
+instrumentation = Instrumentation()
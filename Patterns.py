@@ -0,0 +1,246 @@
+import os
+import sys
+import struct
+import argparse
+from array import array
+
+import Minesweeper
+import Solver
+
+# Window layout: the 5x5 cells around an uncovered number, row by row.  Every number in the inner 3x3 has all
+# of its neighbors inside the window, so the window holds those numbers' constraints completely
+WINDOW_OFFSETS = [(row_shift, col_shift) for row_shift in range(-2, 3) for col_shift in range(-2, 3)]
+WINDOW_SIZE = len(WINDOW_OFFSETS)
+WINDOW_MASK = (1 << WINDOW_SIZE) - 1
+POSITION_OF_OFFSET = {offset: position for position, offset in enumerate(WINDOW_OFFSETS)}
+INNER_POSITIONS = [position for position, (row_shift, col_shift) in enumerate(WINDOW_OFFSETS)
+                   if abs(row_shift) <= 1 and abs(col_shift) <= 1]
+NEIGHBOR_POSITIONS = {position: [POSITION_OF_OFFSET[(WINDOW_OFFSETS[position][0] + row_shift,
+                                                     WINDOW_OFFSETS[position][1] + col_shift)]
+                                 for row_shift, col_shift in Minesweeper.NEIGHBOR_SHIFTS]
+                      for position in INNER_POSITIONS}
+
+NEIGHBOR_MASKS = {position: sum(1 << neighbor for neighbor in neighbors)
+                  for position, neighbors in NEIGHBOR_POSITIONS.items()}
+
+# Key layout: bit i is set when window cell i is covered and not known to be a mine.  Above those, 4 bits
+# per inner cell in INNER_POSITIONS order hold 1 plus the undecided mines around a number that has
+# undecided neighbors, or 0 for any other cell
+COUNT_SHIFTS = [WINDOW_SIZE + 4 * i for i in range(len(INNER_POSITIONS))]
+
+# off-board cells read as an uncovered mine, which is neither undecided nor a number
+OFF_BOARD = Minesweeper.MINE
+UNKNOWN_BIT_TABLE = bytes(b'1'[0] if value & Minesweeper.COVERED and not value & Minesweeper.FLAGGED else b'0'[0]
+                          for value in range(256))
+KNOWN_MINE_BIT_TABLE = bytes(b'1'[0] if value & Minesweeper.FLAGGED else b'0'[0] for value in range(256))
+
+# the eight rotations and reflections of the window, each as the position every position moves to
+SYMMETRIES = [[POSITION_OF_OFFSET[transform(row_shift, col_shift)] for row_shift, col_shift in WINDOW_OFFSETS]
+              for transform in (lambda r, c: (r, c), lambda r, c: (c, -r), lambda r, c: (-r, -c),
+                                lambda r, c: (-c, r), lambda r, c: (r, -c), lambda r, c: (-c, -r),
+                                lambda r, c: (-r, c), lambda r, c: (c, r))]
+
+# flat index offsets of the window on boards num_cols wide, for windows that lie inside the board; windows
+# that cross an edge are kept whole, per board shape
+window_index_offsets = {}
+edge_windows = {}
+
+# File layout: header, then the keys and then the values of every entry as little-endian 64-bit integers
+MAGIC = b'MSWP'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHI')
+
+
+def permute_mask(mask, symmetry):
+    permuted = 0
+    for position in range(WINDOW_SIZE):
+        if mask >> position & 1:
+            permuted |= 1 << symmetry[position]
+    return permuted
+
+
+def permute_key(key, symmetry):
+    permuted = permute_mask(key & WINDOW_MASK, symmetry)
+    for i, position in enumerate(INNER_POSITIONS):
+        permuted |= (key >> COUNT_SHIFTS[i] & 0xF) << COUNT_SHIFTS[INNER_POSITIONS.index(symmetry[position])]
+    return permuted
+
+
+def solve_window(key):
+    # every placement of mines on the window's undecided cells that satisfies its numbers is counted;
+    # returns the positions of the cells safe in all of them, plus those mined in all of them shifted up
+    constraints = [([neighbor for neighbor in NEIGHBOR_POSITIONS[position] if key >> neighbor & 1],
+                    (key >> COUNT_SHIFTS[i] & 0xF) - 1)
+                   for i, position in enumerate(INNER_POSITIONS) if key >> COUNT_SHIFTS[i] & 0xF]
+    positions = sorted({neighbor for neighbors, _ in constraints for neighbor in neighbors})
+    index_of_position = {position: i for i, position in enumerate(positions)}
+    table = Solver.ProbabilityEngine.enumerate_component(len(positions), tuple(
+        (tuple(index_of_position[neighbor] for neighbor in neighbors), num_mines)
+        for neighbors, num_mines in constraints))
+
+    num_solutions = sum(table.num_solutions.values())
+    if not num_solutions:
+        return 0
+    safe_mask = mine_mask = 0
+    for position, with_mine in zip(positions, table.num_solutions_with_mine):
+        num_solutions_with_mine = sum(with_mine.values())
+        if not num_solutions_with_mine:
+            safe_mask |= 1 << position
+        elif num_solutions_with_mine == num_solutions:
+            mine_mask |= 1 << position
+    return safe_mask | mine_mask << WINDOW_SIZE
+
+
+class PatternLibrary(object):
+    """
+    Deductions for the 5x5 windows around uncovered numbers, found with one dict lookup per window.  A key
+    encodes which of the window's cells are undecided and how many undecided mines each number in its inner
+    3x3 still needs.  Its value marks the cells that every placement of those mines leaves safe, or mined.
+    A window missing from the library is solved by enumeration and added together with its seven rotations
+    and reflections, so playing games fills the library and saving it keeps the work for later runs.
+    """
+
+    def __init__(self, entries=None):
+        self.entries = {} if entries is None else entries
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.num_hits += 1
+            return value
+        self.num_misses += 1
+        value = solve_window(key)
+        safe_mask, mine_mask = value & WINDOW_MASK, value >> WINDOW_SIZE
+        for symmetry in SYMMETRIES:
+            self.entries[permute_key(key, symmetry)] \
+                = permute_mask(safe_mask, symmetry) | permute_mask(mine_mask, symmetry) << WINDOW_SIZE
+        return value
+
+    @staticmethod
+    def get_window(board, index):
+        # board indices of the window around index, with -1 for cells off the board
+        num_rows, num_cols = board.num_rows, board.num_cols
+        row, col = divmod(index, num_cols)
+        if 2 <= row < num_rows - 2 and 2 <= col < num_cols - 2:
+            offsets = window_index_offsets.get(num_cols)
+            if offsets is None:
+                offsets = window_index_offsets[num_cols] \
+                    = [row_shift * num_cols + col_shift for row_shift, col_shift in WINDOW_OFFSETS]
+            return [index + offset for offset in offsets]
+
+        windows = edge_windows.setdefault((num_rows, num_cols, board.topology), {})
+        window = windows.get(index)
+        if window is None:
+            if board.topology == "torus":
+                if min(num_rows, num_cols) < 5:
+                    raise ValueError("Pattern windows need a torus of at least 5 rows and 5 columns")
+                window = [(row + row_shift) % num_rows * num_cols + (col + col_shift) % num_cols
+                          for row_shift, col_shift in WINDOW_OFFSETS]
+            else:
+                window = [(row + row_shift) * num_cols + col + col_shift
+                          if 0 <= row + row_shift < num_rows and 0 <= col + col_shift < num_cols else -1
+                          for row_shift, col_shift in WINDOW_OFFSETS]
+            windows[index] = window
+        return window
+
+    @staticmethod
+    def get_key(board, window, known_mines=frozenset()):
+        # flagged cells count as known mines, as they do for chording; None for a window whose known mines
+        # outnumber one of its numbers
+        cells = board.cells
+        values = bytearray([cells[index] if index >= 0 else OFF_BOARD for index in window])
+        if known_mines:
+            for position, index in enumerate(window):
+                if index in known_mines:
+                    values[position] |= Minesweeper.FLAGGED
+        # the bit tables spell the masks out in ASCII, last position first, for int() to parse
+        values.reverse()
+        unknown_mask = int(values.translate(UNKNOWN_BIT_TABLE), 2)
+        known_mine_mask = int(values.translate(KNOWN_MINE_BIT_TABLE), 2)
+        values.reverse()
+
+        key = unknown_mask
+        for i, position in enumerate(INNER_POSITIONS):
+            value = values[position]
+            if value & (Minesweeper.COVERED | Minesweeper.MINE) or not unknown_mask & NEIGHBOR_MASKS[position]:
+                continue
+            num_known_mines = Minesweeper.count_bits(known_mine_mask & NEIGHBOR_MASKS[position])
+            num_mines = (value & Minesweeper.COUNT_MASK) - num_known_mines
+            if num_mines < 0:
+                return None
+            key |= (num_mines + 1) << COUNT_SHIFTS[i]
+        return key
+
+    def find_deductions(self, board, index, known_mines=frozenset()):
+        # (safe indices, mine indices) proven by the numbers within one cell of index
+        window = self.get_window(board, index)
+        key = self.get_key(board, window, known_mines)
+        if key is None:
+            return [], []
+        value = self.lookup(key)
+        safe = [window[position] for position in range(WINDOW_SIZE) if value >> position & 1]
+        mines = [window[position] for position in range(WINDOW_SIZE) if value >> WINDOW_SIZE + position & 1]
+        return safe, mines
+
+    def save(self, path):
+        keys = array('Q', sorted(self.entries))
+        values = array('Q', [self.entries[key] for key in keys])
+        if sys.byteorder != 'little':
+            keys.byteswap()
+            values.byteswap()
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(keys)))
+            f.write(keys.tobytes())
+            f.write(values.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ValueError("Pattern library is truncated")
+        magic, version, num_entries = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a pattern library")
+        if version != FORMAT_VERSION:
+            raise ValueError("Unsupported pattern library version {}".format(version))
+        if len(data) != HEADER.size + 16 * num_entries:
+            raise ValueError("Pattern library is truncated")
+        keys = array('Q', data[HEADER.size:HEADER.size + 8 * num_entries])
+        values = array('Q', data[HEADER.size + 8 * num_entries:])
+        if sys.byteorder != 'little':
+            keys.byteswap()
+            values.byteswap()
+        return cls(dict(zip(keys, values)))    # Dependency
+
+
+def main(argv=None):
+    import Tournament
+
+    parser = argparse.ArgumentParser(prog="Minesweeper.py patterns",
+                                     description="Build a pattern library from the windows met in played games")
+    parser.add_argument("--size", type=int, default=16, help="number of rows, and of columns unless --cols is given")
+    parser.add_argument("--cols", type=int, default=None, help="number of columns")
+    parser.add_argument("--mines", type=int, default=40, help="number of mines per board")
+    parser.add_argument("--games", type=int, default=1000, help="number of games to play")
+    parser.add_argument("--seed", type=int, default=0, help="base seed for boards and guesses")
+    parser.add_argument("--output", default="patterns.mswpat", help="library file, extended if it exists")
+    args = parser.parse_args(argv)
+
+    library = PatternLibrary.load(args.output) if os.path.exists(args.output) else PatternLibrary()
+    num_entries_before = len(library)
+    tournament = Tournament.Tournament(args.size, args.mines, ["pattern"], args.games, args.seed, args.cols)
+    tournament.strategies = [Tournament.PatternStrategy(library)]    # Dependency
+    tournament.run()
+    library.save(args.output)
+    print("{} entries ({} new), {} lookups answered from the library and {} solved".format(
+        len(library), len(library) - num_entries_before, library.num_hits, library.num_misses))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
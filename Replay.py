@@ -0,0 +1,126 @@
+import io
+import time
+import struct
+from array import array
+
+import Minesweeper
+import Storage
+
+# Log layout: a header with everything needed to rebuild the starting board, then one fixed-size record per
+# move: the linear index of the cell, the seconds since recording started and the action taken on the cell.
+# Version 1 logs have no action byte, as every move in them is an uncover
+MAGIC = b'MSWL'
+FORMAT_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+HEADER = struct.Struct('<4sHHIIQQ')
+MOVE = struct.Struct('<QdB')
+VERSION_1_MOVE = struct.Struct('<Qd')
+ACTIONS = ("uncover", "flag", "chord")
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+FLAG_FIRST_CLICK_SAFE = 0x1
+FLAG_TORUS = 0x2
+
+
+class MoveLog(object):
+    """Append-only record of the moves made on a Board"""
+
+    def __init__(self, board, stream=None):
+        if not isinstance(board.seed, int) or not 0 <= board.seed < 2 ** 64:
+            raise ValueError("Only boards created from an integer seed can be recorded")
+        self.stream = stream if stream is not None else io.BytesIO()
+        self.start_time = time.monotonic()
+        flags = (FLAG_FIRST_CLICK_SAFE if board.first_click_safe else 0) \
+            | (FLAG_TORUS if board.topology == "torus" else 0)
+        self.stream.write(HEADER.pack(MAGIC, FORMAT_VERSION, flags, board.num_rows, board.num_cols,
+                                      board.num_mines, board.seed))
+
+    def record(self, action, index):
+        self.stream.write(MOVE.pack(index, time.monotonic() - self.start_time, ACTION_CODES[action]))
+
+    def getvalue(self):
+        return self.stream.getvalue()
+
+
+def record_moves(board, stream=None):
+    # every later uncover, flag and chord on the board, including those made through Game.update_board, is
+    # appended to the log
+    board.move_log = MoveLog(board, stream)    # Dependency
+    return board.move_log
+
+
+def load_replay(path, checkpoint_interval=1000):
+    with open(path, 'rb') as f:
+        return Replayer(f.read(), checkpoint_interval)    # Dependency
+
+
+class Replayer(object):
+    """Rebuilds the board of a recorded game after any number of moves"""
+
+    def __init__(self, data, checkpoint_interval=1000):
+        if len(data) < HEADER.size:
+            raise ValueError("Move log is truncated")
+        magic, version, flags, self.num_rows, self.num_cols, self.num_mines, self.seed = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a move log")
+        if version not in SUPPORTED_VERSIONS:
+            raise ValueError("Unsupported move log version {}".format(version))
+        self.first_click_safe = bool(flags & FLAG_FIRST_CLICK_SAFE)
+        self.topology = "torus" if flags & FLAG_TORUS else "plane"
+
+        # a partly written final record, e.g. from a crashed recorder, is ignored
+        move = MOVE if version >= 2 else VERSION_1_MOVE
+        num_moves = (len(data) - HEADER.size) // move.size
+        moves = memoryview(data)[HEADER.size:HEADER.size + num_moves * move.size]
+        self.move_indices = array('q')
+        self.move_times = array('d')
+        self.move_actions = array('B')
+        for index, seconds, *action_code in move.iter_unpack(moves):
+            self.move_indices.append(index)
+            self.move_times.append(seconds)
+            self.move_actions.append(action_code[0] if action_code else ACTION_CODES["uncover"])
+
+        # snapshots of the board every checkpoint_interval moves, taken the first time a replay passes them
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoints = {}
+
+    def __len__(self):
+        return len(self.move_indices)
+
+    def get_move(self, move_number):
+        # (row, col, seconds since recording started, action) of the move_number-th move, counting from 0
+        row, col = divmod(self.move_indices[move_number], self.num_cols)
+        return row, col, self.move_times[move_number], ACTIONS[self.move_actions[move_number]]
+
+    def create_starting_board(self):
+        return Minesweeper.Board(self.num_rows, self.num_mines, rng=self.seed,
+                                 first_click_safe=self.first_click_safe, num_cols=self.num_cols,
+                                 topology=self.topology)    # Dependency
+
+    def get_board(self, num_moves):
+        # the board after the first num_moves moves, starting from the latest checkpoint at or before it
+        if not 0 <= num_moves <= len(self):
+            raise IndexError("move number out of range")
+        board = None
+        for _, board in self.stream(num_moves, num_moves):
+            pass
+        return board
+
+    def stream(self, start=0, stop=None):
+        # yields (num_moves, board) for every position from start to stop inclusive; the same board object
+        # is advanced in place, so copy it with Storage.dumps_board to keep a position
+        stop = len(self) if stop is None else stop
+        num_moves = start // self.checkpoint_interval * self.checkpoint_interval
+        while num_moves and num_moves not in self.checkpoints:
+            num_moves -= self.checkpoint_interval
+        board = Storage.loads_board(self.checkpoints[num_moves]) if num_moves else self.create_starting_board()
+
+        while True:
+            if num_moves >= start:
+                yield num_moves, board
+            if num_moves >= stop:
+                return
+            board.apply_action_index(ACTIONS[self.move_actions[num_moves]], self.move_indices[num_moves])
+            num_moves += 1
+            if num_moves % self.checkpoint_interval == 0 and num_moves not in self.checkpoints:
+                self.checkpoints[num_moves] = Storage.dumps_board(board)
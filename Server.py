@@ -0,0 +1,268 @@
+import sys
+import time
+import random
+import asyncio
+import argparse
+import concurrent.futures
+
+import Minesweeper
+
+
+class GameSession(object):
+    """
+    One player's game driven by lines of text instead of input().  The parameter and turn validators do the
+    parsing; handle_line returns the text to send back and whether the session is over.
+    """
+
+    def __init__(self, max_side_length=30):
+        self.param_input_validator = Minesweeper.ParameterInputValidator(max_side_length)    # Dependency
+        self.turn_input_validator = None
+        self.size_of_square_grid = None
+        self.board = None
+
+    def get_greeting(self):
+        return "Welcome to Minesweeper!\n" + self.get_prompt()
+
+    def get_prompt(self):
+        if self.size_of_square_grid is None:
+            return "==>Enter an integer between 0 and {}: ".format(self.param_input_validator.max_side_length)
+        if self.board is None:
+            return "==>Enter an integer between 0 and {}: ".format(self.size_of_square_grid ** 2)
+        return "==>Enter row number and column number to uncover: "
+
+    def handle_line(self, line):
+        user_input = line.strip()
+        # checked here rather than by the validators, which print to the server's terminal
+        if user_input == self.param_input_validator.termination_str:
+            return "Thanks for playing! See you next time!\n", True
+
+        try:
+            if self.size_of_square_grid is None:
+                self.size_of_square_grid = self.param_input_validator._validate_size_of_grid(user_input)
+                return self.get_prompt(), False
+            if self.board is None:
+                num_mines = self.param_input_validator._validate_num_mines(user_input, self.size_of_square_grid)
+                self.start_board(num_mines)
+                # a board without safe cells is already won, as Game.play_round finds before its first prompt
+                if self.board.are_all_safe_cells_flipped():
+                    return self.finish_round(), False
+                return "{}\n{}".format(self.board, self.get_prompt()), False
+            action, (row, col) = self.turn_input_validator._validate_turn(user_input)
+        except (ValueError, TypeError) as e:
+            return "Invalid input.  {}\n{}".format(e, self.get_prompt()), False
+
+        self.board.apply_action(action, self.board.get_cell(row, col))
+        if self.board.mine_uncovered or self.board.are_all_safe_cells_flipped():
+            return self.finish_round(), False
+        return "{}\n{}".format(self.board, self.get_prompt()), False
+
+    def start_board(self, num_mines):
+        self.board = Minesweeper.create_board(self.size_of_square_grid, num_mines)    # Dependency
+        max_len_of_turn_input_str = 2 * len(str(self.size_of_square_grid - 1)) + 1
+        self.turn_input_validator \
+            = Minesweeper.TurnInputValidator(max_len_of_turn_input_str, self.board.is_cell_on_board)    # Dependency
+
+    def finish_round(self):
+        won = not self.board.mine_uncovered
+        self.board.uncover_all_cells()
+        output = "{}\n{}\n".format(self.board, "You won!" if won else "Unfortunately that was a mine :/")
+        self.size_of_square_grid = None
+        self.board = None
+        self.turn_input_validator = None
+        return output + "New game.  " + self.get_prompt()
+
+
+class GameServer(object):
+    """
+    Line-based TCP server hosting one GameSession per connection.  Connections beyond max_sessions are turned
+    away, sessions idle for idle_timeout seconds are closed, and each reply waits for the client to drain its
+    socket before the next line is read, so a slow reader cannot make the server buffer without bound.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8023, max_sessions=20000, idle_timeout=300.0, max_side_length=30,
+                 max_line_length=64, write_buffer_limit=64 * 1024):
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_side_length = max_side_length
+        self.max_line_length = max_line_length
+        self.write_buffer_limit = write_buffer_limit
+        self.sessions = set()
+        self.connection_tasks = set()
+        self.num_sessions_served = 0
+        self.num_sessions_rejected = 0
+        self.num_sessions_expired = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port,
+                                                 limit=self.max_line_length, backlog=4096)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        for task in self.connection_tasks:
+            task.cancel()
+        await asyncio.gather(*self.connection_tasks, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        writer.transport.set_write_buffer_limits(high=self.write_buffer_limit)
+        if len(self.sessions) >= self.max_sessions:
+            self.num_sessions_rejected += 1
+            writer.write(b"Server is full, try again later\n")
+            await self.close_writer(writer)
+            return
+
+        session = GameSession(self.max_side_length)    # Dependency
+        task = asyncio.current_task()
+        self.sessions.add(session)
+        self.connection_tasks.add(task)
+        self.num_sessions_served += 1
+        try:
+            await self.send(writer, session.get_greeting())
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    self.num_sessions_expired += 1
+                    await self.send(writer, "\nSession expired after {} idle seconds\n".format(self.idle_timeout))
+                    break
+                except ValueError:
+                    # the line overran the reader's limit; no valid move is that long
+                    await self.send(writer, "Input is too many characters\n")
+                    break
+                if not line:
+                    break
+                output, is_session_over = session.handle_line(line.decode("utf-8", "replace"))
+                await self.send(writer, output)
+                if is_session_over:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            # cancelled only by close(); finishing quietly keeps asyncio from logging the handler as failed
+            pass
+        finally:
+            self.sessions.discard(session)
+            self.connection_tasks.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def send(writer, text):
+        writer.write(text.encode())
+        await writer.drain()
+
+    @staticmethod
+    async def close_writer(writer):
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def play_synthetic_client(host, port, size, num_mines, num_moves, rng, latencies):
+    # answers every prompt with a random move and records how long each reply took to arrive
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        await reader.readuntil(b": ")
+        for line in [str(size), str(num_mines)] + ["{} {}".format(rng.randrange(size), rng.randrange(size))
+                                                   for _ in range(num_moves)]:
+            start_time = time.perf_counter()
+            writer.write(line.encode() + b"\n")
+            await writer.drain()
+            await reader.readuntil(b": ")
+            latencies.append(time.perf_counter() - start_time)
+        writer.write(b"q\n")
+        await writer.drain()
+        await reader.read()
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, num_clients, size=9, num_mines=10, num_moves=10, seed=0, concurrency_limit=None):
+    """Connect num_clients synthetic players at once and return (num_failed, latencies, elapsed_seconds)"""
+    rng = random.Random(seed)    # Dependency
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency_limit or num_clients)
+
+    async def play(client_seed):
+        async with semaphore:
+            await play_synthetic_client(host, port, size, num_mines, num_moves, random.Random(client_seed),
+                                        latencies)
+
+    start_time = time.perf_counter()
+    results = await asyncio.gather(*[play(rng.getrandbits(64)) for _ in range(num_clients)], return_exceptions=True)
+    num_failed = sum(isinstance(result, Exception) for result in results)
+    return num_failed, latencies, time.perf_counter() - start_time
+
+
+def raise_open_file_limit():
+    # every client holds a socket at each end, so 10k players need ~20k descriptors
+    try:
+        import resource
+    except ImportError:
+        return
+    soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard_limit == resource.RLIM_INFINITY or soft_limit < hard_limit:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard_limit, hard_limit))
+
+
+def run_load_in_process(load_args):
+    raise_open_file_limit()
+    return asyncio.run(run_load(*load_args))
+
+
+async def run_load_test(args):
+    # the clients run in a child process so that each side has its own file descriptors and CPU
+    server = await GameServer(port=0, max_sessions=args.clients, idle_timeout=args.idle_timeout).start()
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+            load_args = (server.host, server.port, args.clients, args.size, args.mines, args.moves, args.seed)
+            num_failed, latencies, elapsed_seconds = await asyncio.get_running_loop().run_in_executor(
+                executor, run_load_in_process, load_args)
+    finally:
+        await server.close()
+    latencies.sort()
+    print("{} clients, {} failed, {} replies in {:.2f}s ({:.0f} replies/s)".format(
+        args.clients, num_failed, len(latencies), elapsed_seconds, len(latencies) / elapsed_seconds))
+    if latencies:
+        print("reply latency p50 {:.2f}ms, p99 {:.2f}ms, max {:.2f}ms".format(
+            1000 * latencies[len(latencies) // 2], 1000 * latencies[int(len(latencies) * 0.99)],
+            1000 * latencies[-1]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="Minesweeper.py serve", description="Host many games over line-based TCP")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8023, help="port to listen on")
+    parser.add_argument("--max-sessions", type=int, default=20000, help="connections beyond this are turned away")
+    parser.add_argument("--idle-timeout", type=float, default=300.0, help="seconds before an idle session closes")
+    parser.add_argument("--load-test", action="store_true", help="serve on a free port and play synthetic clients")
+    parser.add_argument("--clients", type=int, default=10000, help="number of synthetic clients")
+    parser.add_argument("--size", type=int, default=9, help="board size the synthetic clients choose")
+    parser.add_argument("--mines", type=int, default=10, help="number of mines the synthetic clients choose")
+    parser.add_argument("--moves", type=int, default=10, help="moves per synthetic client")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic clients' moves")
+    args = parser.parse_args(argv)
+
+    raise_open_file_limit()
+    if args.load_test:
+        asyncio.run(run_load_test(args))
+    else:
+        server = GameServer(args.host, args.port, args.max_sessions, args.idle_timeout)    # Dependency
+        print("Serving Minesweeper on {}:{}".format(args.host, args.port))
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+import random
+import argparse
+import multiprocessing
+
+import Minesweeper
+
+
+def random_policy(board, rng):
+    # a few blind draws find a covered cell on most turns; fall back to a scan late in the game
+    num_cells = board.num_rows * board.num_cols
+    for _ in range(8):
+        index = rng.randrange(num_cells)
+        if board.is_index_covered(index):
+            return divmod(index, board.num_cols)
+    return divmod(rng.choice(board.get_covered_indices()), board.num_cols)
+
+
+POLICIES = {
+    "random": random_policy,
+}
+
+
+class SimulationResult(object):
+    def __init__(self, num_games=0, num_wins=0, num_clicks=0, elapsed_seconds=0.0):
+        self.num_games = num_games
+        self.num_wins = num_wins
+        self.num_clicks = num_clicks
+        self.elapsed_seconds = elapsed_seconds
+
+    def add(self, other):
+        self.num_games += other.num_games
+        self.num_wins += other.num_wins
+        self.num_clicks += other.num_clicks
+
+    @property
+    def win_rate(self):
+        return self.num_wins / self.num_games if self.num_games else 0.0
+
+    @property
+    def clicks_per_game(self):
+        return self.num_clicks / self.num_games if self.num_games else 0.0
+
+    @property
+    def games_per_second(self):
+        return self.num_games / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def __str__(self):
+        return "Games: {}\nWin rate: {:.4f}\nClicks per game: {:.2f}\nGames per second: {:.1f}".format(
+            self.num_games, self.win_rate, self.clicks_per_game, self.games_per_second)
+
+
+def play_headless_game(board, policy, rng):
+    num_clicks = 0
+    while not (board.are_all_safe_cells_flipped() or board.mine_uncovered):
+        row, col = policy(board, rng)
+        board.uncover_index(board.get_index(row, col))
+        num_clicks += 1
+    return not board.mine_uncovered, num_clicks
+
+
+def run_chunk(args):
+    num_rows, num_cols, num_mines, num_games, seed, policy, first_click_safe, backend = args
+    rng = random.Random(seed)
+    result = SimulationResult()
+    for _ in range(num_games):
+        board = Minesweeper.create_board(num_rows, num_mines, backend, rng=rng.getrandbits(64),
+                                         first_click_safe=first_click_safe, num_cols=num_cols)    # Dependency
+        is_game_won, num_clicks = play_headless_game(board, policy, rng)
+        result.add(SimulationResult(1, int(is_game_won), num_clicks))
+    return result
+
+
+def get_chunks(num_rows, num_cols, num_mines, num_games, seed, policy, first_click_safe, games_per_chunk, backend):
+    # chunk seeds depend only on the base seed and the chunk's position, never on the number of workers,
+    # so a run is reproducible however its chunks get scheduled
+    seed_rng = random.Random(seed)
+    for first_game in range(0, num_games, games_per_chunk):
+        num_games_in_chunk = min(games_per_chunk, num_games - first_game)
+        yield (num_rows, num_cols, num_mines, num_games_in_chunk, seed_rng.getrandbits(64), policy,
+               first_click_safe, backend)
+
+
+def simulate(num_rows, num_mines, num_games, num_workers=1, policy=random_policy, seed=0,
+             first_click_safe=False, games_per_chunk=1000, num_cols=None, backend="auto"):
+    # policy is called as policy(board, rng) and returns the (row, col) to uncover;
+    # it must be a module-level function so that it can be sent to worker processes.
+    # Boards are square unless num_cols is given.
+    num_cols = num_rows if num_cols is None else num_cols
+    chunks = get_chunks(num_rows, num_cols, num_mines, num_games, seed, policy, first_click_safe, games_per_chunk,
+                        backend)
+    result = SimulationResult()
+    start_time = time.perf_counter()
+    if num_workers <= 1:
+        for chunk in chunks:
+            result.add(run_chunk(chunk))
+    else:
+        with multiprocessing.Pool(num_workers) as pool:
+            for chunk_result in pool.imap_unordered(run_chunk, chunks):
+                result.add(chunk_result)
+    result.elapsed_seconds = time.perf_counter() - start_time
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="Minesweeper.py simulate",
+                                     description="Play many headless games with a move policy")
+    parser.add_argument("--size", type=int, default=9, help="number of rows, and of columns unless --cols is given")
+    parser.add_argument("--cols", type=int, default=None, help="number of columns")
+    parser.add_argument("--mines", type=int, default=10, help="number of mines per board")
+    parser.add_argument("--games", type=int, default=1000, help="number of games to play")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random", help="move policy")
+    parser.add_argument("--seed", type=int, default=0, help="base seed for boards and policies")
+    parser.add_argument("--first-click-safe", action="store_true", help="never place a mine under the first click")
+    parser.add_argument("--backend", choices=["auto"] + sorted(Minesweeper.BOARD_BACKENDS), default="auto",
+                        help="board implementation; auto uses bitboards for small boards")
+    args = parser.parse_args(argv)
+
+    result = simulate(args.size, args.mines, args.games, args.workers, POLICIES[args.policy], args.seed,
+                      args.first_click_safe, num_cols=args.cols, backend=args.backend)
+    print(result)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,383 @@
+import re
+import math
+from collections import OrderedDict
+
+import Minesweeper
+
+# uncovered cells with a mine around them: the only cells that constrain their covered neighbors
+UNCOVERED_NUMBER = re.compile(b'[' + re.escape(bytes([1])) + b'-' + re.escape(bytes([8])) + b']')
+
+
+class Constraint(object):
+    """The undecided covered neighbors of one uncovered number, and how many of them are mines"""
+    __slots__ = ('unknown', 'num_mines')
+
+    def __init__(self, unknown, num_mines):
+        self.unknown = unknown
+        self.num_mines = num_mines
+
+
+class Solver(object):
+    """Finds every covered cell that is provably safe or provably a mine from the visible board"""
+
+    def __init__(self, board):
+        self.board = board
+        self.safe = set()
+        self.mines = set()
+
+        # keyed by the index of the uncovered number that owns the constraint
+        self.constraints = {}
+        self.owners_of_constraints_on_cell = {}
+
+        # owners whose constraint changed and still need the single-cell rules, then the pair rules;
+        # dicts rather than sets, because repeatedly popping a churning set degrades to a linear scan
+        self.dirty = {}
+        self.dirty_for_pair_rules = {}
+
+        self.update()
+
+    def uncover(self, row, col):
+        revealed = self.board.uncover_index(self.board.get_index(row, col))
+        self.update(revealed.indices())
+        return revealed
+
+    def update(self, revealed_indices=None):
+        # only the revealed cells and the constraints they touch are re-examined;
+        # with no argument the whole visible board is read
+        if revealed_indices is None:
+            revealed_indices = [match.start() for match in UNCOVERED_NUMBER.finditer(self.board.cells)]
+        for index in revealed_indices:
+            self.on_cell_revealed(index)
+        self.propagate()
+
+    def get_safe_cells(self):
+        return {divmod(index, self.board.num_cols) for index in self.safe}
+
+    def get_mines(self):
+        return {divmod(index, self.board.num_cols) for index in self.mines}
+
+    def on_cell_revealed(self, index):
+        value = self.board.cells[index]
+        if value & Minesweeper.MINE:
+            self.mark_mine(index)
+            return
+
+        self.safe.discard(index)
+        for owner in self.owners_of_constraints_on_cell.pop(index, ()):
+            self.constraints[owner].unknown.discard(index)
+            self.dirty[owner] = None
+
+        if value & Minesweeper.COUNT_MASK:
+            self.add_constraint(index, value & Minesweeper.COUNT_MASK)
+
+    def add_constraint(self, owner, num_mines):
+        cells = self.board.cells
+        unknown = set()
+        for neighbor in self.board.get_surrounding_indices(owner):
+            if neighbor in self.mines:
+                num_mines -= 1
+            elif cells[neighbor] & Minesweeper.COVERED and neighbor not in self.safe:
+                unknown.add(neighbor)
+        if not unknown:
+            return
+
+        self.constraints[owner] = Constraint(unknown, num_mines)
+        for cell in unknown:
+            self.owners_of_constraints_on_cell.setdefault(cell, set()).add(owner)
+        self.dirty[owner] = None
+
+    def mark_safe(self, index):
+        self.safe.add(index)
+        for owner in self.owners_of_constraints_on_cell.pop(index, ()):
+            self.constraints[owner].unknown.discard(index)
+            self.dirty[owner] = None
+
+    def mark_mine(self, index):
+        if index in self.mines:
+            return
+        self.mines.add(index)
+        for owner in self.owners_of_constraints_on_cell.pop(index, ()):
+            constraint = self.constraints[owner]
+            constraint.unknown.discard(index)
+            constraint.num_mines -= 1
+            self.dirty[owner] = None
+
+    def propagate(self):
+        # single-cell rules run to a fixed point before any pair of constraints is compared
+        while self.dirty or self.dirty_for_pair_rules:
+            if self.dirty:
+                self.apply_single_cell_rules(self.dirty.popitem()[0])
+            else:
+                self.apply_pair_rules(self.dirty_for_pair_rules.popitem()[0])
+
+    def apply_single_cell_rules(self, owner):
+        constraint = self.constraints.get(owner)
+        if constraint is None:
+            return
+        if not constraint.unknown:
+            del self.constraints[owner]
+        elif constraint.num_mines == 0:
+            for cell in list(constraint.unknown):
+                self.mark_safe(cell)
+        elif constraint.num_mines == len(constraint.unknown):
+            for cell in list(constraint.unknown):
+                self.mark_mine(cell)
+        else:
+            self.dirty_for_pair_rules[owner] = None
+
+    def apply_pair_rules(self, owner):
+        constraint = self.constraints.get(owner)
+        if constraint is None:
+            return
+        overlapping_owners = set()
+        for cell in constraint.unknown:
+            overlapping_owners.update(self.owners_of_constraints_on_cell[cell])
+        overlapping_owners.discard(owner)
+
+        for other_owner in overlapping_owners:
+            other = self.constraints[other_owner]
+            if self.apply_pair_rule(constraint, other) or self.apply_pair_rule(other, constraint):
+                self.dirty[owner] = None
+                return
+
+    def apply_pair_rule(self, first, second):
+        # if first holds exactly |first - second| more mines than second, every cell only in first is a mine
+        # and every cell only in second is safe; subset and superset constraints are the special cases
+        # where one of the two differences is empty
+        only_in_first = first.unknown - second.unknown
+        if first.num_mines - second.num_mines != len(only_in_first):
+            return False
+        only_in_second = second.unknown - first.unknown
+        if not (only_in_first or only_in_second):
+            return False
+        for cell in only_in_first:
+            self.mark_mine(cell)
+        for cell in only_in_second:
+            self.mark_safe(cell)
+        return True
+
+
+class TranspositionCache(object):
+    """
+    Bounded LRU map from board positions to whatever was worked out about them.  Keys come from get_key, which
+    pairs the board's shape and mine count with its visible hash, so a position reached by different move
+    orders, in different branches or in different games maps to one entry.
+    """
+
+    def __init__(self, max_size=1 << 16):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.num_hits = 0
+        self.num_misses = 0
+
+    @staticmethod
+    def get_key(board, kind):
+        # kind tells apart the different results stored for one position
+        if board.visible_hash is None:
+            board.enable_visible_hash()
+        return kind, board.num_rows, board.num_cols, board.num_mines, board.topology, board.visible_hash
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.num_misses += 1
+            return None
+        self.num_hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class ComponentTable(object):
+    """Solution counts of one frontier component, by the number of mines k the solution places in it"""
+    __slots__ = ('num_solutions', 'num_solutions_with_mine')
+
+    def __init__(self, num_solutions, num_solutions_with_mine):
+        # num_solutions[k]: solutions with k mines; num_solutions_with_mine[i][k]: those with a mine on cell i
+        self.num_solutions = num_solutions
+        self.num_solutions_with_mine = num_solutions_with_mine
+
+
+class ProbabilityEngine(object):
+    """Exact mine probabilities for the undecided covered cells of a Solver's board"""
+
+    def __init__(self, cache_size=4096, transposition_cache=None):
+        # component tables are keyed by constraint signature, so one engine can serve many boards and games
+        self.cache_size = cache_size
+        self.component_cache = OrderedDict()
+        self.num_cache_hits = 0
+        self.num_cache_misses = 0
+        # whole results by position, for search code that reaches the same position more than once
+        self.transposition_cache = transposition_cache
+
+    def get_probabilities(self, solver):
+        # returns ({(row, col): probability} for the frontier, probability for any other undecided covered cell);
+        # results from the transposition cache are shared, so they must not be changed
+        if self.transposition_cache is None:
+            return self.compute_probabilities(solver)
+        key = TranspositionCache.get_key(solver.board, "probabilities")
+        result = self.transposition_cache.get(key)
+        if result is None:
+            result = self.compute_probabilities(solver)
+            self.transposition_cache.put(key, result)
+        return result
+
+    def compute_probabilities(self, solver):
+        board = solver.board
+        components = self.split_into_components(solver.constraints.values())
+        tables = [self.get_component_table(cells, constraints) for cells, constraints in components]
+
+        num_frontier_cells = sum(len(cells) for cells, _ in components)
+        num_covered = board.num_rows * board.num_cols - board.num_safe_cells_uncovered - board.mine_uncovered
+        num_other_cells = num_covered - num_frontier_cells - len(solver.safe) - len(solver.mines)
+        num_mines_left = board.num_mines - len(solver.mines)
+
+        def num_ways_off_frontier(num_mines_on_frontier):
+            num_mines_off_frontier = num_mines_left - num_mines_on_frontier
+            if not 0 <= num_mines_off_frontier <= num_other_cells:
+                return 0
+            return math.comb(num_other_cells, num_mines_off_frontier)
+
+        # solution counts of every component but one: the products of the tables before and after it
+        prefixes = [{0: 1}]
+        for table in tables:
+            prefixes.append(convolve(prefixes[-1], table.num_solutions))
+        suffixes = [{0: 1}]
+        for table in reversed(tables):
+            suffixes.append(convolve(suffixes[-1], table.num_solutions))
+        suffixes.reverse()
+
+        total_weight = sum(count * num_ways_off_frontier(k) for k, count in prefixes[-1].items())
+        if not total_weight:
+            raise ValueError("The visible board is inconsistent with {} mines".format(board.num_mines))
+
+        probabilities = {}
+        for (cells, _), table, prefix, suffix in zip(components, tables, prefixes, suffixes[1:]):
+            others = convolve(prefix, suffix)
+            weight_of_k = {k: sum(count * num_ways_off_frontier(k + other_k) for other_k, count in others.items())
+                           for k in table.num_solutions}
+            for cell, with_mine in zip(cells, table.num_solutions_with_mine):
+                mine_weight = sum(count * weight_of_k[k] for k, count in with_mine.items())
+                probabilities[divmod(cell, board.num_cols)] = mine_weight / total_weight
+
+        other_cell_probability = 0.0
+        if num_other_cells:
+            expected_mines_off_frontier = sum(count * num_ways_off_frontier(k) * (num_mines_left - k)
+                                              for k, count in prefixes[-1].items())
+            other_cell_probability = expected_mines_off_frontier / (total_weight * num_other_cells)
+        return probabilities, other_cell_probability
+
+    @staticmethod
+    def split_into_components(constraints):
+        # constraints that share a cell must be enumerated together; disjoint groups are independent
+        parent = {}
+
+        def find(cell):
+            while parent[cell] != cell:
+                parent[cell] = parent[parent[cell]]
+                cell = parent[cell]
+            return cell
+
+        constraints = list(constraints)
+        for constraint in constraints:
+            cells = iter(constraint.unknown)
+            first_cell = next(cells)
+            root = find(parent.setdefault(first_cell, first_cell))
+            for cell in cells:
+                parent[find(parent.setdefault(cell, cell))] = root
+
+        components = {}
+        for constraint in constraints:
+            root = find(next(iter(constraint.unknown)))
+            components.setdefault(root, (set(), []))
+            components[root][0].update(constraint.unknown)
+            components[root][1].append(constraint)
+        return [(sorted(cells), component_constraints) for cells, component_constraints in components.values()]
+
+    def get_component_table(self, cells, constraints):
+        # cells are sorted by board index, so translated copies of a component share one signature
+        position = {cell: i for i, cell in enumerate(cells)}
+        signature = (len(cells),) + tuple(sorted(
+            (tuple(sorted(position[cell] for cell in constraint.unknown)), constraint.num_mines)
+            for constraint in constraints))
+
+        table = self.component_cache.get(signature)
+        if table is not None:
+            self.num_cache_hits += 1
+            self.component_cache.move_to_end(signature)
+            return table
+
+        self.num_cache_misses += 1
+        table = self.enumerate_component(len(cells), signature[1:])
+        self.component_cache[signature] = table
+        if len(self.component_cache) > self.cache_size:
+            self.component_cache.popitem(last=False)
+        return table
+
+    @staticmethod
+    def enumerate_component(num_cells, constraints):
+        # Cells are decided in order.  The only thing the undecided tail depends on is how many mines each
+        # constraint that straddles the current position still needs, so partial assignments that agree on
+        # that state are merged: a forward pass counts the ways to reach each state, a backward pass the ways
+        # to complete it, and their product gives every cell's mine count without listing the solutions.
+        first_position = [min(positions) for positions, _ in constraints]
+        last_position = [max(positions) for positions, _ in constraints]
+        constraints_on_cell = [[] for _ in range(num_cells)]
+        for c, (positions, _) in enumerate(constraints):
+            for position in positions:
+                constraints_on_cell[position].append(c)
+        num_cells_after = [[sum(p > i for p in positions) for i in range(num_cells)] for positions, _ in constraints]
+        straddling = [[c for c in range(len(constraints)) if first_position[c] < i <= last_position[c]]
+                      for i in range(num_cells + 1)]
+
+        forward = [{(): {0: 1}}] + [{} for _ in range(num_cells)]
+        transitions = [[] for _ in range(num_cells)]
+        for i in range(num_cells):
+            for state, counts in forward[i].items():
+                num_mines_needed = dict(zip(straddling[i], state))
+                for c in constraints_on_cell[i]:
+                    num_mines_needed.setdefault(c, constraints[c][1])
+                for value in (0, 1):
+                    if not all(0 <= num_mines_needed[c] - value <= num_cells_after[c][i]
+                               for c in constraints_on_cell[i]):
+                        continue
+                    next_needed = dict(num_mines_needed)
+                    for c in constraints_on_cell[i]:
+                        next_needed[c] -= value
+                    next_state = tuple(next_needed[c] for c in straddling[i + 1])
+                    transitions[i].append((state, value, next_state))
+                    add_shifted(forward[i + 1].setdefault(next_state, {}), counts, value)
+
+        backward = [{} for _ in range(num_cells)] + [{(): {0: 1}}]
+        num_solutions_with_mine = [{} for _ in range(num_cells)]
+        for i in reversed(range(num_cells)):
+            for state, value, next_state in transitions[i]:
+                completions = backward[i + 1].get(next_state)
+                if completions is None:
+                    continue
+                add_shifted(backward[i].setdefault(state, {}), completions, value)
+                if value:
+                    add_shifted(num_solutions_with_mine[i], convolve(forward[i][state], completions), 1)
+
+        return ComponentTable(backward[0].get((), {}), num_solutions_with_mine)    # Dependency
+
+
+def convolve(first, second):
+    result = {}
+    for first_k, first_count in first.items():
+        for second_k, second_count in second.items():
+            result[first_k + second_k] = result.get(first_k + second_k, 0) + first_count * second_count
+    return result
+
+
+def add_shifted(total, counts, shift):
+    for k, count in counts.items():
+        total[k + shift] = total.get(k + shift, 0) + count
@@ -0,0 +1,196 @@
+import re
+import mmap
+import json
+import struct
+from array import array
+
+import Minesweeper
+
+# File layout: header, then a bitmap of mines, a bitmap of uncovered cells and a bitmap of flagged cells, one
+# bit per cell in row-major order, most significant bit first, each padded to a whole byte.  Version 1 files
+# have no flag bitmap
+MAGIC = b'MSWB'
+FORMAT_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+HEADER = struct.Struct('<4sHHIIQQ')
+
+FLAG_MINE_UNCOVERED = 0x1
+FLAG_MINES_PLACED = 0x2
+FLAG_TORUS = 0x4
+
+
+def get_bit_table(bit):
+    return bytes(b'1'[0] if value & bit else b'0'[0] for value in range(256))
+
+
+MINE_BIT_TABLE = get_bit_table(Minesweeper.MINE)
+UNCOVERED_BIT_TABLE = bytes(b'0'[0] if value & Minesweeper.COVERED else b'1'[0] for value in range(256))
+FLAGGED_BIT_TABLE = get_bit_table(Minesweeper.FLAGGED)
+
+
+def pack_bits(ascii_bits):
+    # ascii_bits holds one b'0' or b'1' per cell; int() parses base 2 in linear time
+    if not ascii_bits:
+        return b''
+    num_bytes = (len(ascii_bits) + 7) // 8
+    padded = ascii_bits + b'0' * (num_bytes * 8 - len(ascii_bits))
+    return int(padded, 2).to_bytes(num_bytes, 'big')
+
+
+def unpack_bits(packed, num_bits, one_value):
+    # one byte per cell: 0 for a clear bit, one_value for a set bit
+    if not num_bits:
+        return b''
+    ascii_bits = format(int.from_bytes(packed, 'big'), '0{}b'.format(len(packed) * 8)).encode()
+    return ascii_bits[:num_bits].translate(bytes.maketrans(b'01', bytes([0, one_value])))
+
+
+def dumps_board(board):
+    flags = (FLAG_MINE_UNCOVERED if board.mine_uncovered else 0) | (FLAG_MINES_PLACED if board.mines_placed else 0) \
+        | (FLAG_TORUS if board.topology == "torus" else 0)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, flags, board.num_rows, board.num_cols, board.num_mines,
+                         board.num_safe_cells_uncovered)
+    return header + pack_bits(board.cells.translate(MINE_BIT_TABLE)) \
+        + pack_bits(board.cells.translate(UNCOVERED_BIT_TABLE)) + pack_bits(board.cells.translate(FLAGGED_BIT_TABLE))
+
+
+def loads_board(data):
+    board_file = BoardFile(data)    # Dependency
+    return board_file.load_board()
+
+
+def save_board(board, path):
+    with open(path, 'wb') as f:
+        f.write(dumps_board(board))
+
+
+def load_board(path):
+    with open_board_file(path) as board_file:
+        return board_file.load_board()
+
+
+def open_board_file(path):
+    with open(path, 'rb') as f:
+        return BoardFile(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))    # Dependency
+
+
+class BoardFile(object):
+    """A saved board read in place: the header is decoded on open, the bitmaps only when a cell is looked up"""
+
+    def __init__(self, data):
+        self.data = data
+        if len(data) < HEADER.size:
+            raise ValueError("Board data is truncated")
+        magic, version, flags, self.num_rows, self.num_cols, self.num_mines, self.num_safe_cells_uncovered \
+            = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a board file")
+        if version not in SUPPORTED_VERSIONS:
+            raise ValueError("Unsupported board file version {}".format(version))
+        self.version = version
+        self.mine_uncovered = bool(flags & FLAG_MINE_UNCOVERED)
+        self.mines_placed = bool(flags & FLAG_MINES_PLACED)
+        self.topology = "torus" if flags & FLAG_TORUS else "plane"
+
+        self.num_cells = self.num_rows * self.num_cols
+        self.bitmap_size = (self.num_cells + 7) // 8
+        self.mine_bitmap_offset = HEADER.size
+        self.uncovered_bitmap_offset = self.mine_bitmap_offset + self.bitmap_size
+        self.flagged_bitmap_offset = self.uncovered_bitmap_offset + self.bitmap_size if version >= 2 else None
+        self.record_size = self.uncovered_bitmap_offset + self.bitmap_size * (2 if version >= 2 else 1)
+        if len(data) < self.record_size:
+            raise ValueError("Board data is truncated")
+
+    def get_bit(self, offset, row, col):
+        index = row * self.num_cols + col
+        return bool(self.data[offset + index // 8] >> (7 - index % 8) & 1)
+
+    def is_mine(self, row, col):
+        return self.get_bit(self.mine_bitmap_offset, row, col)
+
+    def is_uncovered(self, row, col):
+        return self.get_bit(self.uncovered_bitmap_offset, row, col)
+
+    def is_flagged(self, row, col):
+        return self.flagged_bitmap_offset is not None and self.get_bit(self.flagged_bitmap_offset, row, col)
+
+    def get_bitmap(self, offset):
+        return self.data[offset:offset + self.bitmap_size]
+
+    def load_board(self):
+        board = Minesweeper.Board(self.num_rows, self.num_mines, first_click_safe=True,
+                                  num_cols=self.num_cols, topology=self.topology)    # Dependency
+        if self.mines_placed:
+            is_mine = unpack_bits(self.get_bitmap(self.mine_bitmap_offset), self.num_cells, 1)
+            board.mine_indices = array('q', [match.start() for match in re.finditer(b'\x01', is_mine)])
+            board.mines_placed = True
+            board.board = board.empty_board()
+            board.populate_board_with_all_cells()
+
+        # clear the covered bit of every uncovered cell by XOR-ing the whole board as one big integer
+        uncovered_mask = unpack_bits(self.get_bitmap(self.uncovered_bitmap_offset), self.num_cells,
+                                     Minesweeper.COVERED)
+        cells = int.from_bytes(board.cells, 'big') ^ int.from_bytes(uncovered_mask, 'big')
+        board.cells[:] = cells.to_bytes(self.num_cells, 'big')
+        board.mark_all_cells_changed()
+        if self.flagged_bitmap_offset is not None:
+            # flags go through the board so that its flag counts follow
+            is_flagged = unpack_bits(self.get_bitmap(self.flagged_bitmap_offset), self.num_cells, 1)
+            for match in re.finditer(b'\x01', is_flagged):
+                board.toggle_flag_index(match.start())
+
+        board.num_safe_cells_uncovered = self.num_safe_cells_uncovered
+        board.mine_uncovered = self.mine_uncovered
+        return board
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export_board_json(board):
+    # human-readable dump for debugging; rows use the board's display characters
+    return json.dumps({
+        "version": FORMAT_VERSION,
+        "num_rows": board.num_rows,
+        "num_cols": board.num_cols,
+        "topology": board.topology,
+        "num_mines": board.num_mines,
+        "num_safe_cells_uncovered": board.num_safe_cells_uncovered,
+        "mine_uncovered": board.mine_uncovered,
+        "mines_placed": board.mines_placed,
+        "mines": sorted(board.mine_locations),
+        "rows": [board.cells[row * board.num_cols:(row + 1) * board.num_cols]
+                 .translate(Minesweeper.CELL_CHAR_TABLE).decode() for row in range(board.num_rows)],
+    }, indent=1)
+
+
+def import_board_json(text):
+    state = json.loads(text)
+    if state["version"] not in SUPPORTED_VERSIONS:
+        raise ValueError("Unsupported board file version {}".format(state["version"]))
+    board = Minesweeper.Board(state["num_rows"], state["num_mines"], first_click_safe=True,
+                              num_cols=state["num_cols"], topology=state.get("topology", "plane"))    # Dependency
+    if state["mines_placed"]:
+        board.mine_locations = [tuple(location) for location in state["mines"]]
+        board.board = board.empty_board()
+        board.populate_board_with_all_cells()
+    flagged_indices = []
+    for row, line in enumerate(state["rows"]):
+        for col, char in enumerate(line):
+            if char == 'F':
+                flagged_indices.append(board.get_index(row, col))
+            elif char != 'X':
+                board.cells[board.get_index(row, col)] &= ~Minesweeper.COVERED
+    board.mark_all_cells_changed()
+    for index in flagged_indices:
+        board.toggle_flag_index(index)
+    board.num_safe_cells_uncovered = state["num_safe_cells_uncovered"]
+    board.mine_uncovered = state["mine_uncovered"]
+    return board
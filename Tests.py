@@ -1,5 +1,27 @@
 import unittest
+import os
+import json
+import random
+import asyncio
+import io
+import sys
+import select
+import tempfile
+import subprocess
+import itertools
 import Minesweeper
+import MinesweeperCore
+import Simulation
+import Solver
+import Storage
+import Replay
+import ChunkedBoard
+import Benchmark
+import Server
+import Generator
+import Tournament
+import Patterns
+import BoardBatch
 
 
 class Tests(unittest.TestCase):
@@ -245,3 +267,983 @@ class Tests(unittest.TestCase):
 
         expected_board = ".\n"
         self.assertEqual(expected_board, self.get_board_str(self.Game.board.board))
+
+    def test_flagging_and_chording(self):
+        self.initialize_non_random_game(5, 1, {(0, 0)})
+        board = self.Game.board
+        self.Game.update_board((1, 1))
+        self.assertEqual(0, len(board.chord_cell(board.get_cell(1, 1))))
+
+        self.Game.update_board((0, 0), "flag")
+        self.assertTrue(board.get_cell(0, 0).is_flagged)
+        self.assertEqual(1, board.get_num_flags_around(board.get_index(1, 1)))
+        self.assertEqual(0, len(board.uncover_cell(board.get_cell(0, 0))))
+        self.assertEqual("F X X X X\n", self.get_board_str(board.board).splitlines(True)[0])
+        self.assertEqual(" 0 | F  X  X  X  X\n", str(board).splitlines(True)[3])
+
+        self.Game.update_board((1, 1), "chord")
+        self.assertTrue(self.Game.is_game_over())
+        self.assertTrue(self.Game.is_game_won)
+        self.assertTrue(board.get_cell(0, 0).is_flagged)
+
+        self.Game.update_board((0, 0), "flag")
+        self.assertFalse(board.get_cell(0, 0).is_flagged)
+        self.assertEqual((0, 0), (board.num_flags, board.get_num_flags_around(board.get_index(1, 1))))
+
+    def test_flags_survive_deferred_mine_placement(self):
+        board = Minesweeper.Board(5, 3, rng=1, first_click_safe=True)
+        board.toggle_flag(board.get_cell(4, 4))
+        board.uncover_cell(board.get_cell(0, 0))
+        self.assertTrue(board.get_cell(4, 4).is_flagged)
+        self.assertEqual(1, board.num_flags)
+        self.assertEqual(3, sum(board.flag_counts))
+
+    def test_bitboard_matches_byte_board(self):
+        rng = random.Random(11)
+        for num_rows, num_cols, num_mines in [(1, 1, 0), (9, 9, 10), (16, 16, 40), (16, 30, 99), (5, 17, 0)]:
+            for first_click_safe in (False, True):
+                seed = rng.getrandbits(64)
+                boards = [backend(num_rows, num_mines, rng=seed, first_click_safe=first_click_safe, num_cols=num_cols)
+                          for backend in (Minesweeper.Board, Minesweeper.BitBoard)]
+                for _ in range(30):
+                    action = rng.choice(["uncover", "uncover", "flag", "chord"])
+                    row, col = rng.randrange(num_rows), rng.randrange(num_cols)
+                    results = [board.apply_action(action, board.get_cell(row, col)) for board in boards]
+                    if action != "flag":
+                        results = [sorted(revealed) for revealed in results]
+                    self.assertEqual(results[0], results[1])
+                    self.assertEqual(*[(bytes(board.cells), board.num_safe_cells_uncovered, board.mine_uncovered,
+                                        board.num_flags, str(board)) for board in boards])
+
+        self.assertIsInstance(Minesweeper.create_board(16, 40, num_cols=30), Minesweeper.BitBoard)
+        self.assertIsInstance(Minesweeper.create_board(64, 400), Minesweeper.Board)
+        self.assertIsInstance(Minesweeper.create_board(9, 10, "bytes"), Minesweeper.Board)
+        self.assertIsInstance(Minesweeper.Game((9, 10), board_backend="bitboard").board, Minesweeper.BitBoard)
+
+    def test_cell_uncover_and_flag_counts_on_both_backends(self):
+        boards = [backend(5, 0, rng=1) for backend in (Minesweeper.Board, Minesweeper.BitBoard)]
+        for board in boards:
+            board.get_cell(0, 0).uncover()
+            self.assertFalse(board.get_cell(0, 0).is_covered)
+            board.toggle_flag_index(24)
+            self.assertFalse(board.get_cell(0, 0).is_covered)
+            self.assertEqual((1, 0), (board.flag_counts[18], board.flag_counts[0]))
+        self.assertEqual(*[bytes(board.cells) for board in boards])
+
+        bitboard = boards[1]
+        fork = bitboard.fork()
+        fork.get_cell(2, 2).uncover()
+        self.assertTrue(bitboard.get_cell(2, 2).is_covered)
+        self.assertFalse(fork.get_cell(2, 2).is_covered)
+        self.assertIsInstance(bitboard.cells, bytes)
+
+    def test_bitboard_flags_and_chords_without_int_bit_count(self):
+        # int.bit_count is missing before Python 3.10, where count_bits falls back to count_set_bits
+        self.assertEqual([0, 1, 3, 64], [MinesweeperCore.count_set_bits(bits) for bits in (0, 8, 7, (1 << 64) - 1)])
+        count_bits = MinesweeperCore.count_bits
+        MinesweeperCore.count_bits = MinesweeperCore.count_set_bits
+        try:
+            board = Minesweeper.BitBoard(3, 0, rng=1)
+            board.mine_locations = {(0, 0)}
+            board.populate_board_with_all_cells()
+            board.uncover_cell(board.get_cell(1, 1))
+            board.toggle_flag(board.get_cell(0, 0))
+            self.assertEqual(1, board.num_flags)
+            self.assertEqual(1, board.flag_counts[4])
+            self.assertEqual(7, len(board.chord_cell(board.get_cell(1, 1))))
+            self.assertEqual((8, False), (board.num_safe_cells_uncovered, board.mine_uncovered))
+        finally:
+            MinesweeperCore.count_bits = count_bits
+
+    def test_undo_redo_and_branches(self):
+        rng = random.Random(5)
+        for backend in (Minesweeper.Board, Minesweeper.BitBoard):
+            board = backend(16, 40, rng=3, first_click_safe=True, num_cols=30)
+            board.enable_undo()
+            positions = [(bytes(board.cells), board.num_safe_cells_uncovered, board.mine_uncovered)]
+            for action in ["uncover"] + [rng.choice(["uncover", "uncover", "flag", "chord"]) for _ in range(40)]:
+                board.apply_action_index(action, rng.randrange(len(board.cells)))
+                if len(board.history) == len(positions):
+                    positions.append((bytes(board.cells), board.num_safe_cells_uncovered, board.mine_uncovered))
+            # the first click placed the mines, which undo leaves in place
+            positions[0] = (bytes((value | Minesweeper.COVERED) & ~Minesweeper.FLAGGED for value in board.cells), 0, False)
+            final_flags = board.num_flags
+
+            for position in reversed(positions[:-1]):
+                self.assertTrue(board.undo())
+                self.assertEqual(position, (bytes(board.cells), board.num_safe_cells_uncovered, board.mine_uncovered))
+            self.assertFalse(board.undo())
+            while board.redo():
+                pass
+            self.assertEqual(positions[-1], (bytes(board.cells), board.num_safe_cells_uncovered, board.mine_uncovered))
+            self.assertEqual(final_flags, board.num_flags)
+
+            fork = board.fork()
+            with board.branch():
+                for index in board.get_covered_indices():
+                    board.uncover_index(index)
+                self.assertTrue(board.mine_uncovered)
+            self.assertEqual(positions[-1], (bytes(board.cells), board.num_safe_cells_uncovered, board.mine_uncovered))
+            self.assertTrue(board.undo())
+
+            fork.uncover_all_cells()
+            self.assertEqual(positions[-2][0], bytes(board.cells))
+            self.assertFalse(fork.undo())
+
+    def test_turn_commands(self):
+        validator = self.Game.turn_input_validator
+        self.assertEqual(("uncover", (3, 4)), validator._validate_turn("3 4"))
+        self.assertEqual(("flag", (3, 4)), validator._validate_turn("f 3 4"))
+        self.assertEqual(("chord", (11, 0)), validator._validate_turn("c 11 0"))
+        self.assertRaises(Minesweeper.WrongNumberOfArguments, lambda: validator._validate_turn("x 3 4"))
+        self.assertRaises(Minesweeper.WrongNumberOfArguments, lambda: validator._validate_turn("f 3"))
+        self.assertRaises(ValueError, lambda: validator._validate_turn("c 12 0"))
+
+    def test_cells_are_views_over_board_array(self):
+        mine_locations = {(0, 0), (1, 1), (2, 2)}
+        self.initialize_non_random_game(6, 3, mine_locations)
+        board = self.Game.board
+
+        self.assertEqual(6 * 6, len(board.cells))
+        self.assertIs(Minesweeper.Mine, type(board.get_cell(0, 0)))
+
+        cell = board.get_cell(0, 1)
+        self.assertIs(Minesweeper.SafeCell, type(cell))
+        self.assertEqual(2, cell.num_mines_in_surrounding_cells)
+        self.assertEqual([(0, 0), (0, 2), (1, 0), (1, 1), (1, 2)], cell.surrounding_cell_locations)
+        self.assertTrue(cell.is_covered)
+
+        board.uncover_cell(board.get_cell(0, 1))
+        self.assertFalse(cell.is_covered)
+        self.assertEqual("2", str(board.board[0][1]))
+
+    def test_flood_fill_matches_recursive_reveal(self):
+        def recursive_reveal(board, row, col, revealed):
+            if (row, col) in revealed:
+                return
+            revealed.add((row, col))
+            cell = board.get_cell(row, col)
+            if type(cell) is Minesweeper.SafeCell and cell.has_zero_surrounding_mines():
+                for surr_row, surr_col in cell.surrounding_cell_locations:
+                    recursive_reveal(board, surr_row, surr_col, revealed)
+
+        rng = random.Random(7)
+        for size, num_mines in [(1, 0), (8, 3), (15, 10), (20, 60), (25, 5)]:
+            locations = [(row, col) for row in range(size) for col in range(size)]
+            mine_locations = set(rng.sample(locations, num_mines))
+            self.initialize_non_random_game(size, num_mines, mine_locations)
+            board = self.Game.board
+            for row, col in rng.sample(locations, min(len(locations), 10)):
+                expected = set()
+                if board.get_cell(row, col).is_covered:
+                    recursive_reveal(board, row, col, expected)
+                    expected = {location for location in expected if board.get_cell(*location).is_covered}
+                num_uncovered_before = board.num_safe_cells_uncovered
+
+                revealed = board.uncover_cell(board.get_cell(row, col))
+
+                self.assertEqual(expected, revealed)
+                self.assertTrue(all(not board.get_cell(*location).is_covered for location in expected))
+                num_safe_revealed = len(expected - mine_locations)
+                self.assertEqual(num_uncovered_before + num_safe_revealed, board.num_safe_cells_uncovered)
+
+    def test_flood_fill_on_large_empty_board(self):
+        board = Minesweeper.Board(400, 0)
+        revealed = board.uncover_cell(board.get_cell(200, 17))
+        self.assertEqual(400 * 400, len(revealed))
+        self.assertIn((399, 399), revealed)
+        self.assertNotIn((0, 400), revealed)
+        self.assertTrue(board.are_all_safe_cells_flipped())
+
+    @unittest.skipIf(MinesweeperCore.get_numpy() is None, "NumPy is not installed")
+    def test_numpy_and_pure_python_mine_counts_agree(self):
+        rng = random.Random(3)
+        for size, num_mines in [(0, 0), (1, 1), (9, 10), (16, 40), (30, 200)]:
+            locations = [(row, col) for row in range(size) for col in range(size)]
+            self.initialize_non_random_game(size, num_mines, set(rng.sample(locations, num_mines)))
+            board = self.Game.board
+            vectorized_cells = bytes(board.cells)
+
+            numpy_module, MinesweeperCore.numpy = MinesweeperCore.numpy, None
+            try:
+                board.board = board.empty_board()
+                board.populate_board_with_all_cells()
+            finally:
+                MinesweeperCore.numpy = numpy_module
+            self.assertEqual(bytes(board.cells), vectorized_cells)
+
+    def test_seeded_mine_placement(self):
+        for num_mines in [0, 10, 99, 100]:
+            board = Minesweeper.Board(10, num_mines, rng=42)
+            self.assertEqual(num_mines, len(board.mine_locations))
+            self.assertEqual(num_mines, sum(type(cell) is Minesweeper.Mine for row in board.board for cell in row))
+            self.assertEqual(board.mine_locations, Minesweeper.Board(10, num_mines, rng=random.Random(42)).mine_locations)
+
+        self.assertRaises(ValueError, lambda: Minesweeper.Board(3, 10))
+
+    def test_first_click_is_safe(self):
+        for seed in range(20):
+            board = Minesweeper.Board(5, 24, rng=seed, first_click_safe=True)
+            self.assertFalse(board.mines_placed)
+
+            board.uncover_cell(board.get_cell(2, 3))
+
+            self.assertTrue(board.mines_placed)
+            self.assertNotIn((2, 3), board.mine_locations)
+            self.assertFalse(board.mine_uncovered)
+            self.assertTrue(board.are_all_safe_cells_flipped())
+
+
+class SimulationTests(unittest.TestCase):
+    def test_simulation_is_reproducible(self):
+        first = Simulation.simulate(9, 10, 50, seed=5, first_click_safe=True, games_per_chunk=20)
+        second = Simulation.simulate(9, 10, 50, seed=5, first_click_safe=True, games_per_chunk=20)
+        self.assertEqual(50, first.num_games)
+        self.assertEqual((first.num_wins, first.num_clicks), (second.num_wins, second.num_clicks))
+        self.assertGreaterEqual(first.num_clicks, first.num_games)
+
+    def test_simulation_results_do_not_depend_on_worker_count(self):
+        single = Simulation.simulate(6, 4, 40, num_workers=1, seed=9, games_per_chunk=10)
+        pooled = Simulation.simulate(6, 4, 40, num_workers=2, seed=9, games_per_chunk=10)
+        self.assertEqual((single.num_wins, single.num_clicks), (pooled.num_wins, pooled.num_clicks))
+
+    def test_headless_game_with_no_mines_is_won_in_one_click(self):
+        board = Minesweeper.Board(5, 0, rng=1)
+        self.assertEqual((True, 1), Simulation.play_headless_game(board, Simulation.random_policy, random.Random(1)))
+
+
+class SolverTests(unittest.TestCase):
+    @staticmethod
+    def create_board(size, mine_locations):
+        board = Minesweeper.Board(size, len(mine_locations))
+        board.mine_locations = mine_locations
+        board.board = board.empty_board()
+        board.populate_board_with_all_cells()
+        return board
+
+    def test_one_two_one_pattern(self):
+        board = self.create_board(3, {(0, 0), (0, 2)})
+        board.uncover_cell(board.get_cell(2, 1))
+
+        solver = Solver.Solver(board)
+
+        self.assertEqual({(0, 0), (0, 2)}, solver.get_mines())
+        self.assertEqual({(0, 1)}, solver.get_safe_cells())
+
+    def test_deductions_are_sound_and_match_a_full_rescan(self):
+        rng = random.Random(11)
+        for _ in range(30):
+            board = Minesweeper.Board(12, 25, rng=rng.getrandbits(32), first_click_safe=True)
+            solver = Solver.Solver(board)
+            solver.uncover(6, 6)
+            while solver.safe and not board.mine_uncovered:
+                solver.uncover(*divmod(min(solver.safe), board.num_cols))
+
+            self.assertFalse(board.mine_uncovered)
+            self.assertTrue(solver.get_mines() <= board.mine_locations)
+            self.assertFalse(solver.get_safe_cells() & board.mine_locations)
+
+            rescan = Solver.Solver(board)
+            self.assertEqual(rescan.get_mines(), solver.get_mines())
+            self.assertEqual(rescan.get_safe_cells(), solver.get_safe_cells())
+
+    def test_probabilities_match_brute_force_enumeration(self):
+        rng = random.Random(5)
+        engine = Solver.ProbabilityEngine()
+        num_checked = 0
+        while num_checked < 15:
+            board = Minesweeper.Board(5, 4, rng=rng.getrandbits(32), first_click_safe=True)
+            solver = Solver.Solver(board)
+            solver.uncover(rng.randrange(5), rng.randrange(5))
+            if board.mine_uncovered or board.are_all_safe_cells_flipped():
+                continue
+            frontier, other_probability = engine.get_probabilities(solver)
+
+            covered = [location for location in itertools.product(range(5), repeat=2)
+                       if board.get_cell(*location).is_covered]
+            numbers = [(location, board.get_cell(*location)) for location in itertools.product(range(5), repeat=2)
+                       if not board.get_cell(*location).is_covered]
+            num_solutions = 0
+            num_with_mine = dict.fromkeys(covered, 0)
+            for mines in itertools.combinations(covered, board.num_mines):
+                mines = set(mines)
+                if all(cell.num_mines_in_surrounding_cells == len(mines.intersection(cell.surrounding_cell_locations))
+                       for _, cell in numbers):
+                    num_solutions += 1
+                    for location in mines:
+                        num_with_mine[location] += 1
+
+            for location in covered:
+                expected = num_with_mine[location] / num_solutions
+                if location in frontier:
+                    self.assertAlmostEqual(expected, frontier[location])
+                elif location in solver.get_mines():
+                    self.assertEqual(1, expected)
+                elif location in solver.get_safe_cells():
+                    self.assertEqual(0, expected)
+                else:
+                    self.assertAlmostEqual(expected, other_probability)
+            num_checked += 1
+
+    def test_probability_engine_reuses_component_tables(self):
+        board = self.create_board(5, {(0, 0)})
+        board.uncover_cell(board.get_cell(1, 1))
+        engine = Solver.ProbabilityEngine()
+        solver = Solver.Solver(board)
+        engine.get_probabilities(solver)
+        engine.get_probabilities(solver)
+        self.assertEqual(1, len(engine.component_cache))
+        self.assertGreater(engine.num_cache_hits, 0)
+
+
+class VisibleHashTests(unittest.TestCase):
+    def test_visible_hash_is_incremental_and_order_independent(self):
+        rng = random.Random(2)
+        for backend in (Minesweeper.Board, Minesweeper.BitBoard):
+            boards = [backend(9, 10, rng=4, first_click_safe=True) for _ in range(2)]
+            for board in boards:
+                board.enable_visible_hash()
+                board.enable_undo()
+                self.assertEqual(0, board.visible_hash)
+            boards[0].uncover_index(40)
+            boards[1].uncover_index(40)
+            moves = [(rng.choice(["uncover", "flag"]), index) for index in boards[0].get_covered_indices()[:6]]
+            for action, index in moves:
+                boards[0].apply_action_index(action, index)
+            for action, index in reversed(moves):
+                boards[1].apply_action_index(action, index)
+            self.assertEqual(boards[0].visible_hash, boards[1].visible_hash)
+            self.assertEqual(boards[0].get_visible_hash(range(81)), boards[0].visible_hash)
+
+            hash_before_branch = boards[0].visible_hash
+            with boards[0].branch():
+                boards[0].uncover_index(next(index for index in boards[0].get_covered_indices()
+                                             if not boards[0].cells[index] & Minesweeper.FLAGGED))
+                self.assertNotEqual(hash_before_branch, boards[0].visible_hash)
+            self.assertEqual(hash_before_branch, boards[0].visible_hash)
+            boards[0].uncover_all_cells()
+            self.assertEqual(boards[0].get_visible_hash(range(81)), boards[0].visible_hash)
+
+    def test_transposition_cache(self):
+        cache = Solver.TranspositionCache(max_size=2)
+        engine = Solver.ProbabilityEngine(transposition_cache=cache)
+        board = SolverTests.create_board(5, {(0, 0)})
+        board.uncover_cell(board.get_cell(1, 1))
+        result = engine.get_probabilities(Solver.Solver(board))
+        self.assertIs(result, engine.get_probabilities(Solver.Solver(board)))
+        self.assertEqual((1, 1), (cache.num_hits, cache.num_misses))
+
+        for kind in ("a", "b"):
+            cache.put(Solver.TranspositionCache.get_key(board, kind), kind)
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get(Solver.TranspositionCache.get_key(board, "probabilities")))
+        self.assertEqual("a", cache.get(Solver.TranspositionCache.get_key(board, "a")))
+
+
+class PatternTests(unittest.TestCase):
+    def test_one_two_one_pattern_and_its_rotations(self):
+        library = Patterns.PatternLibrary()
+        for mine_locations, click, safe_location in [({(0, 0), (0, 2)}, (2, 1), (0, 1)),
+                                                     ({(0, 0), (2, 0)}, (1, 2), (1, 0)),
+                                                     ({(2, 2), (0, 2)}, (1, 0), (1, 2))]:
+            board = SolverTests.create_board(3, mine_locations)
+            board.uncover_cell(board.get_cell(*click))
+            safe, mines = library.find_deductions(board, board.get_index(1, 1))
+            self.assertEqual(mine_locations, {divmod(index, 3) for index in mines})
+            self.assertEqual([safe_location], [divmod(index, 3) for index in safe])
+        self.assertEqual((2, 1), (library.num_hits, library.num_misses))
+
+    def test_deductions_are_sound_and_survive_saving(self):
+        rng = random.Random(3)
+        library = Patterns.PatternLibrary()
+        for _ in range(20):
+            board = Minesweeper.Board(12, 25, rng=rng.getrandbits(32), first_click_safe=True, num_cols=10)
+            board.uncover_index(board.get_index(6, 5))
+            for index in range(len(board.cells)):
+                if board.is_index_covered(index) or not board.cells[index] & Minesweeper.COUNT_MASK:
+                    continue
+                safe, mines = library.find_deductions(board, index)
+                self.assertFalse({divmod(cell, 10) for cell in safe} & board.mine_locations)
+                self.assertTrue({divmod(cell, 10) for cell in mines} <= board.mine_locations)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "patterns.mswpat")
+            library.save(path)
+            self.assertEqual(library.entries, Patterns.PatternLibrary.load(path).entries)
+
+        tournament = Tournament.Tournament(9, 10, ["deterministic", "pattern"], num_games=10, seed=1)
+        tournament.run()
+        self.assertGreater(tournament.stats["pattern"].num_wins, 0)
+
+
+@unittest.skipIf(MinesweeperCore.get_numpy() is None, "NumPy is not installed")
+class BoardBatchTests(unittest.TestCase):
+    def test_step_matches_board(self):
+        batch = BoardBatch.BoardBatch(50, 8, 10, num_cols=7, seed=1, first_click_safe=True)
+        for _ in range(10):
+            moves = batch.sample_covered_moves()
+            boards = [batch.get_board(i) for i in range(batch.num_boards)]
+            first_moves = ~batch.mines_placed
+            observations, rewards, dones = batch.step(moves)
+            # mines are placed on a board's first move, which is always safe
+            self.assertTrue((rewards[first_moves] > 0).all())
+            for i, board in enumerate(boards):
+                if first_moves[i]:
+                    continue
+                board.uncover_index(int(moves[i]))
+                game_over = board.mine_uncovered or board.are_all_safe_cells_flipped()
+                self.assertEqual(game_over, dones[i])
+                if board.mine_uncovered:
+                    self.assertEqual(BoardBatch.REWARD_LOSS, rewards[i])
+                if not dones[i]:
+                    self.assertEqual(bytes(board.cells), batch.cells[i].tobytes())
+                    self.assertEqual(board.num_safe_cells_uncovered, batch.num_safe_cells_uncovered[i])
+                    self.assertEqual(list(Minesweeper.VISIBLE_STATE_TABLE[value] for value in board.cells),
+                                     observations[i].ravel().tolist())
+
+    def test_finished_boards_are_reset(self):
+        batch = BoardBatch.BoardBatch(200, 5, 20, seed=2)
+        mines = (batch.cells & Minesweeper.MINE).reshape(200, 25) != 0
+        self.assertEqual([20] * 200, mines.sum(axis=1).tolist())
+        _, rewards, dones = batch.step(mines.argmax(axis=1))
+        self.assertTrue(dones.all())
+        self.assertEqual([BoardBatch.REWARD_LOSS] * 200, rewards.tolist())
+        self.assertEqual((0, 200), (batch.num_games_won, batch.num_games_lost))
+        self.assertTrue((batch.get_observations() == Minesweeper.HIDDEN_STATE).all())
+        self.assertFalse(batch.mine_uncovered.any())
+
+        batch = BoardBatch.BoardBatch(100, 4, 0, seed=3)
+        _, rewards, dones = batch.step([0] * 100)
+        self.assertTrue(dones.all())
+        self.assertEqual([1.0] * 100, rewards.tolist())
+        self.assertEqual(100, batch.num_games_won)
+
+        batch = BoardBatch.BoardBatch(10, 3, 9, seed=4)
+        _, rewards, dones = batch.step([0] * 10)
+        self.assertTrue(dones.all())
+        self.assertEqual((10, 0), (batch.num_games_won, batch.num_games_lost))
+        self.assertEqual([0.0] * 10, rewards.tolist())
+
+
+class GeneratorTests(unittest.TestCase):
+    def test_generated_boards_are_solvable_without_guessing(self):
+        generator = Generator.NoGuessGenerator(9, 10, first_click=(0, 0))
+        for seed in range(20):
+            board = generator.generate(seed)
+            self.assertEqual(10, len(board.mine_locations))
+            self.assertTrue(board.get_cell(0, 0).has_zero_surrounding_mines())
+            self.assertEqual(0, board.num_safe_cells_uncovered)
+
+            Generator.solve_without_guessing(board, 0, Solver.ProbabilityEngine())
+            self.assertTrue(board.are_all_safe_cells_flipped())
+            self.assertFalse(board.mine_uncovered)
+        self.assertEqual(20, generator.stats.num_boards)
+        self.assertEqual(generator.generate(7).mine_locations, generator.generate(7).mine_locations)
+
+        impossible = Generator.NoGuessGenerator(2, 3, num_cols=5, first_click=(0, 0), max_attempts=5)
+        self.assertRaises(ValueError, lambda: impossible.generate(0))
+        self.assertEqual(5, impossible.stats.num_layouts)
+
+    def test_board_pools_are_cached_on_disk(self):
+        generator = Generator.NoGuessGenerator(8, 12, num_cols=10)
+        with tempfile.TemporaryDirectory() as directory:
+            with Generator.load_board_pool(directory, generator, 5, 15) as pool:
+                self.assertEqual(10, len(pool))
+                self.assertEqual(generator.generate(9).mine_locations, pool.get_board(4).mine_locations)
+                self.assertEqual((8, 10), (pool.get_board(9).num_rows, pool.get_board(9).num_cols))
+            path = Generator.get_pool_path(directory, generator, 5, 15)
+            modified_time = os.path.getmtime(path)
+            with Generator.load_board_pool(directory, generator, 5, 15) as pool:
+                self.assertEqual(10, len(list(pool)))
+            self.assertEqual(modified_time, os.path.getmtime(path))
+            self.assertEqual([path], [os.path.join(directory, name) for name in os.listdir(directory)])
+
+        other_generators = [Generator.NoGuessGenerator(8, 12, num_cols=10, max_repairs=10),
+                            Generator.NoGuessGenerator(8, 12, num_cols=10, max_attempts=10),
+                            Generator.NoGuessGenerator(8, 12, num_cols=10, use_probability_engine=False)]
+        paths = {Generator.get_pool_path("pools", other, 5, 15) for other in [generator] + other_generators}
+        self.assertEqual(4, len(paths))
+
+
+class TournamentTests(unittest.TestCase):
+    def get_results(self, tournament):
+        return {name: (stats.num_games, stats.num_wins, stats.num_moves) for name, stats in tournament.stats.items()}
+
+    def test_workers_and_resumed_runs_match_a_single_run(self):
+        single = Tournament.Tournament(8, 10, num_games=12, seed=3)
+        single.run()
+        self.assertEqual(12, single.stats["random"].num_games)
+        self.assertGreater(single.stats["deterministic"].num_wins, 0)
+
+        parallel = Tournament.Tournament(8, 10, num_games=12, seed=3, num_workers=2)
+        parallel.run()
+        self.assertEqual(self.get_results(single), self.get_results(parallel))
+
+        for extension in (".csv", ".jsonl"):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "results" + extension)
+                Tournament.Tournament(8, 10, num_games=5, seed=3, results_path=path).run()
+                resumed = Tournament.Tournament(8, 10, num_games=12, seed=3, results_path=path)
+                resumed.run()
+                self.assertEqual(self.get_results(single), self.get_results(resumed))
+                self.assertEqual(12 * len(Tournament.STRATEGIES), len(Tournament.read_results(path)))
+                for other_run in [dict(num_rows=9), dict(seed=4), dict(first_click=(0, 0))]:
+                    settings = dict(num_rows=8, num_mines=10, num_games=12, seed=3, results_path=path)
+                    settings.update(other_run)
+                    with self.assertRaises(ValueError):
+                        Tournament.Tournament(**settings).run()
+
+    def test_failing_workers_stop_the_run(self):
+        class FailingStrategy(Tournament.RandomStrategy):
+            def choose_move(self, rng):
+                raise ValueError("strategy bug")
+
+        class DyingStrategy(Tournament.RandomStrategy):
+            def choose_move(self, rng):
+                os._exit(3)
+
+        for strategy, message in [(FailingStrategy(), "strategy bug"), (DyingStrategy(), "exited with code 3")]:
+            tournament = Tournament.Tournament(8, 10, ["random"], num_games=6, seed=3, num_workers=2)
+            tournament.strategies = [strategy]
+            with self.assertRaisesRegex(RuntimeError, message):
+                tournament.run()
+
+    def test_confidence_interval(self):
+        stats = Tournament.StrategyStats()
+        for won in [1] * 30 + [0] * 70:
+            stats.add({"won": won, "moves": 4, "seconds": 0.001})
+        low, high = stats.get_confidence_interval()
+        self.assertLess(low, 0.3)
+        self.assertGreater(high, 0.3)
+        self.assertAlmostEqual(0.2189, low, places=3)
+        self.assertAlmostEqual(4.0, stats.moves_per_game)
+
+
+class RendererTests(unittest.TestCase):
+    @staticmethod
+    def render_cell_by_cell(board):
+        output = "\n    " + ' '.join([str(col).rjust(2) for col in range(board.num_cols)]) + "\n"
+        output += "    " + "-- " * board.num_cols + "\n"
+        for i, row in enumerate(board.board):
+            output += str(i).rjust(2) + " | " + '  '.join([str(x) for x in row]) + "\n"
+        return output
+
+    def test_render_matches_cell_views(self):
+        board = Minesweeper.Board(12, 20, rng=4)
+        self.assertEqual(self.render_cell_by_cell(board), str(board))
+        board.uncover_cell(board.get_cell(5, 5))
+        board.get_cell(0, 0).uncover()
+        self.assertEqual(self.render_cell_by_cell(board), str(board))
+        board.uncover_all_cells()
+        self.assertEqual(self.render_cell_by_cell(board), str(board))
+
+    def test_only_changed_rows_are_rendered_again(self):
+        board = Minesweeper.Board(4, 0, rng=4)
+        renderer = board.get_renderer()
+        renderer.render()
+        board.mine_locations = {(0, 0)}
+        board.board = board.empty_board()
+        board.populate_board_with_all_cells()
+        renderer = board.get_renderer()
+        renderer.render()
+        cached_lines = list(renderer.row_lines)
+
+        board.uncover_cell(board.get_cell(0, 1))
+
+        self.assertIsNone(renderer.row_lines[0])
+        self.assertEqual(cached_lines[1:], renderer.row_lines[1:])
+        self.assertEqual(" 0 | X  1  X  X\n", renderer.render().splitlines(True)[3])
+
+    def test_ansi_render_redraws_only_revealed_cells(self):
+        board = Minesweeper.Board(5, 0, rng=4)
+        renderer = board.get_renderer()
+        self.assertTrue(renderer.render_ansi().startswith(Minesweeper.ANSI_CLEAR_SCREEN))
+
+        board.get_cell(2, 3).uncover()
+        update = renderer.render_ansi()
+
+        self.assertTrue(update.startswith("\x1b[6;15H."))
+        self.assertNotIn(Minesweeper.ANSI_CLEAR_SCREEN, update)
+        self.assertEqual("\x1b[9;1H\x1b[J", renderer.render_ansi())
+
+    def test_ansi_render_offsets_columns_past_three_digit_row_numbers(self):
+        board = Minesweeper.Board(101, 0, rng=4, num_cols=3)
+        renderer = board.get_renderer()
+        lines = renderer.render().splitlines()
+        self.assertEqual("      0  1  2", lines[1])
+        self.assertEqual("  0 | X  X  X", lines[3])
+        self.assertEqual("100 | X  X  X", lines[103])
+        renderer.render_ansi()
+
+        board.get_cell(100, 2).uncover()
+
+        self.assertTrue(renderer.render_ansi().startswith("\x1b[104;13H."))
+
+
+class StorageTests(unittest.TestCase):
+    def assert_same_board(self, expected, actual):
+        self.assertEqual(bytes(expected.cells), bytes(actual.cells))
+        self.assertEqual(expected.mine_locations, actual.mine_locations)
+        self.assertEqual(expected.num_safe_cells_uncovered, actual.num_safe_cells_uncovered)
+        self.assertEqual(expected.mine_uncovered, actual.mine_uncovered)
+        self.assertEqual((expected.num_flags, expected.flag_counts), (actual.num_flags, actual.flag_counts))
+        self.assertEqual(str(expected), str(actual))
+
+    def create_played_board(self):
+        board = Minesweeper.Board(13, 20, rng=8)
+        board.uncover_cell(board.get_cell(4, 4))
+        board.uncover_cell(board.get_cell(12, 0))
+        for row, col in [(0, 12), (12, 12), (6, 6)]:
+            board.toggle_flag(board.get_cell(row, col))
+        return board
+
+    def test_binary_round_trip(self):
+        for board in [self.create_played_board(), Minesweeper.Board(0, 0), Minesweeper.Board(3, 2, first_click_safe=True)]:
+            data = Storage.dumps_board(board)
+            self.assertEqual(Storage.HEADER.size + 3 * ((board.num_rows * board.num_cols + 7) // 8), len(data))
+            self.assert_same_board(board, Storage.loads_board(data))
+
+    def test_memory_mapped_board_file(self):
+        board = self.create_played_board()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "board.msb")
+            Storage.save_board(board, path)
+            with Storage.open_board_file(path) as board_file:
+                self.assertEqual((13, 13, 20), (board_file.num_rows, board_file.num_cols, board_file.num_mines))
+                for row, col in itertools.product(range(13), repeat=2):
+                    self.assertEqual((row, col) in board.mine_locations, board_file.is_mine(row, col))
+                    self.assertEqual(not board.get_cell(row, col).is_covered, board_file.is_uncovered(row, col))
+                    self.assertEqual(board.get_cell(row, col).is_flagged, board_file.is_flagged(row, col))
+            self.assert_same_board(board, Storage.load_board(path))
+
+    def test_rejects_foreign_data(self):
+        self.assertRaises(ValueError, lambda: Storage.loads_board(b'not a board file at all, not even close'))
+        self.assertRaises(ValueError, lambda: Storage.loads_board(Storage.dumps_board(self.create_played_board())[:-1]))
+
+    def test_json_round_trip(self):
+        board = self.create_played_board()
+        mine_location = min(board.mine_locations)
+        board.toggle_flag(board.get_cell(*mine_location))
+        imported = Storage.import_board_json(Storage.export_board_json(board))
+        self.assert_same_board(board, imported)
+        self.assertTrue(imported.get_cell(*mine_location).is_covered)
+
+    def test_version_1_files_load_without_flags(self):
+        board = self.create_played_board()
+        data = Storage.dumps_board(board)
+        bitmap_size = (board.num_rows * board.num_cols + 7) // 8
+        version_1_data = data[:4] + (1).to_bytes(2, 'little') + data[6:Storage.HEADER.size + 2 * bitmap_size]
+        loaded = Storage.loads_board(version_1_data)
+        self.assertEqual(0, loaded.num_flags)
+        self.assertEqual(bytes(value & ~Minesweeper.FLAGGED for value in board.cells), bytes(loaded.cells))
+
+
+class ReplayTests(unittest.TestCase):
+    def play_recorded_game(self, num_moves):
+        rng = random.Random(2)
+        board = Minesweeper.Board(20, 30, rng=12345, first_click_safe=True)
+        log = Replay.record_moves(board)
+        snapshots = [Storage.dumps_board(board)]
+        for _ in range(num_moves):
+            board.uncover_cell(board.get_cell(rng.randrange(20), rng.randrange(20)))
+            snapshots.append(Storage.dumps_board(board))
+        return log, snapshots
+
+    def test_replay_rebuilds_every_position(self):
+        log, snapshots = self.play_recorded_game(40)
+        replayer = Replay.Replayer(log.getvalue(), checkpoint_interval=7)
+        self.assertEqual(40, len(replayer))
+        for num_moves, board in replayer.stream():
+            self.assertEqual(snapshots[num_moves], Storage.dumps_board(board))
+
+        for num_moves in [40, 3, 21, 0, 35]:
+            self.assertEqual(snapshots[num_moves], Storage.dumps_board(replayer.get_board(num_moves)))
+        self.assertEqual({7, 14, 21, 28, 35}, set(replayer.checkpoints))
+
+    def test_game_moves_are_logged(self):
+        game = Minesweeper.Game((6, 0))
+        log = Replay.record_moves(game.board)
+        game.update_board((2, 3))
+        replayer = Replay.Replayer(log.getvalue())
+        self.assertEqual((2, 3), replayer.get_move(0)[:2])
+        self.assertTrue(replayer.get_board(1).are_all_safe_cells_flipped())
+
+    def test_partial_last_record_is_ignored(self):
+        log, _ = self.play_recorded_game(5)
+        self.assertEqual(4, len(Replay.Replayer(log.getvalue()[:-3])))
+
+    def test_replay_restores_flags_and_chords(self):
+        board = Minesweeper.Board(12, 20, rng=777, first_click_safe=True)
+        log = Replay.record_moves(board)
+        moves = [("uncover", board.get_index(6, 6))]
+        board.uncover_index(board.get_index(6, 6))
+        moves += [("flag", board.get_index(row, col)) for row, col in sorted(board.mine_locations)]
+        moves.append(("flag", moves[-1][1]))
+        moves += [("chord", index) for index in range(len(board.cells)) if board.cells[index] & Minesweeper.COUNT_MASK]
+        snapshots = [None, Storage.dumps_board(board)]
+        for action, index in moves[1:]:
+            board.apply_action_index(action, index)
+            snapshots.append(Storage.dumps_board(board))
+        self.assertEqual(19, board.num_flags)
+        self.assertGreater(board.num_safe_cells_uncovered, Storage.loads_board(snapshots[1]).num_safe_cells_uncovered)
+
+        replayer = Replay.Replayer(log.getvalue(), checkpoint_interval=10)
+        self.assertEqual(len(moves), len(replayer))
+        self.assertEqual(moves, [(replayer.get_move(i)[3], replayer.move_indices[i]) for i in range(len(replayer))])
+        for num_moves, replayed_board in replayer.stream(1):
+            self.assertEqual(snapshots[num_moves], Storage.dumps_board(replayed_board))
+
+    def test_version_1_logs_replay_as_uncovers(self):
+        log, snapshots = self.play_recorded_game(6)
+        data = log.getvalue()
+        moves = [Replay.MOVE.unpack_from(data, Replay.HEADER.size + i * Replay.MOVE.size) for i in range(6)]
+        version_1_data = data[:4] + (1).to_bytes(2, 'little') + data[6:Replay.HEADER.size] \
+            + b''.join(Replay.VERSION_1_MOVE.pack(index, seconds) for index, seconds, _ in moves)
+        replayer = Replay.Replayer(version_1_data)
+        self.assertEqual("uncover", replayer.get_move(5)[3])
+        self.assertEqual(snapshots[6], Storage.dumps_board(replayer.get_board(6)))
+
+
+class RectangularAndChunkedBoardTests(unittest.TestCase):
+    def test_rectangular_board(self):
+        board = Minesweeper.Board(3, 0, rng=1, num_cols=5)
+        self.assertEqual((3, 5), (len(board.board), len(board.board[0])))
+        self.assertTrue(board.is_cell_on_board(2, 4))
+        self.assertFalse(board.is_cell_on_board(4, 2))
+        self.assertEqual(15, len(board.uncover_cell(board.get_cell(2, 4))))
+        self.assertEqual(" 2 | .  .  .  .  .\n", str(board).splitlines(True)[-1])
+        self.assertEqual(bytes(board.cells), bytes(Storage.loads_board(Storage.dumps_board(board)).cells))
+        self.assertFalse(hasattr(board, "side_length_of_square_grid"))
+
+        for backend in (Minesweeper.Board, Minesweeper.BitBoard):
+            square = backend(side_length_of_square_grid=4, num_mines=2, rng=1)
+            self.assertEqual((4, 4, 4), (square.num_rows, square.num_cols, square.side_length_of_square_grid))
+            self.assertRaises(TypeError, lambda: backend(num_mines=2))
+
+    def test_neighbor_tables_are_shared_per_shape(self):
+        first, second = Minesweeper.Board(6, 5, rng=1, num_cols=7), Minesweeper.Board(6, 5, rng=2, num_cols=7)
+        self.assertIs(first.get_neighbor_table(), second.get_neighbor_table())
+        self.assertEqual([1, 7, 8], list(first.get_surrounding_indices(0)))
+        self.assertEqual({(0, 5), (0, 6), (1, 5), (2, 5), (2, 6)}, set(first.get_surrounding_cell_locations(1, 6)))
+
+        for size in range(100, 100 + Minesweeper.NEIGHBOR_TABLE_CACHE_SIZE):
+            Minesweeper.get_neighbor_table(size, 1)
+        self.assertNotIn((6, 7, "plane"), Minesweeper.neighbor_tables)
+        self.assertEqual(Minesweeper.NEIGHBOR_TABLE_CACHE_SIZE, len(Minesweeper.neighbor_tables))
+
+    def test_torus_wraps_counts_and_flood_fill(self):
+        board = Minesweeper.Board(5, 1, rng=1, num_cols=6, topology="torus")
+        board.mine_locations = {(0, 0)}
+        board.board = board.empty_board()
+        board.populate_board_with_all_cells()
+        for row, col in [(4, 5), (4, 0), (0, 5), (1, 1)]:
+            self.assertEqual(1, board.get_cell(row, col).num_mines_in_surrounding_cells)
+        self.assertEqual(0, board.get_cell(2, 3).num_mines_in_surrounding_cells)
+
+        self.assertEqual(29, len(board.uncover_cell(board.get_cell(2, 3))))
+        self.assertTrue(board.are_all_safe_cells_flipped())
+        self.assertEqual("torus", Storage.loads_board(Storage.dumps_board(board)).topology)
+        self.assertRaises(ValueError, lambda: Minesweeper.Board(2, 0, topology="torus"))
+
+    def test_chunk_counts_agree_across_chunk_edges(self):
+        board = ChunkedBoard.ChunkedBoard(0.2, seed=3, chunk_size=8)
+        for row, col in itertools.product(range(-10, 10), repeat=2):
+            if board.is_mine(row, col):
+                continue
+            num_mines = sum(board.is_mine(row + row_shift, col + col_shift)
+                            for row_shift, col_shift in ChunkedBoard.NEIGHBOR_SHIFTS)
+            self.assertEqual(num_mines, board.get_num_mines_in_surrounding_cells(row, col))
+
+    def test_evicted_chunks_keep_their_state(self):
+        board = ChunkedBoard.ChunkedBoard(0.15, seed=8, chunk_size=8, max_chunks_in_memory=2, num_rows=40, num_cols=40)
+        reference = ChunkedBoard.ChunkedBoard(0.15, seed=8, chunk_size=8, num_rows=40, num_cols=40)
+        rng = random.Random(4)
+        for _ in range(60):
+            row, col = rng.randrange(40), rng.randrange(40)
+            self.assertEqual(sorted(reference.uncover(row, col)), sorted(board.uncover(row, col)))
+
+        self.assertLessEqual(len(board.chunks), 2)
+        self.assertEqual(reference.render_window(0, 0, 40, 40), board.render_window(0, 0, 40, 40))
+        self.assertEqual(reference.num_safe_cells_uncovered, board.num_safe_cells_uncovered)
+        board.close()
+
+
+class BenchmarkTests(unittest.TestCase):
+    def test_report_and_baseline_comparison(self):
+        report = Benchmark.run_benchmarks(sizes=[4], min_seconds=0, max_repeats=1, import_repeats=1)
+        self.assertEqual(set(Benchmark.BENCHMARKS), set(report["results"]))
+        self.assertEqual(Benchmark.IMPORTED_MODULES, list(report["import_seconds"]))
+        for measurements in report["results"].values():
+            self.assertGreater(measurements["4"]["ops_per_sec"], 0)
+            self.assertGreaterEqual(measurements["4"]["peak_memory_bytes"], 0)
+
+        self.assertEqual([], Benchmark.compare_to_baseline(report, report, 0.2))
+        faster_baseline = json.loads(json.dumps(report))
+        faster_baseline["results"]["render"]["4"]["ops_per_sec"] *= 2
+        self.assertEqual([("render", "4", 0.5)], Benchmark.compare_to_baseline(report, faster_baseline, 0.2))
+
+
+class InstrumentationTests(unittest.TestCase):
+    def tearDown(self):
+        Minesweeper.instrumentation.disable()
+        Minesweeper.instrumentation.reset()
+
+    def test_disabled_by_default(self):
+        Minesweeper.Board(5, 3, rng=1)
+        self.assertEqual({}, Minesweeper.instrumentation.report())
+
+    def test_records_hot_paths_and_notifies_subscribers(self):
+        events = []
+        Minesweeper.instrumentation.subscribe(lambda *event: events.append(event))
+        Minesweeper.instrumentation.enable()
+        try:
+            game = Minesweeper.Game((8, 0))
+            game.update_board((4, 4))
+            str(game.board)
+        finally:
+            Minesweeper.instrumentation.subscribers.clear()
+
+        report = Minesweeper.instrumentation.report()
+        self.assertTrue({"board.init", "board.place_mines", "board.populate", "board.uncover", "board.render"}
+                        <= set(report))
+        self.assertEqual(64, report["board.uncover"]["detail_totals"]["cells_revealed"])
+        self.assertGreaterEqual(report["board.uncover"]["detail_maxima"]["max_queue_depth"], 1)
+        self.assertEqual(8, report["board.render"]["detail_totals"]["rows_rendered"])
+        self.assertEqual(1, sum(report["board.uncover"]["histogram_us"].values()))
+        self.assertIn(("board.uncover", {"cells_revealed": 64}),
+                      [(name, {"cells_revealed": details.get("cells_revealed")}) for name, _, details in events])
+
+
+class GameIOTests(unittest.TestCase):
+    def test_scripted_game_through_memory_io(self):
+        game_io = Minesweeper.MemoryIO(["3", "0", "not a move", "1 1", "n"])
+        Minesweeper.Game(io=game_io).play_game()
+
+        output = game_io.getvalue()
+        self.assertIn("Welcome to Minesweeper!", output)
+        self.assertIn("Invalid move.", output)
+        self.assertIn(Minesweeper.AsciiArt().winner, output)
+        self.assertTrue(output.endswith("Thanks for playing! See you next time!\n"))
+
+    def test_test_mode_games_build_the_ui_lazily(self):
+        game = Minesweeper.Game((9, 10), io=Minesweeper.MemoryIO())
+        self.assertEqual([None] * 3, [game.cached_ascii_art, game.cached_param_input_validator,
+                                      game.cached_turn_input_validator])
+        self.assertFalse(hasattr(MinesweeperCore, "Game"))
+
+        validator = game.turn_input_validator
+        self.assertEqual((8, 8), validator._validate_row_col("8 8"))
+        game.test_mode_parameters = (12, 20)
+        game.reset_for_next_round()
+        self.assertIs(validator, game.turn_input_validator)
+        self.assertEqual((11, 11), validator._validate_row_col("11 11"))
+        self.assertRaises(ValueError, lambda: validator._validate_row_col("12 0"))
+        self.assertIs(game.ascii_art.winner, Minesweeper.AsciiArt().winner)
+
+    def test_core_loads_numpy_only_for_large_boards(self):
+        code = "import sys, MinesweeperCore; MinesweeperCore.Board(9, 10); print('numpy' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        self.assertEqual("False", output.strip())
+
+    def test_stream_io_reads_batches_and_flushes_when_input_runs_out(self):
+        input_stream = io.StringIO("2\n1\n")
+        output_stream = io.StringIO()
+        game_io = Minesweeper.StreamIO(input_stream, output_stream)
+        game = Minesweeper.Game(io=game_io)
+        self.assertEqual(2, game.size_of_square_grid)
+        self.assertEqual(0, len(game_io.pending_lines))
+        self.assertEqual("", input_stream.read())
+
+        with self.assertRaises(SystemExit):
+            game.play_game()
+        self.assertTrue(output_stream.getvalue().endswith("==>Enter row number and column number to uncover: "))
+        self.assertEqual([], game_io.pending_output)
+
+    def test_stream_io_answers_each_prompt_of_a_piped_game(self):
+        game = subprocess.Popen([sys.executable, "Minesweeper.py"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        try:
+            def read_until(text):
+                output = b""
+                while not output.endswith(text):
+                    ready, _, _ = select.select([game.stdout], [], [], 10)
+                    self.assertTrue(ready, "the game stopped answering after {!r}".format(output[-200:]))
+                    data = os.read(game.stdout.fileno(), 1 << 16)
+                    self.assertTrue(data, "the game exited after {!r}".format(output[-200:]))
+                    output += data
+                return output.decode()
+
+            read_until(b"==>Enter an integer between 0 and 30: ")
+            for answer, prompt in [(b"3\n", b"==>Enter an integer between 0 and 9: "),
+                                   (b"1\n", b"==>Enter row number and column number to uncover: ")]:
+                game.stdin.write(answer)
+                game.stdin.flush()
+                output = read_until(prompt)
+            self.assertIn(" 2 | X  X  X", output)
+            game.stdin.close()
+            self.assertEqual(0, game.wait(10))
+        finally:
+            game.kill()
+            game.stdout.close()
+
+
+class ServerTests(unittest.TestCase):
+    def test_session_plays_a_game_from_lines(self):
+        session = Server.GameSession(max_side_length=5)
+        self.assertIn("0 and 5", session.get_greeting())
+        self.assertIn("0 and 9", session.handle_line("3\n")[0])
+        self.assertIn("Invalid input", session.handle_line("10")[0])
+
+        output, is_session_over = session.handle_line("0")
+        self.assertFalse(is_session_over)
+        self.assertIn("row number and column number", output)
+        self.assertIn("not on the board", session.handle_line("3 0")[0])
+        output, is_session_over = session.handle_line("1 1")
+        self.assertIn("You won!", output)
+        self.assertIsNone(session.board)
+        self.assertEqual(("Thanks for playing! See you next time!\n", True), session.handle_line("q"))
+
+    def test_boards_without_safe_cells_finish_at_once(self):
+        session = Server.GameSession(max_side_length=5)
+        for size, num_mines in [("0", "0"), ("2", "4")]:
+            session.handle_line(size)
+            output, is_session_over = session.handle_line(num_mines)
+            self.assertFalse(is_session_over)
+            self.assertIn("You won!", output)
+            self.assertIsNone(session.board)
+
+    def test_server_hosts_concurrent_clients_and_expires_idle_sessions(self):
+        async def run():
+            server = await Server.GameServer(port=0, max_sessions=20).start()
+            try:
+                num_failed, latencies, _ = await Server.run_load(server.host, server.port, 20, num_moves=3)
+                self.assertEqual(0, num_failed)
+                self.assertEqual(20 * 5, len(latencies))
+                self.assertEqual(20, server.num_sessions_served)
+
+                server.idle_timeout = 0.05
+                reader, writer = await asyncio.open_connection(server.host, server.port)
+                self.assertIn(b"Session expired", await reader.read())
+                writer.close()
+                self.assertEqual(1, server.num_sessions_expired)
+                self.assertEqual(0, len(server.sessions))
+            finally:
+                await server.close()
+
+        asyncio.run(run())
+
+    def test_server_turns_away_connections_when_full(self):
+        async def run():
+            server = await Server.GameServer(port=0, max_sessions=1).start()
+            try:
+                first_reader, first_writer = await asyncio.open_connection(server.host, server.port)
+                await first_reader.readuntil(b": ")
+                second_reader, second_writer = await asyncio.open_connection(server.host, server.port)
+                self.assertEqual(b"Server is full, try again later\n", await second_reader.read())
+                self.assertEqual(1, server.num_sessions_rejected)
+                first_writer.close()
+                second_writer.close()
+            finally:
+                await server.close()
+
+        asyncio.run(run())
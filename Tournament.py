@@ -0,0 +1,421 @@
+import os
+import csv
+import sys
+import json
+import math
+import time
+import queue
+import random
+import argparse
+import traceback
+import multiprocessing
+
+import Minesweeper
+import Simulation
+import Solver
+import Patterns
+
+
+# how often the parent checks on its workers while waiting for results
+WORKER_POLL_SECONDS = 1.0
+
+
+class RandomStrategy(object):
+    """Uncovers a random covered cell every move"""
+    name = "random"
+
+    def __init__(self):
+        self.board = None
+
+    def start_game(self, board):
+        self.board = board
+
+    def on_move(self, revealed):
+        pass
+
+    def choose_move(self, rng):
+        return Simulation.random_policy(self.board, rng)
+
+
+class DeterministicStrategy(RandomStrategy):
+    """Uncovers cells the Solver proves safe, and guesses at random among the other cells only when stuck"""
+    name = "deterministic"
+
+    def __init__(self):
+        super(DeterministicStrategy, self).__init__()
+        self.solver = None
+
+    def start_game(self, board):
+        self.board = board
+        self.solver = Solver.Solver(board)    # Dependency
+
+    def on_move(self, revealed):
+        self.solver.update(revealed.indices())
+
+    def choose_move(self, rng):
+        if self.solver.safe:
+            return divmod(min(self.solver.safe), self.board.num_cols)
+        return divmod(self.guess(rng), self.board.num_cols)
+
+    def guess(self, rng):
+        return rng.choice(self.get_undecided_indices())
+
+    def get_undecided_indices(self):
+        return [index for index in self.board.get_covered_indices() if index not in self.solver.mines]
+
+
+class ProbabilityStrategy(DeterministicStrategy):
+    """Like DeterministicStrategy, but guesses the cell least likely to hold a mine"""
+    name = "probability"
+
+    def __init__(self):
+        super(ProbabilityStrategy, self).__init__()
+        self.probability_engine = Solver.ProbabilityEngine()    # Dependency
+
+    def guess(self, rng):
+        probabilities, other_cell_probability = self.probability_engine.get_probabilities(self.solver)
+        frontier_location, frontier_probability = min(probabilities.items(), key=lambda item: item[1],
+                                                      default=(None, 1.0))
+        if other_cell_probability < frontier_probability:
+            frontier = {self.board.get_index(row, col) for row, col in probabilities}
+            off_frontier = [index for index in self.get_undecided_indices() if index not in frontier]
+            if off_frontier:
+                return rng.choice(off_frontier)
+        return self.board.get_index(*frontier_location)
+
+
+class PatternStrategy(RandomStrategy):
+    """Uncovers cells proven safe by pattern lookups around the numbers each move changed, else guesses"""
+    name = "pattern"
+
+    def __init__(self, library=None):
+        super(PatternStrategy, self).__init__()
+        self.library = library if library is not None else Patterns.PatternLibrary()    # Dependency
+        self.known_mines = set()
+        self.safe = set()
+        # numbers whose window changed since they were last looked up; a dict keeps the order deterministic
+        self.pending = {}
+
+    def start_game(self, board):
+        self.board = board
+        self.known_mines = set()
+        self.safe = set()
+        self.pending = {}
+
+    def on_move(self, revealed):
+        for index in revealed.indices():
+            self.add_window_to_pending(index)
+
+    def add_window_to_pending(self, index):
+        for neighbor in self.library.get_window(self.board, index):
+            if neighbor >= 0:
+                self.pending[neighbor] = None
+
+    def choose_move(self, rng):
+        board = self.board
+        cells = board.cells
+        while not self.safe and self.pending:
+            index = self.pending.popitem()[0]
+            value = cells[index]
+            if value & (Minesweeper.COVERED | Minesweeper.MINE) or not value & Minesweeper.COUNT_MASK:
+                continue
+            safe, mines = self.library.find_deductions(board, index, self.known_mines)
+            self.safe.update(safe)
+            for mine in mines:
+                if mine not in self.known_mines:
+                    self.known_mines.add(mine)
+                    self.add_window_to_pending(mine)
+            self.safe = {index for index in self.safe if board.is_index_covered(index)}
+        if self.safe:
+            return divmod(self.safe.pop(), board.num_cols)
+        return divmod(rng.choice([index for index in board.get_covered_indices() if index not in self.known_mines]),
+                      board.num_cols)
+
+
+STRATEGIES = {strategy.name: strategy
+              for strategy in (RandomStrategy, DeterministicStrategy, ProbabilityStrategy, PatternStrategy)}
+
+
+class StrategyStats(object):
+    def __init__(self):
+        self.num_games = 0
+        self.num_wins = 0
+        self.num_moves = 0
+        self.elapsed_seconds = 0.0
+
+    def add(self, row):
+        self.num_games += 1
+        self.num_wins += row["won"]
+        self.num_moves += row["moves"]
+        self.elapsed_seconds += row["seconds"]
+
+    @property
+    def win_rate(self):
+        return self.num_wins / self.num_games if self.num_games else 0.0
+
+    def get_confidence_interval(self, z=1.96):
+        # Wilson score interval, which stays inside [0, 1] even for win rates near 0 or 1
+        if not self.num_games:
+            return 0.0, 1.0
+        n = self.num_games
+        center = (self.win_rate + z * z / (2 * n)) / (1 + z * z / n)
+        half_width = z * math.sqrt(self.win_rate * (1 - self.win_rate) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+        return max(0.0, center - half_width), min(1.0, center + half_width)
+
+    @property
+    def moves_per_game(self):
+        return self.num_moves / self.num_games if self.num_games else 0.0
+
+    @property
+    def seconds_per_move(self):
+        return self.elapsed_seconds / self.num_moves if self.num_moves else 0.0
+
+    def to_dict(self):
+        low, high = self.get_confidence_interval()
+        return {"games": self.num_games, "wins": self.num_wins, "win_rate": self.win_rate,
+                "win_rate_95_ci": [low, high], "moves_per_game": self.moves_per_game,
+                "ms_per_move": 1000 * self.seconds_per_move}
+
+
+# Result files hold one row per (game, strategy), appended as games finish; .csv or JSON lines otherwise
+RESULT_FIELDS = ["board", "game", "seed", "strategy", "won", "moves", "seconds"]
+
+
+def read_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, newline='') as f:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    for row in rows:
+        row["game"], row["seed"], row["won"], row["moves"] \
+            = int(row["game"]), int(row["seed"]), int(row["won"]), int(row["moves"])
+        row["seconds"] = float(row["seconds"])
+    return rows
+
+
+class ResultWriter(object):
+    def __init__(self, path):
+        self.path = path
+        is_new_file = not os.path.exists(path) or not os.path.getsize(path)
+        self.file = open(path, 'a', newline='')
+        self.csv_writer = None
+        if path.endswith(".csv"):
+            self.csv_writer = csv.DictWriter(self.file, RESULT_FIELDS)    # Dependency
+            if is_new_file:
+                self.csv_writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            if self.csv_writer is not None:
+                self.csv_writer.writerow(row)
+            else:
+                self.file.write(json.dumps(row) + "\n")
+        # flushed per game, so a stopped run loses at most the games still being played
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Tournament(object):
+    """
+    Plays every strategy on the same seeded boards, all opening at first_click.  Boards are placed with the
+    first click kept safe, so they match across strategies.  Games are handed out through a shared counter into
+    a shared array of pending game numbers.  Results are appended to results_path as each game finishes.
+    Running again with the same file skips the games already recorded.
+    """
+
+    def __init__(self, num_rows, num_mines, strategy_names=tuple(STRATEGIES), num_games=1000, seed=0, num_cols=None,
+                 first_click=None, num_workers=1, results_path=None, pattern_library_path=None):
+        self.num_rows = num_rows
+        self.num_cols = num_rows if num_cols is None else num_cols
+        self.num_mines = num_mines
+        self.strategy_names = list(strategy_names)
+        for name in self.strategy_names:
+            if name not in STRATEGIES:
+                raise ValueError("Unknown strategy {!r}".format(name))
+        self.num_games = num_games
+        self.seed = seed
+        self.first_click = first_click if first_click is not None else (self.num_rows // 2, self.num_cols // 2)
+        self.num_workers = num_workers
+        self.results_path = results_path
+        self.pattern_library_path = pattern_library_path
+        # every game opens at first_click, so results are only comparable between runs with the same one
+        self.board_description = "{}x{}/{}@{},{}".format(self.num_rows, self.num_cols, self.num_mines,
+                                                         *self.first_click)
+        self.strategies = None
+        self.stats = {name: StrategyStats() for name in self.strategy_names}
+
+    def get_game_seed(self, game):
+        # derived from the game number alone, so a resumed run plays the same boards
+        return random.Random("{}:{}".format(self.seed, game)).getrandbits(64)
+
+    def play_game(self, game):
+        if self.strategies is None:
+            self.strategies = [self.create_strategy(name) for name in self.strategy_names]
+        game_seed = self.get_game_seed(game)
+        rows = []
+        for strategy in self.strategies:
+            board = Minesweeper.create_board(self.num_rows, self.num_mines, rng=game_seed, first_click_safe=True,
+                                             num_cols=self.num_cols)    # Dependency
+            rng = random.Random("{}:{}".format(game_seed, strategy.name))    # Dependency
+            won, num_moves, seconds = self.play_strategy(strategy, board, rng)
+            rows.append({"board": self.board_description, "game": game, "seed": game_seed, "strategy": strategy.name,
+                         "won": int(won), "moves": num_moves, "seconds": seconds})
+        return rows
+
+    def create_strategy(self, name):
+        if name == PatternStrategy.name and self.pattern_library_path is not None:
+            return PatternStrategy(Patterns.PatternLibrary.load(self.pattern_library_path))    # Dependency
+        return STRATEGIES[name]()
+
+    def play_strategy(self, strategy, board, rng):
+        start_time = time.perf_counter()
+        strategy.start_game(board)
+        index = board.get_index(*self.first_click)
+        num_moves = 0
+        while True:
+            revealed = board.uncover_index(index)
+            num_moves += 1
+            if board.mine_uncovered or board.are_all_safe_cells_flipped():
+                break
+            strategy.on_move(revealed)
+            index = board.get_index(*strategy.choose_move(rng))
+        return not board.mine_uncovered, num_moves, time.perf_counter() - start_time
+
+    def load_finished_games(self):
+        finished = {}
+        for row in read_results(self.results_path) if self.results_path else []:
+            if row["board"] != self.board_description:
+                raise ValueError("{} holds results for {} boards, not {}".format(
+                    self.results_path, row["board"], self.board_description))
+            if row["seed"] != self.get_game_seed(row["game"]):
+                raise ValueError("{} holds results for game {} of a run with a different seed".format(
+                    self.results_path, row["game"]))
+            finished.setdefault(row["game"], {}).setdefault(row["strategy"], row)
+        # a game interrupted between strategies is played again in full
+        return {game: rows for game, rows in finished.items() if all(name in rows for name in self.strategy_names)}
+
+    def run(self):
+        finished = self.load_finished_games()
+        for game in sorted(finished):
+            if game < self.num_games:
+                self.record([finished[game][name] for name in self.strategy_names])
+        pending = [game for game in range(self.num_games) if game not in finished]
+
+        writer = ResultWriter(self.results_path) if self.results_path else None    # Dependency
+        try:
+            for rows in self.play_games(pending):
+                self.record(rows)
+                if writer is not None:
+                    writer.write(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+        return self.stats
+
+    def record(self, rows):
+        for row in rows:
+            self.stats[row["strategy"]].add(row)
+
+    def play_games(self, pending):
+        if self.num_workers <= 1 or len(pending) <= 1:
+            for game in pending:
+                yield self.play_game(game)
+            return
+
+        pending_games = multiprocessing.Array('q', pending, lock=False)
+        next_position = multiprocessing.Value('q', 0)
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=run_worker, args=(self, pending_games, next_position, results))
+                   for _ in range(min(self.num_workers, len(pending)))]
+        for worker in workers:
+            worker.start()
+        try:
+            num_workers_running = len(workers)
+            while num_workers_running:
+                try:
+                    rows = results.get(timeout=WORKER_POLL_SECONDS)
+                except queue.Empty:
+                    # a worker killed outright never reports, so its exit code is the only sign
+                    for worker in workers:
+                        if worker.exitcode not in (None, 0):
+                            raise RuntimeError("Tournament worker exited with code {}".format(worker.exitcode))
+                    continue
+                if rows is None:
+                    num_workers_running -= 1
+                elif isinstance(rows, str):
+                    raise RuntimeError("Tournament worker failed:\n" + rows)
+                else:
+                    yield rows
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+                worker.join()
+
+    def format_summary(self):
+        lines = ["{:<14} {:>7} {:>9} {:>17} {:>11} {:>9}".format(
+            "strategy", "games", "win rate", "95% CI", "moves/game", "ms/move")]
+        for name in self.strategy_names:
+            stats = self.stats[name]
+            low, high = stats.get_confidence_interval()
+            lines.append("{:<14} {:>7} {:>9.4f} {:>17} {:>11.2f} {:>9.3f}".format(
+                name, stats.num_games, stats.win_rate, "[{:.4f}, {:.4f}]".format(low, high), stats.moves_per_game,
+                1000 * stats.seconds_per_move))
+        return "\n".join(lines)
+
+
+def run_worker(tournament, pending_games, next_position, results):
+    # claims games one at a time from the shared counter until none are left; an exception is sent to the
+    # parent as its traceback text
+    try:
+        while True:
+            with next_position.get_lock():
+                position = next_position.value
+                next_position.value += 1
+            if position >= len(pending_games):
+                break
+            results.put(tournament.play_game(pending_games[position]))
+    except Exception:
+        results.put(traceback.format_exc())
+        return
+    results.put(None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="Minesweeper.py tournament",
+                                     description="Compare move strategies on identical seeded boards")
+    parser.add_argument("--size", type=int, default=16, help="number of rows, and of columns unless --cols is given")
+    parser.add_argument("--cols", type=int, default=None, help="number of columns")
+    parser.add_argument("--mines", type=int, default=40, help="number of mines per board")
+    parser.add_argument("--games", type=int, default=1000, help="number of boards every strategy plays")
+    parser.add_argument("--strategies", nargs="+", choices=sorted(STRATEGIES), default=list(STRATEGIES),
+                        help="strategies to compare")
+    parser.add_argument("--seed", type=int, default=0, help="base seed for boards and guesses")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--results", default=None,
+                        help="append per-game results to this .csv or JSON lines file, resuming from it if it exists")
+    parser.add_argument("--patterns", default=None,
+                        help="pattern library for the pattern strategy, built with Minesweeper.py patterns")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    tournament = Tournament(args.size, args.mines, args.strategies, args.games, args.seed, args.cols,
+                            num_workers=args.workers, results_path=args.results,
+                            pattern_library_path=args.patterns)    # Dependency
+    try:
+        tournament.run()
+    except KeyboardInterrupt:
+        print("Stopped; run again with the same --results file to resume")
+    if args.json:
+        print(json.dumps({name: stats.to_dict() for name, stats in tournament.stats.items()}, indent=1))
+    else:
+        print(tournament.format_summary())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])